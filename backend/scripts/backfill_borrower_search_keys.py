@@ -0,0 +1,62 @@
+"""
+Add the search attributes (nameKey/nameBucket, phoneKey/phoneBucket) to
+borrowers created before GET /borrowers?q= existed, so they show up in the
+NameSearchIndex and PhoneSearchIndex GSIs.
+
+The table is read with a parallel Scan and every update is conditional on
+the name and phone it was computed from, so concurrent edits are never
+overwritten and the script is safe to re-run.
+
+Usage:
+    python scripts/backfill_borrower_search_keys.py --table Borrowers-Dev --segments 4
+"""
+import argparse
+import os
+
+from bulk_scan import add_scan_arguments, parallel_scan  # also puts backend/src on sys.path
+from utils.search import search_attributes
+
+def backfill_item(table, item: dict) -> bool:
+    attributes = search_attributes(item)
+    if not attributes or all(item.get(name) == value for name, value in attributes.items()):
+        return False
+    names = {f'#a{index}': name for index, name in enumerate(attributes)}
+    values = {f':a{index}': value for index, value in enumerate(attributes.values())}
+    conditions = []
+    for field in ('name', 'phone'):
+        names[f'#{field}'] = field
+        if field in item:
+            values[f':{field}'] = item[field]
+            conditions.append(f'#{field} = :{field}')
+        else:
+            conditions.append(f'attribute_not_exists(#{field})')
+    try:
+        table.update_item(
+            Key={'borrowerId': item['borrowerId']},
+            UpdateExpression='SET ' + ', '.join(f'#a{index} = :a{index}' for index in range(len(attributes))),
+            ConditionExpression=' AND '.join(conditions),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False  # Edited since the scan; the writer stored fresh keys itself
+
+def backfill_items(dynamodb, table_name: str, items) -> int:
+    table = dynamodb.Table(table_name)
+    return sum(1 for item in items if backfill_item(table, item))
+
+def backfill(table_name: str, segments: int, read_capacity: float = 0, write_capacity: float = 0) -> int:
+    return parallel_scan([table_name], backfill_items, segments, read_capacity, write_capacity)[table_name]
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill borrower search attributes')
+    parser.add_argument('--table', default=os.environ.get('BORROWERS_TABLE', 'Borrowers'))
+    add_scan_arguments(parser, segments_help='Parallel scan segments')
+    args = parser.parse_args()
+
+    updated = backfill(args.table, args.segments, args.read_capacity, args.write_capacity)
+    print(f'{args.table}: backfilled {updated} borrowers')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Add loanItemId to loan items (SK=LOAN) written to the LoanHistory table before
+LoanIndex existed, so get_all_loans sees them in single-table mode.
+
+The table is read with a parallel Scan and every update is conditional on
+the item still being there without the attribute, so deleted loans are never
+re-created and the script is safe to re-run.
+
+Usage:
+    python scripts/backfill_loan_index_keys.py --table LoanHistory-Dev --segments 4
+"""
+import argparse
+import os
+
+from bulk_scan import add_scan_arguments, parallel_scan  # also puts backend/src on sys.path
+from services.single_table_service import LOAN_INDEX_KEY, LOAN_SK
+
+def backfill_item(table, item: dict) -> bool:
+    if item.get('SK') != LOAN_SK or LOAN_INDEX_KEY in item:
+        return False
+    try:
+        table.update_item(
+            Key={'PK': item['PK'], 'SK': item['SK']},
+            UpdateExpression='SET #key = :loanId',
+            ConditionExpression='attribute_exists(PK) AND attribute_not_exists(#key)',
+            ExpressionAttributeNames={'#key': LOAN_INDEX_KEY},
+            ExpressionAttributeValues={':loanId': item['loanId']}
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False  # Deleted or archived since the scan, or already backfilled
+
+def backfill_items(dynamodb, table_name: str, items) -> int:
+    table = dynamodb.Table(table_name)
+    return sum(1 for item in items if backfill_item(table, item))
+
+def backfill(table_name: str, segments: int, read_capacity: float = 0, write_capacity: float = 0) -> int:
+    return parallel_scan([table_name], backfill_items, segments, read_capacity, write_capacity)[table_name]
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill LoanIndex keys on single-table loan items')
+    parser.add_argument('--table', default=os.environ.get('SINGLE_TABLE', 'LoanHistory'))
+    add_scan_arguments(parser, segments_help='Parallel scan segments')
+    args = parser.parse_args()
+
+    updated = backfill(args.table, args.segments, args.read_capacity, args.write_capacity)
+    print(f'{args.table}: backfilled {updated} loans')
+
+if __name__ == '__main__':
+    main()
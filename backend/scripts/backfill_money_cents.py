@@ -0,0 +1,89 @@
+"""
+Add the integer-cents attributes (amountCents, balanceAmountCents, ...) to
+loan, payment and interest cycle items written before money was stored in
+cents. Readers already fall back to the legacy Decimal attributes, so this
+can run at any time; items that already have a cents attribute are skipped.
+
+Each table is read with a parallel Scan and every update is conditional on
+the legacy value it was computed from, so concurrent writes are never
+overwritten and the script is safe to re-run.
+
+Usage:
+    python scripts/backfill_money_cents.py --tables Loans-Dev Payments-Dev InterestCycles-Dev
+    python scripts/backfill_money_cents.py --tables LoanHistory-Dev --segments 8
+    python scripts/backfill_money_cents.py --tables LoanHistory-Dev --read-capacity 200 --write-capacity 100
+"""
+import argparse
+import os
+
+from bulk_scan import add_scan_arguments, parallel_scan  # also puts backend/src on sys.path
+from utils.money import CENTS_SUFFIX, to_cents
+
+MONEY_FIELDS = {
+    'loan': ('amount', 'balanceAmount', 'balanceInterestAmount', 'accruedInterest', 'monthlyPayment'),
+    'payment': ('amount',),
+    'cycle': ('principalBalance', 'interestAmount'),
+}
+
+def entity_type(item: dict) -> str:
+    if 'entityType' in item:
+        return item['entityType']
+    if 'paymentId' in item:
+        return 'payment'
+    if 'cycleId' in item:
+        return 'cycle'
+    return 'loan'
+
+def backfill_item(table, key_names, item: dict) -> bool:
+    fields = [
+        field for field in MONEY_FIELDS.get(entity_type(item), ())
+        if field in item and field + CENTS_SUFFIX not in item
+    ]
+    if not fields:
+        return False
+    names = {}
+    values = {}
+    assignments = []
+    conditions = []
+    for index, field in enumerate(fields):
+        names[f'#f{index}'] = field
+        names[f'#c{index}'] = field + CENTS_SUFFIX
+        values[f':v{index}'] = item[field]
+        values[f':c{index}'] = to_cents(item[field])
+        assignments.append(f'#c{index} = :c{index}')
+        conditions.append(f'#f{index} = :v{index} AND attribute_not_exists(#c{index})')
+    try:
+        table.update_item(
+            Key={name: item[name] for name in key_names},
+            UpdateExpression='SET ' + ', '.join(assignments),
+            ConditionExpression=' AND '.join(conditions),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False  # Rewritten since the scan; the writer stored cents itself
+
+def backfill_items(dynamodb, table_name: str, items) -> int:
+    table = dynamodb.Table(table_name)
+    key_names = [key['AttributeName'] for key in table.key_schema]
+    return sum(1 for item in items if backfill_item(table, key_names, item))
+
+def backfill(table_names, segments: int, read_capacity: float = 0, write_capacity: float = 0) -> dict:
+    return parallel_scan(list(table_names), backfill_items, segments, read_capacity, write_capacity)
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill integer-cents money attributes')
+    parser.add_argument('--tables', nargs='+', default=[
+        os.environ.get('LOANS_TABLE', 'Loans'),
+        os.environ.get('PAYMENTS_TABLE', 'Payments'),
+        os.environ.get('INTEREST_CYCLES_TABLE', 'InterestCycles'),
+    ])
+    add_scan_arguments(parser)
+    args = parser.parse_args()
+
+    for table_name, updated in backfill(args.tables, args.segments, args.read_capacity, args.write_capacity).items():
+        print(f'{table_name}: backfilled {updated} items')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Parallel Scan shared by the maintenance scripts.
+
+Every segment of every table is read by its own worker, through one DynamoDB
+resource whose calls are all paced when --read-capacity / --write-capacity
+are given (services/throughput.py).
+
+    parser = argparse.ArgumentParser()
+    add_scan_arguments(parser)
+    args = parser.parse_args()
+    counts = parallel_scan(['Loans-Dev'], process_items, args.segments, args.read_capacity, args.write_capacity)
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List
+
+import boto3
+from botocore.config import Config
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from services.throughput import ThroughputGovernor  # noqa: E402
+
+def add_scan_arguments(parser, segments_help: str = 'Parallel scan segments per table') -> None:
+    """--segments, --read-capacity and --write-capacity"""
+    parser.add_argument('--segments', type=int, default=4, help=segments_help)
+    parser.add_argument('--read-capacity', type=float, default=0,
+                        help='Read capacity units per second to stay under (0: unlimited)')
+    parser.add_argument('--write-capacity', type=float, default=0,
+                        help='Write capacity units per second to stay under (0: unlimited)')
+
+def scan_segment(table, segment: int, total_segments: int) -> Iterator[Dict]:
+    """Every item in one segment of a parallel Scan, page by page"""
+    scan_kwargs = {'Segment': segment, 'TotalSegments': total_segments}
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def parallel_scan(table_names: List[str], process_items: Callable, segments: int,
+                  read_capacity: float = 0, write_capacity: float = 0) -> Dict[str, int]:
+    """
+    Call process_items(dynamodb, table_name, items) for each segment of each
+    table in parallel; returns the sum of its results per table.
+    """
+    workers = segments * len(table_names)
+    dynamodb = boto3.resource('dynamodb', config=Config(max_pool_connections=workers))
+    # Pace every call when a capacity budget is given
+    ThroughputGovernor(read_capacity, write_capacity, background_share=1, always_background=True).register(
+        dynamodb.meta.client)
+
+    def process_segment(table_name: str, segment: int) -> int:
+        return process_items(dynamodb, table_name, scan_segment(dynamodb.Table(table_name), segment, segments))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (table_name, executor.submit(process_segment, table_name, segment))
+            for table_name in table_names
+            for segment in range(segments)
+        ]
+        counts = {table_name: 0 for table_name in table_names}
+        for table_name, future in futures:
+            counts[table_name] += future.result()
+    return counts
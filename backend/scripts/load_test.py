@@ -0,0 +1,517 @@
+"""
+Local load test: drive the real API handlers concurrently against an
+in-memory DynamoDB stand-in (scripts/memory_dynamodb.py), without deploying.
+
+Routes, handlers and table schemas are read from template.yaml. Each request
+is an API Gateway proxy event for one of the template's Api routes, picked
+according to a weighted read/write mix and sent at a fixed arrival rate
+(open loop), so queueing shows up in the latencies when the handlers cannot
+keep up. Latency is measured from the request's scheduled start.
+
+Reports throughput, p50/p95/p99 latency, status codes and DynamoDB calls per
+route. Requires PyYAML (pip install pyyaml) for reading the template.
+
+Usage:
+    python scripts/load_test.py --rate 100 --duration 30 \
+        --read-latency-ms 6 --write-latency-ms 10 --mix read_heavy
+"""
+import argparse
+import contextlib
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(SCRIPTS_DIR, '..')
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'src'))
+
+from memory_dynamodb import MemoryDynamoDB, current_route, install  # noqa: E402
+
+# Relative weights per route ("METHOD /path" as in template.yaml). Routes in
+# the template but not listed here get DEFAULT_WEIGHT.
+MIXES = {
+    'read_heavy': {
+        'GET /loans': 15,
+        'GET /loans/{id}': 30,
+        'GET /loans/{id}/payments': 15,
+        'GET /loans/{id}/interest-cycles': 8,
+        'GET /borrowers': 5,
+        'GET /borrowers/{id}': 8,
+        'GET /reports': 1,
+        'POST /loans': 4,
+        'PUT /loans/{id}/status': 3,
+        'POST /loans/{id}/payments': 6,
+        'PUT /payments/{paymentId}': 2,
+        'POST /borrowers': 2,
+        'DELETE /payments/{paymentId}': 0.5,
+        'DELETE /loans/{id}': 0.5,
+        'POST /payments/batch': 0.5,
+    },
+    'balanced': {
+        'GET /loans': 10,
+        'GET /loans/{id}': 20,
+        'GET /loans/{id}/payments': 10,
+        'GET /loans/{id}/interest-cycles': 5,
+        'GET /borrowers': 3,
+        'GET /borrowers/{id}': 5,
+        'GET /reports': 1,
+        'POST /loans': 10,
+        'PUT /loans/{id}/status': 8,
+        'POST /loans/{id}/payments': 18,
+        'PUT /payments/{paymentId}': 5,
+        'POST /borrowers': 3,
+        'DELETE /payments/{paymentId}': 1,
+        'DELETE /loans/{id}': 1,
+        'POST /payments/batch': 1,
+    },
+    'write_heavy': {
+        'GET /loans': 5,
+        'GET /loans/{id}': 10,
+        'GET /loans/{id}/payments': 5,
+        'GET /borrowers/{id}': 3,
+        'POST /loans': 15,
+        'PUT /loans/{id}/status': 15,
+        'POST /loans/{id}/payments': 35,
+        'PUT /payments/{paymentId}': 8,
+        'POST /borrowers': 5,
+        'DELETE /payments/{paymentId}': 2,
+        'DELETE /loans/{id}': 1,
+        'POST /payments/batch': 3,
+    },
+}
+DEFAULT_WEIGHT = 1
+LOAN_STATUSES = ['approved', 'active', 'approved', 'paid']
+
+# ---------------------------------------------------------------------------
+# template.yaml
+# ---------------------------------------------------------------------------
+
+class _TemplateLoader(yaml.SafeLoader):
+    """SafeLoader that keeps CloudFormation short-form tags (!Ref X -> {'Ref': 'X'})"""
+
+def _construct_tag(loader, tag_suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    else:
+        value = loader.construct_mapping(node, deep=True)
+    return {tag_suffix: value}
+
+_TemplateLoader.add_multi_constructor('!', _construct_tag)
+
+def load_template(path: str) -> Dict:
+    with open(path) as template_file:
+        return yaml.load(template_file, Loader=_TemplateLoader)
+
+def _key_pair(key_schema: List[Dict]) -> Tuple[str, Optional[str]]:
+    hash_key = next(key['AttributeName'] for key in key_schema if key['KeyType'] == 'HASH')
+    range_key = next((key['AttributeName'] for key in key_schema if key['KeyType'] == 'RANGE'), None)
+    return hash_key, range_key
+
+def _condition_holds(template: Dict, name: str) -> bool:
+    """A `!Equals [!Ref Parameter, value]` condition evaluated with the parameter's default"""
+    left, right = template.get('Conditions', {})[name]['Equals']
+    parameter = template.get('Parameters', {}).get(left.get('Ref'), {}) if isinstance(left, dict) else {}
+    return str(parameter.get('Default', left)) == str(right)
+
+def _present_items(template: Dict, items: List) -> List:
+    """List items with `!If` resolved and `!Ref AWS::NoValue` dropped"""
+    present = []
+    for item in items:
+        if isinstance(item, dict) and 'If' in item:
+            condition, when_true, when_false = item['If']
+            item = when_true if _condition_holds(template, condition) else when_false
+        if item != {'Ref': 'AWS::NoValue'}:
+            present.append(item)
+    return present
+
+def table_schemas(template: Dict) -> Dict[str, Dict]:
+    """Table schemas keyed by logical ID (the stand-in uses logical IDs as table names)"""
+    schemas = {}
+    for logical_id, resource in template['Resources'].items():
+        if resource['Type'] != 'AWS::DynamoDB::Table':
+            continue
+        properties = resource['Properties']
+        indexes = {}
+        for index in _present_items(template, properties.get('GlobalSecondaryIndexes', [])):
+            projection = index.get('Projection', {})
+            indexes[index['IndexName']] = {
+                'key': _key_pair(index['KeySchema']),
+                'projection': projection.get('ProjectionType', 'ALL'),
+                'include': projection.get('NonKeyAttributes', [])
+            }
+        schemas[logical_id] = {'key': _key_pair(properties['KeySchema']), 'indexes': indexes}
+    return schemas
+
+def function_environment(template: Dict, overrides: Dict[str, str]) -> Dict[str, str]:
+    """Globals environment with !Ref to a table resolved to its logical ID and parameters to their defaults"""
+    variables = template.get('Globals', {}).get('Function', {}).get('Environment', {}).get('Variables', {})
+    parameters = template.get('Parameters', {})
+    environment = {}
+    for name, value in variables.items():
+        if isinstance(value, dict) and 'Ref' in value:
+            reference = value['Ref']
+            value = parameters[reference].get('Default', '') if reference in parameters else reference
+        if isinstance(value, (str, int, float)):
+            environment[name] = str(value)
+    environment.update(overrides)
+    return environment
+
+def api_routes(template: Dict) -> List[Dict]:
+    routes = []
+    for logical_id, resource in template['Resources'].items():
+        if resource['Type'] != 'AWS::Serverless::Function':
+            continue
+        for event in (resource['Properties'].get('Events') or {}).values():
+            if event.get('Type') != 'Api':
+                continue
+            method = event['Properties']['Method'].upper()
+            path = event['Properties']['Path']
+            if '+}' in path:
+                continue  # Catch-all proxy (the router function); its routes are listed individually
+            routes.append({
+                'name': f'{method} {path}',
+                'method': method,
+                'path': path,
+                'handler': resource['Properties']['Handler'],
+                'function': logical_id
+            })
+    return routes
+
+def resolve_handler(handler: str) -> Callable:
+    module_name, function_name = handler.rsplit('.', 1)
+    return getattr(import_module(module_name), function_name)
+
+# ---------------------------------------------------------------------------
+# Requests
+# ---------------------------------------------------------------------------
+
+class LoadState:
+    """IDs of the borrowers, loans and payments that exist, shared by all workers"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.borrowers: List[str] = []
+        self.loans: List[str] = []
+        self.payments: List[str] = []
+
+    def pick(self, pool: str) -> Optional[str]:
+        with self.lock:
+            ids = getattr(self, pool)
+            return self.rng.choice(ids) if ids else None
+
+    def take(self, pool: str) -> Optional[str]:
+        """Remove and return an ID, for requests that delete the entity"""
+        with self.lock:
+            ids = getattr(self, pool)
+            if not ids:
+                return None
+            return ids.pop(self.rng.randrange(len(ids)))
+
+    def add(self, pool: str, entity_id: Optional[str]) -> None:
+        if entity_id:
+            with self.lock:
+                getattr(self, pool).append(entity_id)
+
+def _random_date(rng: random.Random, max_days_ago: int = 365) -> str:
+    return (datetime.utcnow() - timedelta(days=rng.randint(0, max_days_ago))).isoformat()
+
+def _borrower_body(rng, state):
+    return {'name': f'Load Test {rng.randint(1, 10 ** 6)}', 'phone': f'+1555{rng.randint(1000000, 9999999)}'}
+
+def _loan_body(rng, state):
+    body = {
+        'borrowerId': state.pick('borrowers') or str(uuid.uuid4()),
+        'amount': rng.choice([5000, 10000, 25000, 50000]) + rng.randint(0, 99) / 100,
+        'interestRate': rng.choice([3.5, 5.25, 7.0, 9.9]),
+        'termMonths': rng.choice([12, 24, 36, 60])
+    }
+    if rng.random() < 0.5:
+        body['approvedAt'] = _random_date(rng)
+    return body
+
+def _payment_body(rng, state):
+    return {
+        'amount': rng.randint(50, 2000) + rng.randint(0, 99) / 100,
+        'paymentType': rng.choice(['capital', 'capital', 'interest']),
+        'paymentDate': _random_date(rng, 180)
+    }
+
+def _batch_body(rng, state):
+    loan_ids = [state.pick('loans') for _ in range(rng.randint(10, 40))]
+    return {'payments': [{'loanId': loan_id, **_payment_body(rng, state)} for loan_id in loan_ids if loan_id]}
+
+# Per-route request builders: (path parameters, query string, body) from the current state.
+# A builder returns None when the state cannot supply the request (e.g. no payments yet).
+def _loans_query(rng, state):
+    roll = rng.random()
+    if roll < 0.3:
+        return {'borrowerId': state.pick('borrowers')}
+    if roll < 0.6:
+        return {'status': rng.choice(['pending', 'approved', 'active'])}
+    return None
+
+def _loan_detail_query(rng, state):
+    return {'include': 'payments,cycles,borrower'} if rng.random() < 0.3 else None
+
+BUILDERS = {
+    'POST /borrowers': lambda rng, state: ({}, None, _borrower_body(rng, state)),
+    'POST /loans': lambda rng, state: ({}, None, _loan_body(rng, state)),
+    'GET /loans': lambda rng, state: ({}, _loans_query(rng, state), None),
+    'GET /loans/{id}': lambda rng, state: ({'id': state.pick('loans')}, _loan_detail_query(rng, state), None),
+    'PUT /loans/{id}/status': lambda rng, state: ({'id': state.pick('loans')}, None,
+                                                  {'status': rng.choice(LOAN_STATUSES)}),
+    'DELETE /loans/{id}': lambda rng, state: ({'id': state.take('loans')}, None, None),
+    'POST /loans/{id}/payments': lambda rng, state: ({'id': state.pick('loans')}, None, _payment_body(rng, state)),
+    'PUT /payments/{paymentId}': lambda rng, state: ({'paymentId': state.pick('payments')}, None,
+                                                     {'amount': rng.randint(50, 2000)}),
+    'DELETE /payments/{paymentId}': lambda rng, state: ({'paymentId': state.take('payments')}, None, None),
+    'POST /payments/batch': lambda rng, state: ({}, None, _batch_body(rng, state)),
+}
+
+# Pool that a path parameter is filled from, for routes without a builder
+PATH_PARAMETER_POOLS = {'id': 'loans', 'loanId': 'loans', 'paymentId': 'payments', 'borrowerId': 'borrowers'}
+
+def _generic_request(route: Dict, rng, state):
+    parameters = {}
+    for name in _path_parameter_names(route['path']):
+        pool = 'borrowers' if route['path'].startswith('/borrowers') and name == 'id' else PATH_PARAMETER_POOLS.get(name)
+        parameters[name] = state.pick(pool) if pool else str(uuid.uuid4())
+    return parameters, None, None
+
+def _path_parameter_names(path: str) -> List[str]:
+    return [part[1:-1] for part in path.split('/') if part.startswith('{') and part.endswith('}')]
+
+def build_event(route: Dict, rng: random.Random, state: LoadState) -> Optional[Dict]:
+    """API Gateway proxy event for the route, or None if the state cannot supply it yet"""
+    builder = BUILDERS.get(route['name'])
+    parameters, query, body = builder(rng, state) if builder else _generic_request(route, rng, state)
+    if any(value is None for value in parameters.values()):
+        return None
+    path = route['path']
+    for name, value in parameters.items():
+        path = path.replace('{' + name + '}', value)
+    request_id = str(uuid.uuid4())
+    return {
+        'resource': route['path'],
+        'path': path,
+        'httpMethod': route['method'],
+        'headers': {'Content-Type': 'application/json'},
+        'pathParameters': parameters or None,
+        'queryStringParameters': {k: v for k, v in query.items() if v is not None} if query else None,
+        'body': json.dumps(body) if body is not None else None,
+        'isBase64Encoded': False,
+        'requestContext': {'requestId': request_id, 'resourcePath': route['path'], 'httpMethod': route['method']}
+    }
+
+def record_created(route: Dict, event: Dict, response: Dict, state: LoadState) -> None:
+    """Add the IDs returned by create routes to the shared state"""
+    if route['method'] != 'POST' or response.get('statusCode') not in (201, 207):
+        return
+    try:
+        created = json.loads(response.get('body') or '{}')
+    except ValueError:
+        return
+    if not isinstance(created, dict):
+        return
+    if route['path'] == '/payments/batch':
+        for result in created.get('results', []):
+            state.add('payments', result.get('paymentId'))
+    elif route['path'].endswith('/payments'):
+        state.add('payments', created.get('paymentId'))
+    elif route['path'] == '/loans':
+        state.add('loans', created.get('loanId'))
+    elif route['path'] == '/borrowers':
+        state.add('borrowers', created.get('borrowerId'))
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+class RouteStats:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Dict[int, int] = defaultdict(int)
+        self.skipped = 0
+
+def invoke(route: Dict, handlers: Dict[str, Callable], event: Dict) -> Dict:
+    context = SimpleNamespace(aws_request_id=event['requestContext']['requestId'],
+                              function_name=route['function'])
+    token = current_route.set(route['name'])
+    try:
+        return handlers[route['name']](event, context)
+    finally:
+        current_route.reset(token)
+
+def seed(routes_by_name: Dict[str, Dict], handlers, state: LoadState, rng: random.Random,
+         borrowers: int, loans: int, payments_per_loan: int) -> None:
+    """Create the starting data through the handlers themselves"""
+    plan = [('POST /borrowers', borrowers), ('POST /loans', loans), ('POST /loans/{id}/payments', loans * payments_per_loan)]
+    for name, count in plan:
+        route = routes_by_name.get(name)
+        if not route:
+            continue
+        for _ in range(count):
+            event = build_event(route, rng, state)
+            if event:
+                record_created(route, event, invoke(route, handlers, event), state)
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def run_load(routes: List[Dict], handlers, state: LoadState, mix: Dict[str, float], rng: random.Random,
+             rate: float, duration: float, workers: int) -> Tuple[Dict[str, RouteStats], float]:
+    weights = [mix.get(route['name'], DEFAULT_WEIGHT) for route in routes]
+    stats = {route['name']: RouteStats() for route in routes}
+    stats_lock = threading.Lock()
+    total = int(rate * duration)
+
+    def one_request(route: Dict, scheduled: float):
+        event = build_event(route, rng, state)
+        if event is None:
+            with stats_lock:
+                stats[route['name']].skipped += 1
+            return
+        try:
+            response = invoke(route, handlers, event)
+            status = response.get('statusCode', 0)
+            record_created(route, event, response, state)
+        except Exception:
+            status = 0  # Unhandled exception escaping the handler
+        elapsed_ms = (time.perf_counter() - scheduled) * 1000
+        with stats_lock:
+            stats[route['name']].latencies_ms.append(elapsed_ms)
+            stats[route['name']].statuses[status] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for number in range(total):
+            scheduled = started + number / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            route = rng.choices(routes, weights=weights)[0]
+            # Fresh context per request so the route label does not leak between requests
+            executor.submit(contextvars.Context().run, one_request, route, scheduled)
+    return stats, time.perf_counter() - started
+
+def summarize(stats: Dict[str, RouteStats], storage_calls: Dict[str, Dict[str, int]], elapsed: float) -> Dict:
+    routes = {}
+    all_latencies = []
+    for name, route_stats in sorted(stats.items()):
+        count = len(route_stats.latencies_ms)
+        if not count and not route_stats.skipped:
+            continue
+        latencies = sorted(route_stats.latencies_ms)
+        all_latencies.extend(latencies)
+        calls = storage_calls.get(name, {})
+        routes[name] = {
+            'requests': count,
+            'skipped': route_stats.skipped,
+            'errors': sum(n for status, n in route_stats.statuses.items() if status >= 500 or status == 0),
+            'statusCodes': {str(status): n for status, n in sorted(route_stats.statuses.items())},
+            'p50Ms': round(percentile(latencies, 0.50), 1),
+            'p95Ms': round(percentile(latencies, 0.95), 1),
+            'p99Ms': round(percentile(latencies, 0.99), 1),
+            'storageCalls': sum(calls.values()),
+            'storageCallsPerRequest': round(sum(calls.values()) / count, 2) if count else 0,
+            'storageCallsByOperation': dict(sorted(calls.items()))
+        }
+    all_latencies.sort()
+    return {
+        'durationSeconds': round(elapsed, 2),
+        'requests': len(all_latencies),
+        'throughputPerSecond': round(len(all_latencies) / elapsed, 1) if elapsed else 0,
+        'errors': sum(route['errors'] for route in routes.values()),
+        'p50Ms': round(percentile(all_latencies, 0.50), 1),
+        'p95Ms': round(percentile(all_latencies, 0.95), 1),
+        'p99Ms': round(percentile(all_latencies, 0.99), 1),
+        'routes': routes
+    }
+
+def print_report(summary: Dict) -> None:
+    print(f"\n{summary['requests']} requests in {summary['durationSeconds']}s "
+          f"({summary['throughputPerSecond']} req/s), {summary['errors']} errors, "
+          f"p50 {summary['p50Ms']}ms  p95 {summary['p95Ms']}ms  p99 {summary['p99Ms']}ms\n")
+    header = f"{'Route':<36}{'Reqs':>7}{'Err':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'DB calls/req':>14}  Statuses"
+    print(header)
+    print('-' * len(header))
+    for name, route in summary['routes'].items():
+        statuses = ' '.join(f'{status}:{n}' for status, n in route['statusCodes'].items())
+        if route['skipped']:
+            statuses += f" skipped:{route['skipped']}"
+        print(f"{name:<36}{route['requests']:>7}{route['errors']:>6}{route['p50Ms']:>9}{route['p95Ms']:>9}"
+              f"{route['p99Ms']:>9}{route['storageCallsPerRequest']:>14}  {statuses}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the API handlers against an in-memory DynamoDB stand-in')
+    parser.add_argument('--template', default=os.path.join(BACKEND_DIR, 'template.yaml'))
+    parser.add_argument('--rate', type=float, default=100.0, help='Requests per second (API throttle is 100)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds of load')
+    parser.add_argument('--workers', type=int, default=64, help='Concurrent in-flight requests')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='read_heavy')
+    parser.add_argument('--read-latency-ms', type=float, default=5.0, help='Simulated latency per read call')
+    parser.add_argument('--write-latency-ms', type=float, default=8.0, help='Simulated latency per write call')
+    parser.add_argument('--storage-mode', choices=['multi_table', 'single_table'], default='multi_table')
+    parser.add_argument('--router', action='store_true',
+                        help='Send every request through handlers.router.route, as with ApiDeployment=router')
+    parser.add_argument('--borrowers', type=int, default=50, help='Borrowers created before the run')
+    parser.add_argument('--loans', type=int, default=200, help='Loans created before the run')
+    parser.add_argument('--payments-per-loan', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for a repeatable request sequence')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    template = load_template(args.template)
+    os.environ.update(function_environment(template, {
+        'STORAGE_MODE': args.storage_mode,
+        'STREAM_SIDE_EFFECTS': 'false',  # Streams do not exist locally; side effects run inline
+        'PROFILE_SAMPLE_RATE': '0'
+    }))
+    database = MemoryDynamoDB(table_schemas(template))
+    install(database)
+
+    routes = api_routes(template)
+    if args.router:
+        routes = [{**route, 'handler': 'handlers.router.route', 'function': 'ApiRouterFunction'} for route in routes]
+    handlers = {route['name']: resolve_handler(route['handler']) for route in routes}
+    routes_by_name = {route['name']: route for route in routes}
+    rng = random.Random(args.seed)
+    state = LoadState(rng)
+
+    # Handler logging goes to stderr so stdout only carries the report
+    with contextlib.redirect_stdout(sys.stderr):
+        seed(routes_by_name, handlers, state, rng, args.borrowers, args.loans, args.payments_per_loan)
+        database.stats.reset()
+        database.read_latency_ms = args.read_latency_ms
+        database.write_latency_ms = args.write_latency_ms
+        stats, elapsed = run_load(routes, handlers, state, MIXES[args.mix], rng, args.rate, args.duration, args.workers)
+    summary = summarize(stats, database.stats.snapshot(), elapsed)
+    summary.update({'mix': args.mix, 'targetRate': args.rate, 'storageMode': args.storage_mode,
+                    'apiDeployment': 'router' if args.router else 'per_route'})
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+
+if __name__ == '__main__':
+    main()
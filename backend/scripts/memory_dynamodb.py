@@ -0,0 +1,604 @@
+"""
+In-memory stand-in for the boto3 DynamoDB resource, for local load tests.
+
+Implements the subset of the Table / resource API the backend uses (get, put,
+update, delete, query and scan with key, filter, condition and update
+expressions, GSIs with their projections, batch_get_item, batch_write_item
+and batch_writer), adds a configurable simulated latency per call and counts
+storage calls per operation under the label set in `current_route`.
+
+    from memory_dynamodb import MemoryDynamoDB, install
+    fake = MemoryDynamoDB(schemas, read_latency_ms=5, write_latency_ms=8)
+    install(fake)  # boto3.resource('dynamodb') now returns the stand-in
+"""
+import contextvars
+import copy
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import boto3
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from botocore.exceptions import ClientError
+
+# Label the storage calls made by the current request are counted under
+current_route: contextvars.ContextVar = contextvars.ContextVar('current_route', default='(unlabelled)')
+
+READ_OPERATIONS = {'GetItem', 'Query', 'Scan', 'BatchGetItem'}
+
+class ConditionalCheckFailedException(ClientError):
+    def __init__(self, operation_name: str):
+        super().__init__(
+            {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}},
+            operation_name
+        )
+
+class TransactionCanceledException(ClientError):
+    def __init__(self):
+        super().__init__(
+            {'Error': {'Code': 'TransactionCanceledException',
+                       'Message': 'Transaction cancelled, please refer cancellation reasons for specific reasons'}},
+            'TransactWriteItems'
+        )
+
+_exceptions = SimpleNamespace(
+    ConditionalCheckFailedException=ConditionalCheckFailedException,
+    TransactionCanceledException=TransactionCanceledException
+)
+
+# ---------------------------------------------------------------------------
+# Expression parsing
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(r'\s*(?:(<=|>=|<>|[=<>(),+\-])|(:[A-Za-z0-9_]+)|(#?[A-Za-z_][A-Za-z0-9_.\-]*))')
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'ADD', 'REMOVE', 'DELETE'}
+
+def _tokenize(expression: str) -> List[str]:
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(f'Cannot parse expression near: {expression[position:]}')
+        tokens.append(match.group(match.lastindex))
+        position = match.end()
+    return tokens
+
+class _Parser:
+    def __init__(self, expression: str, names: Dict, values: Dict):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token.upper() != expected):
+            raise ValueError(f'Expected {expected!r}, found {token!r}')
+        self.position += 1
+        return token
+
+    def path(self, token: str) -> str:
+        return self.names[token] if token.startswith('#') else token
+
+    # Operands evaluate to a value for an item (or _MISSING)
+    def operand(self) -> Callable[[Dict], Any]:
+        token = self.take()
+        if token.startswith(':'):
+            value = self.values[token]
+            return lambda item: value
+        if self.peek() == '(':
+            return self.function(token)
+        name = self.path(token)
+        return lambda item: item.get(name, _MISSING)
+
+    def function(self, name: str) -> Callable[[Dict], Any]:
+        self.take('(')
+        arguments = []
+        if self.peek() != ')':
+            while True:
+                if self.peek() and not self.peek().startswith(':') and self.tokens[self.position + 1:self.position + 2] != ['(']:
+                    arguments.append(('path', self.path(self.take())))
+                else:
+                    arguments.append(('value', self.operand()))
+                if self.peek() == ',':
+                    self.take(',')
+                    continue
+                break
+        self.take(')')
+        lowered = name.lower()
+
+        def argument_value(argument, item):
+            kind, value = argument
+            return item.get(value, _MISSING) if kind == 'path' else value(item)
+
+        if lowered == 'attribute_exists':
+            return lambda item: arguments[0][1] in item
+        if lowered == 'attribute_not_exists':
+            return lambda item: arguments[0][1] not in item
+        if lowered == 'begins_with':
+            return lambda item: isinstance(argument_value(arguments[0], item), str) and \
+                argument_value(arguments[0], item).startswith(argument_value(arguments[1], item))
+        if lowered == 'contains':
+            return lambda item: _contains(argument_value(arguments[0], item), argument_value(arguments[1], item))
+        if lowered == 'size':
+            return lambda item: len(argument_value(arguments[0], item))
+        if lowered == 'if_not_exists':
+            return lambda item: argument_value(arguments[1], item) if arguments[0][1] not in item else item[arguments[0][1]]
+        raise ValueError(f'Unsupported function: {name}')
+
+    # Conditions evaluate to a bool for an item
+    def condition(self) -> Callable[[Dict], bool]:
+        left = self.conjunction()
+        while self.peek() and self.peek().upper() == 'OR':
+            self.take('OR')
+            right = self.conjunction()
+            left = (lambda a, b: lambda item: a(item) or b(item))(left, right)
+        return left
+
+    def conjunction(self) -> Callable[[Dict], bool]:
+        left = self.negation()
+        while self.peek() and self.peek().upper() == 'AND':
+            self.take('AND')
+            right = self.negation()
+            left = (lambda a, b: lambda item: a(item) and b(item))(left, right)
+        return left
+
+    def negation(self) -> Callable[[Dict], bool]:
+        if self.peek() and self.peek().upper() == 'NOT':
+            self.take('NOT')
+            inner = self.negation()
+            return lambda item: not inner(item)
+        if self.peek() == '(':
+            self.take('(')
+            inner = self.condition()
+            self.take(')')
+            return inner
+        left = self.operand()
+        token = self.peek()
+        if token is None or token.upper() in ('AND', 'OR') or token == ')':
+            return lambda item: bool(left(item))
+        if token.upper() == 'BETWEEN':
+            self.take('BETWEEN')
+            low = self.operand()
+            self.take('AND')
+            high = self.operand()
+            return lambda item: _compare(left(item), low(item), '>=') and _compare(left(item), high(item), '<=')
+        if token.upper() == 'IN':
+            self.take('IN')
+            self.take('(')
+            options = [self.operand()]
+            while self.peek() == ',':
+                self.take(',')
+                options.append(self.operand())
+            self.take(')')
+            return lambda item: any(left(item) == option(item) for option in options)
+        operator = self.take()
+        right = self.operand()
+        return lambda item: _compare(left(item), right(item), operator)
+
+class _Missing:
+    pass
+
+_MISSING = _Missing()
+
+def _contains(container, value) -> bool:
+    if container is _MISSING:
+        return False
+    return value in container
+
+def _compare(left, right, operator: str) -> bool:
+    if left is _MISSING or right is _MISSING:
+        return operator == '<>' and left is not right
+    try:
+        if operator == '=':
+            return left == right
+        if operator == '<>':
+            return left != right
+        if operator == '<':
+            return left < right
+        if operator == '<=':
+            return left <= right
+        if operator == '>':
+            return left > right
+        if operator == '>=':
+            return left >= right
+    except TypeError:
+        return False
+    raise ValueError(f'Unsupported operator: {operator}')
+
+def _resolve_condition(condition, names: Dict, values: Dict, is_key_condition: bool = False):
+    """Accept either an expression string or a boto3 conditions object"""
+    if condition is None:
+        return None
+    if isinstance(condition, ConditionBase):
+        built = ConditionExpressionBuilder().build_expression(condition, is_key_condition=is_key_condition)
+        names = {**(names or {}), **built.attribute_name_placeholders}
+        values = {**(values or {}), **built.attribute_value_placeholders}
+        condition = built.condition_expression
+    parser = _Parser(condition, names, values)
+    predicate = parser.condition()
+    if parser.peek() is not None:
+        raise ValueError(f'Unexpected token {parser.peek()!r} in {condition!r}')
+    return predicate
+
+def _apply_update(item: Dict, expression: str, names: Dict, values: Dict) -> None:
+    parser = _Parser(expression, names, values)
+    clause = None
+    while parser.peek() is not None:
+        token = parser.peek()
+        if token.upper() in ('SET', 'ADD', 'REMOVE', 'DELETE'):
+            clause = parser.take().upper()
+            continue
+        if token == ',':
+            parser.take(',')
+            continue
+        name = parser.path(parser.take())
+        if clause == 'SET':
+            parser.take('=')
+            value = parser.operand()(item)
+            while parser.peek() in ('+', '-'):
+                operator = parser.take()
+                other = parser.operand()(item)
+                value = value + other if operator == '+' else value - other
+            item[name] = _normalize(value)
+        elif clause == 'ADD':
+            value = _normalize(parser.operand()(item))
+            if isinstance(value, set):
+                item[name] = set(item.get(name, set())) | value
+            else:
+                item[name] = item.get(name, Decimal(0)) + value
+        elif clause == 'REMOVE':
+            item.pop(name, None)
+        elif clause == 'DELETE':
+            value = parser.operand()(item)
+            item[name] = set(item.get(name, set())) - set(value)
+        else:
+            raise ValueError(f'Unsupported update expression: {expression}')
+
+def _normalize(value):
+    """Mirror boto3's type handling: ints become Decimal and floats are rejected"""
+    if isinstance(value, bool) or value is None or isinstance(value, (str, bytes, Decimal)):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError('Float types are not supported. Use Decimal types instead.')
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, set):
+        return {_normalize(v) for v in value}
+    return value
+
+def _sort_value(value):
+    return (0, value) if value is not _MISSING and value is not None else (1, '')
+
+# ---------------------------------------------------------------------------
+# Tables
+# ---------------------------------------------------------------------------
+
+class _BatchWriter:
+    def __init__(self, table: 'MemoryTable'):
+        self.table = table
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._flush()
+        return False
+
+    def _queued(self):
+        self.pending += 1
+        if self.pending == 25:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.table.database.record('BatchWriteItem', write=True)
+            self.pending = 0
+
+    def put_item(self, Item):
+        self.table._put(Item)
+        self._queued()
+
+    def delete_item(self, Key):
+        self.table._delete(Key)
+        self._queued()
+
+class MemoryTable:
+    def __init__(self, database: 'MemoryDynamoDB', name: str, schema: Dict):
+        self.database = database
+        self.name = name
+        self.table_name = name
+        self.hash_key, self.range_key = schema['key']
+        self.indexes = schema.get('indexes', {})
+        self.key_schema = [{'AttributeName': self.hash_key, 'KeyType': 'HASH'}]
+        if self.range_key:
+            self.key_schema.append({'AttributeName': self.range_key, 'KeyType': 'RANGE'})
+        self.items: Dict[Tuple, Dict] = {}
+        self.meta = SimpleNamespace(client=database.meta.client)
+
+    def _key(self, item: Dict) -> Tuple:
+        return (item[self.hash_key], item.get(self.range_key) if self.range_key else None)
+
+    def _put(self, item: Dict) -> None:
+        with self.database.lock:
+            self.items[self._key(item)] = _normalize(copy.deepcopy(item))
+
+    def _delete(self, key: Dict) -> None:
+        with self.database.lock:
+            self.items.pop(self._key(key), None)
+
+    def _project(self, item: Dict, projection_expression: Optional[str], names: Dict) -> Dict:
+        if not projection_expression:
+            return copy.deepcopy(item)
+        attributes = [(names or {}).get(part.strip(), part.strip()) for part in projection_expression.split(',')]
+        return {name: copy.deepcopy(item[name]) for name in attributes if name in item}
+
+    def _check(self, current: Optional[Dict], condition, names, values, operation: str) -> None:
+        predicate = _resolve_condition(condition, names, values)
+        if predicate and not predicate(current or {}):
+            raise ConditionalCheckFailedException(operation)
+
+    # Item operations
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        self.database.record('PutItem', write=True)
+        with self.database.lock:
+            self._check(self.items.get(self._key(Item)), ConditionExpression,
+                        ExpressionAttributeNames, ExpressionAttributeValues, 'PutItem')
+            self._put(Item)
+        return {}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.database.record('GetItem')
+        with self.database.lock:
+            item = self.items.get(self._key(Key))
+            return {'Item': self._project(item, ProjectionExpression, ExpressionAttributeNames)} if item else {}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **kwargs):
+        self.database.record('DeleteItem', write=True)
+        with self.database.lock:
+            self._check(self.items.get(self._key(Key)), ConditionExpression,
+                        ExpressionAttributeNames, ExpressionAttributeValues, 'DeleteItem')
+            self._delete(Key)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE', **kwargs):
+        self.database.record('UpdateItem', write=True)
+        with self.database.lock:
+            current = self.items.get(self._key(Key))
+            self._check(current, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'UpdateItem')
+            item = copy.deepcopy(current) if current else copy.deepcopy(Key)
+            _apply_update(item, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            self._put(item)
+            if ReturnValues in ('ALL_NEW', 'UPDATED_NEW'):
+                return {'Attributes': copy.deepcopy(self.items[self._key(item)])}
+        return {}
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self)
+
+    # Reads over many items
+    def _index_view(self, index_name: Optional[str]):
+        """Items visible through the table or a GSI, with that index's keys and projection"""
+        if not index_name:
+            return list(self.items.values()), self.hash_key, self.range_key, None
+        index = self.indexes[index_name]
+        hash_key, range_key = index['key']
+        table_keys = {self.hash_key, self.range_key} - {None}
+        index_keys = {hash_key, range_key} - {None}
+        visible = []
+        for item in self.items.values():
+            if hash_key not in item or (range_key and range_key not in item):
+                continue  # Sparse index
+            if index['projection'] == 'KEYS_ONLY':
+                item = {name: item[name] for name in table_keys | index_keys}
+            elif index['projection'] == 'INCLUDE':
+                wanted = table_keys | index_keys | set(index.get('include', []))
+                item = {name: value for name, value in item.items() if name in wanted}
+            visible.append(item)
+        return visible, hash_key, range_key, table_keys | index_keys
+
+    def _page(self, items: List[Dict], key_names, limit, exclusive_start_key, projection, names):
+        if exclusive_start_key:
+            start_signature = tuple(exclusive_start_key.get(name) for name in key_names)
+            for index, item in enumerate(items):
+                if tuple(item.get(name) for name in key_names) == start_signature:
+                    items = items[index + 1:]
+                    break
+        last_evaluated_key = None
+        if limit is not None and len(items) > limit:
+            items = items[:limit]
+            last_evaluated_key = {name: items[-1][name] for name in key_names if name in items[-1]}
+        return items, last_evaluated_key
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None, ExpressionAttributeNames=None,
+              ExpressionAttributeValues=None, ScanIndexForward=True, Limit=None, ExclusiveStartKey=None,
+              ProjectionExpression=None, Select=None, **kwargs):
+        self.database.record('Query')
+        key_predicate = _resolve_condition(KeyConditionExpression, ExpressionAttributeNames,
+                                           ExpressionAttributeValues, is_key_condition=True)
+        filter_predicate = _resolve_condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        with self.database.lock:
+            visible, hash_key, range_key, index_keys = self._index_view(IndexName)
+            matched = [item for item in visible if key_predicate(item)]
+            if range_key:
+                matched.sort(key=lambda item: _sort_value(item.get(range_key, _MISSING)), reverse=not ScanIndexForward)
+            elif not ScanIndexForward:
+                matched.reverse()
+            key_names = sorted(index_keys) if index_keys else [name for name in (self.hash_key, self.range_key) if name]
+            page, last_evaluated_key = self._page(matched, key_names, Limit, ExclusiveStartKey,
+                                                  ProjectionExpression, ExpressionAttributeNames)
+            scanned = len(page)
+            if filter_predicate:
+                page = [item for item in page if filter_predicate(item)]
+            items = [self._project(item, ProjectionExpression, ExpressionAttributeNames) for item in page]
+        response = {'Items': items, 'Count': len(items), 'ScannedCount': scanned}
+        if Select == 'COUNT':
+            response.pop('Items')
+        if last_evaluated_key:
+            response['LastEvaluatedKey'] = last_evaluated_key
+        return response
+
+    def scan(self, FilterExpression=None, IndexName=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+             Limit=None, ExclusiveStartKey=None, ProjectionExpression=None, Segment=None, TotalSegments=None,
+             Select=None, **kwargs):
+        self.database.record('Scan')
+        filter_predicate = _resolve_condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        with self.database.lock:
+            visible, hash_key, range_key, index_keys = self._index_view(IndexName)
+            if TotalSegments:
+                visible = [item for item in visible if hash(str(item.get(self.hash_key))) % TotalSegments == Segment]
+            key_names = sorted(index_keys) if index_keys else [name for name in (self.hash_key, self.range_key) if name]
+            page, last_evaluated_key = self._page(visible, key_names, Limit, ExclusiveStartKey,
+                                                  ProjectionExpression, ExpressionAttributeNames)
+            scanned = len(page)
+            if filter_predicate:
+                page = [item for item in page if filter_predicate(item)]
+            items = [self._project(item, ProjectionExpression, ExpressionAttributeNames) for item in page]
+        response = {'Items': items, 'Count': len(items), 'ScannedCount': scanned}
+        if Select == 'COUNT':
+            response.pop('Items')
+        if last_evaluated_key:
+            response['LastEvaluatedKey'] = last_evaluated_key
+        return response
+
+# ---------------------------------------------------------------------------
+# Resource
+# ---------------------------------------------------------------------------
+
+class StorageStats:
+    """Storage calls per route label and operation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route: str, operation: str) -> None:
+        with self.lock:
+            self.calls[route][operation] += 1
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {route: dict(operations) for route, operations in self.calls.items()}
+
+class MemoryDynamoDB:
+    """
+    Stand-in for boto3.resource('dynamodb').
+
+    `schemas` maps table name to {'key': (hash, range), 'indexes':
+    {name: {'key': (hash, range), 'projection': 'ALL' | 'KEYS_ONLY' | 'INCLUDE'}}}.
+    Every call sleeps for the simulated latency (with +/- jitter) outside the
+    store lock, so concurrent requests overlap the way network calls do.
+    """
+
+    def __init__(self, schemas: Dict[str, Dict], read_latency_ms: float = 0.0,
+                 write_latency_ms: float = 0.0, jitter: float = 0.25):
+        self.lock = threading.RLock()
+        self.read_latency_ms = read_latency_ms
+        self.write_latency_ms = write_latency_ms
+        self.jitter = jitter
+        self.stats = StorageStats()
+        self.meta = SimpleNamespace(client=SimpleNamespace(
+            exceptions=_exceptions,
+            transact_write_items=self.transact_write_items
+        ))
+        self.tables = {name: MemoryTable(self, name, schema) for name, schema in schemas.items()}
+
+    def record(self, operation: str, write: bool = False) -> None:
+        self.stats.record(current_route.get(), operation)
+        latency_ms = self.write_latency_ms if write else self.read_latency_ms
+        if latency_ms > 0:
+            time.sleep(latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+    def Table(self, name: str) -> MemoryTable:
+        if name not in self.tables:
+            raise KeyError(f'Unknown table {name}; known tables: {", ".join(sorted(self.tables))}')
+        return self.tables[name]
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self.record('BatchGetItem')
+        responses = {}
+        with self.lock:
+            for table_name, request in RequestItems.items():
+                table = self.Table(table_name)
+                found = []
+                for key in request['Keys']:
+                    item = table.items.get(table._key(key))
+                    if item:
+                        found.append(table._project(item, request.get('ProjectionExpression'),
+                                                    request.get('ExpressionAttributeNames')))
+                responses[table_name] = found
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self.record('BatchWriteItem', write=True)
+        with self.lock:
+            for table_name, requests in RequestItems.items():
+                table = self.Table(table_name)
+                for request in requests:
+                    if 'PutRequest' in request:
+                        table._put(request['PutRequest']['Item'])
+                    else:
+                        table._delete(request['DeleteRequest']['Key'])
+        return {'UnprocessedItems': {}}
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        """All conditions are checked before any write, so either every action applies or none does"""
+        self.record('TransactWriteItems', write=True)
+        with self.lock:
+            actions = []
+            for transact_item in TransactItems:
+                (action, request), = transact_item.items()
+                table = self.Table(request['TableName'])
+                key = request['Item'] if action == 'Put' else request['Key']
+                try:
+                    table._check(table.items.get(table._key(key)), request.get('ConditionExpression'),
+                                 request.get('ExpressionAttributeNames'), request.get('ExpressionAttributeValues'),
+                                 'TransactWriteItems')
+                except ConditionalCheckFailedException:
+                    raise TransactionCanceledException()
+                actions.append((action, request, table, key))
+            for action, request, table, key in actions:
+                if action == 'Put':
+                    table._put(request['Item'])
+                elif action == 'Delete':
+                    table._delete(key)
+                elif action == 'Update':
+                    current = table.items.get(table._key(key))
+                    item = copy.deepcopy(current) if current else copy.deepcopy(key)
+                    _apply_update(item, request['UpdateExpression'], request.get('ExpressionAttributeNames'),
+                                  request.get('ExpressionAttributeValues'))
+                    table._put(item)
+        return {}
+
+def install(database: MemoryDynamoDB) -> None:
+    """Route boto3.resource('dynamodb', ...) to the stand-in"""
+    original = boto3.resource
+
+    def resource(service_name, *args, **kwargs):
+        if service_name == 'dynamodb':
+            return database
+        return original(service_name, *args, **kwargs)
+
+    boto3.resource = resource
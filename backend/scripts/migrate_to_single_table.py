@@ -0,0 +1,57 @@
+"""
+Copy loans, payments and interest cycles from the per-entity tables into the
+single-table layout used when STORAGE_MODE=single_table.
+
+Each source table is read with a parallel Scan (one worker per segment) and
+written with batched puts, so the copy can be re-run safely at any time.
+
+Usage:
+    python scripts/migrate_to_single_table.py \
+        --loans-table Loans-Dev --payments-table Payments-Dev \
+        --cycles-table InterestCycles-Dev --target-table LoanHistory-Dev \
+        --segments 8
+"""
+import argparse
+import os
+
+from bulk_scan import add_scan_arguments, parallel_scan  # also puts backend/src on sys.path
+from services.single_table_service import to_single_table_item
+
+def copy_items(dynamodb, target_name: str, entity_type: str, items) -> int:
+    copied = 0
+    with dynamodb.Table(target_name).batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=to_single_table_item(entity_type, item))
+            copied += 1
+    return copied
+
+def migrate(loans_table: str, payments_table: str, cycles_table: str,
+            target_table: str, segments: int, read_capacity: float = 0, write_capacity: float = 0) -> dict:
+    sources = {
+        loans_table: 'loan',
+        payments_table: 'payment',
+        cycles_table: 'cycle',
+    }
+
+    def copy_source_items(dynamodb, source_name: str, items) -> int:
+        return copy_items(dynamodb, target_table, sources[source_name], items)
+
+    counts = parallel_scan(list(sources), copy_source_items, segments, read_capacity, write_capacity)
+    return {entity_type: counts[source_name] for source_name, entity_type in sources.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy loan data into the single-table layout')
+    parser.add_argument('--loans-table', default=os.environ.get('LOANS_TABLE', 'Loans'))
+    parser.add_argument('--payments-table', default=os.environ.get('PAYMENTS_TABLE', 'Payments'))
+    parser.add_argument('--cycles-table', default=os.environ.get('INTEREST_CYCLES_TABLE', 'InterestCycles'))
+    parser.add_argument('--target-table', default=os.environ.get('SINGLE_TABLE', 'LoanHistory'))
+    add_scan_arguments(parser, segments_help='Parallel scan segments per source table')
+    args = parser.parse_args()
+
+    counts = migrate(args.loans_table, args.payments_table, args.cycles_table,
+                     args.target_table, args.segments, args.read_capacity, args.write_capacity)
+    print(f"Copied {counts['loan']} loans, {counts['payment']} payments "
+          f"and {counts['cycle']} interest cycles into {args.target_table}")
+
+if __name__ == '__main__':
+    main()
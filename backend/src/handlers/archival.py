@@ -0,0 +1,79 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+from services.async_dynamodb_service import MAX_CONCURRENT_CALLS
+from services.factory import create_db_service
+from services.loan_archive import ARCHIVE_AFTER_DAYS, ARCHIVING_STATUS, SETTLED_STATUS, LoanArchive
+from services.throughput import background_job
+from utils.async_bridge import gather, run_sync
+from utils.profiling import profiled
+from utils.response import success_response, error_response
+
+db_service = create_db_service()
+loan_archive = LoanArchive(db_service)
+
+# Loans archived concurrently
+ARCHIVE_CONCURRENCY = int(os.environ.get('ARCHIVE_CONCURRENCY', '4'))
+# Largest "concurrency" an archival invocation may ask for: each loan is archived on one thread of
+# the shared executor (DYNAMODB_MAX_CONCURRENCY threads), so anything above that would only queue
+MAX_ARCHIVE_CONCURRENCY = MAX_CONCURRENT_CALLS
+
+def archive_candidates(older_than_days: int) -> List[Dict]:
+    """Settled loans unchanged for older_than_days, plus loans whose archival was interrupted"""
+    cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).isoformat()
+    settled, interrupted = gather(
+        db_service.async_service.get_loans_by_status(SETTLED_STATUS),
+        db_service.async_service.get_loans_by_status(ARCHIVING_STATUS)
+    )
+    return [loan for loan in settled if loan.get('updatedAt', '') < cutoff] + interrupted
+
+async def _archive_loans(loan_ids: List[str], concurrency: int) -> List[bool]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def archive(loan_id):
+        async with semaphore:
+            try:
+                return await loan_archive.async_service.archive_loan(loan_id)
+            except Exception as e:
+                print(f"Error archiving loan {loan_id}: {str(e)}")
+                return False
+
+    return await asyncio.gather(*[archive(loan_id) for loan_id in loan_ids])
+
+@profiled
+@background_job
+def archive_settled_loans(event, context):
+    """
+    Scheduled job moving settled loans with their payments and interest
+    cycles to the archive table, leaving a tombstone in the hot table.
+
+    Invoke with {"olderThanDays": N} to override ARCHIVE_AFTER_DAYS and
+    {"concurrency": N} to archive more loans at once.
+    """
+    try:
+        event = event or {}
+        older_than_days = int(event.get('olderThanDays', ARCHIVE_AFTER_DAYS))
+        try:
+            concurrency = int(event.get('concurrency', ARCHIVE_CONCURRENCY))
+        except (TypeError, ValueError):
+            concurrency = 0
+        if not 1 <= concurrency <= MAX_ARCHIVE_CONCURRENCY:
+            return error_response(f'concurrency must be a number from 1 to {MAX_ARCHIVE_CONCURRENCY}', 400)
+
+        loans = archive_candidates(older_than_days)
+        archived = run_sync(_archive_loans([loan['loanId'] for loan in loans], concurrency))
+        loans_archived = sum(archived)
+        if loans_archived:
+            db_service.bump_data_version()
+
+        print(f"Archived {loans_archived} of {len(loans)} candidate loans")
+        return success_response({
+            'message': 'Archived settled loans',
+            'candidates': len(loans),
+            'loansArchived': loans_archived
+        })
+
+    except Exception as e:
+        print(f"Error archiving loans: {str(e)}")
+        return error_response(str(e), 500)
@@ -1,11 +1,13 @@
 import json
 import uuid
 from datetime import datetime
-from services.dynamodb_service import DynamoDBService
+from services.factory import create_db_service
+from utils.profiling import profiled
 from utils.response import success_response, error_response
 
-db_service = DynamoDBService()
+db_service = create_db_service()
 
+@profiled
 def create_borrower(event, context):
     try:
         body = json.loads(event['body'])
@@ -28,14 +30,32 @@ def create_borrower(event, context):
     except Exception as e:
         return error_response(str(e), 500)
 
+# Results returned by a borrower search (?q=), unless ?limit= asks for fewer
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+@profiled
 def get_borrowers(event, context):
     try:
-        borrowers = db_service.get_all_borrowers()
+        query_params = event.get('queryStringParameters') or {}
+        query = (query_params.get('q') or '').strip()
+        
+        if query:
+            try:
+                limit = int(query_params.get('limit', SEARCH_LIMIT))
+            except ValueError:
+                return error_response('limit must be a number', 400)
+            if not 1 <= limit <= MAX_SEARCH_LIMIT:
+                return error_response(f'limit must be between 1 and {MAX_SEARCH_LIMIT}', 400)
+            borrowers = db_service.search_borrowers(query, limit)
+        else:
+            borrowers = db_service.get_all_borrowers()
         return success_response(borrowers)
         
     except Exception as e:
         return error_response(str(e), 500)
 
+@profiled
 def get_borrower(event, context):
     try:
         borrower_id = event['pathParameters']['id']
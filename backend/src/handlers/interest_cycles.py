@@ -1,135 +1,243 @@
+import asyncio
 import json
+import os
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from dateutil.relativedelta import relativedelta
-from services.dynamodb_service import DynamoDBService
+from typing import Dict, List, Optional
+from services.async_dynamodb_service import MAX_CONCURRENT_CALLS
+from services.factory import create_db_service
+from services.loan_archive import LoanArchive, include_archived
+from services.throughput import background_job
+from utils.async_bridge import gather, run_sync
+from utils.money import item_cents, money_attributes, monthly_interest_cents, rate_units
+from utils.profiling import profiled
 from utils.response import success_response, error_response
 
-db_service = DynamoDBService()
+db_service = create_db_service()
+loan_archive = LoanArchive(db_service)
 
-def create_initial_interest_cycle(loan_id: str) -> None:
+# Maximum conditional puts in flight while backfilling missed cycles
+CATCH_UP_CONCURRENCY = int(os.environ.get('CYCLE_CATCH_UP_CONCURRENCY', '8'))
+# Largest "concurrency" a catch-up invocation may ask for: the writes run on the shared executor,
+# which has DYNAMODB_MAX_CONCURRENCY threads, so anything above that would only queue
+MAX_CATCH_UP_CONCURRENCY = MAX_CONCURRENT_CALLS
+
+def interest_cycle_id(loan_id: str, cycle_start_date: str) -> str:
+    """Deterministic cycle ID so retried or duplicated writes target the same item"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f'interest-cycle/{loan_id}/{cycle_start_date}'))
+
+def build_interest_cycle(loan: Dict, cycle_number: int, cycle_start_date, balance_cents: int) -> Dict:
+    """Build the interest cycle item starting on cycle_start_date for the given balance (in cents)"""
+    interest_rate = Decimal(str(loan.get('interestRate', 0)))
+    
+    # Calculate interest for this cycle
+    monthly_interest = monthly_interest_cents(balance_cents, rate_units(interest_rate))
+    
+    # Calculate cycle end date (day before next cycle)
+    cycle_end_date = (cycle_start_date + relativedelta(months=1)) - timedelta(days=1)
+    cycle_start_str = cycle_start_date.isoformat()
+    
+    return {
+        'cycleId': interest_cycle_id(loan['loanId'], cycle_start_str),
+        'loanId': loan['loanId'],
+        'cycleNumber': cycle_number,
+        'cycleStartDate': cycle_start_str,
+        'cycleEndDate': cycle_end_date.isoformat(),
+        'interestRate': interest_rate,
+        **money_attributes(principalBalance=balance_cents, interestAmount=monthly_interest),
+        'createdAt': datetime.utcnow().isoformat()
+    }
+
+def ensure_initial_interest_cycle(loan_id: str, loan: Optional[Dict] = None) -> bool:
+    """
+    Create the first interest cycle of an approved loan unless it already exists.
+    Callers that already hold the current loan item can pass it to skip re-reading it.
+    Safe to call repeatedly: the cycle is written with a conditional put.
+    Returns True if a cycle was created.
+    """
+    if loan is None:
+        # Fetch the loan and its existing cycles concurrently
+        loan, cycles = gather(
+            db_service.async_service.get_loan(loan_id),
+            db_service.async_service.get_interest_cycles_by_loan(loan_id)
+        )
+    else:
+        cycles = db_service.get_interest_cycles_by_loan(loan_id)
+    if not loan or not loan.get('approvedAt'):
+        return False
+    
+    # Parse approval date
+    approved_date = datetime.fromisoformat(loan['approvedAt'].replace('Z', '+00:00')).date()
+    cycle_start_str = approved_date.isoformat()
+    
+    # Check if first cycle already exists
+    if any(cycle.get('cycleStartDate') == cycle_start_str for cycle in cycles):
+        return False  # Already created
+    
+    # Get current balance amount
+    if 'balanceAmount' in loan or 'balanceAmountCents' in loan:
+        balance_cents = item_cents(loan, 'balanceAmount')
+    else:
+        balance_cents = item_cents(loan, 'amount')
+    cycle = build_interest_cycle(loan, 1, approved_date, balance_cents)
+    
+    return db_service.create_interest_cycle_if_absent(cycle)
+
+def create_initial_interest_cycle(loan_id: str, loan: Optional[Dict] = None) -> None:
     """
     Create the first interest cycle when a loan is approved
     This should be called immediately when a loan is created or approved
     """
     try:
-        loan = db_service.get_loan(loan_id)
-        if not loan or not loan.get('approvedAt'):
-            return
-        
-        # Parse approval date
-        approved_date = datetime.fromisoformat(loan['approvedAt'].replace('Z', '+00:00')).date()
-        cycle_start_str = approved_date.isoformat()
-        
-        # Check if first cycle already exists
-        existing_cycle = db_service.get_interest_cycle_by_date(loan_id, cycle_start_str)
-        if existing_cycle:
-            return  # Already created
-        
-        # Get current balance amount
-        balance_amount = Decimal(str(loan.get('balanceAmount', loan.get('amount', 0))))
-        interest_rate = Decimal(str(loan.get('interestRate', 0)))
-        
-        # Calculate interest for this cycle
-        monthly_interest = balance_amount * (interest_rate / Decimal('100'))
-        
-        # Calculate cycle end date (day before next cycle)
-        cycle_end_date = (approved_date + relativedelta(months=1)) - timedelta(days=1)
-        
-        cycle = {
-            'cycleId': str(uuid.uuid4()),
-            'loanId': loan_id,
-            'cycleNumber': 1,
-            'cycleStartDate': cycle_start_str,
-            'cycleEndDate': cycle_end_date.isoformat(),
-            'principalBalance': balance_amount,
-            'interestRate': interest_rate,
-            'interestAmount': monthly_interest,
-            'createdAt': datetime.utcnow().isoformat()
-        }
-        
-        db_service.create_interest_cycle(cycle)
-        print(f"Created initial interest cycle for loan {loan_id}")
+        if ensure_initial_interest_cycle(loan_id, loan):
+            print(f"Created initial interest cycle for loan {loan_id}")
         
     except Exception as e:
         print(f"Error creating initial interest cycle: {str(e)}")
         # Don't raise exception - this is a non-critical operation
 
+def _open_loans() -> List[Dict]:
+    """All approved and active loans"""
+    loans_by_status = gather(
+        db_service.async_service.get_loans_by_status('approved'),
+        db_service.async_service.get_loans_by_status('active')
+    )
+    return [loan for loans in loans_by_status for loan in loans]
+
+def _cycle_start_dates(approved_date: date, until: date) -> List[date]:
+    """Start dates of every cycle of a loan approved on approved_date up to and including until"""
+    start_dates = []
+    cycle_start_date = approved_date
+    while cycle_start_date <= until:
+        start_dates.append(cycle_start_date)
+        cycle_start_date = approved_date + relativedelta(months=len(start_dates))
+    return start_dates
+
+def _balance_at(loan: Dict, payments: List[Dict], cycle_start_str: str) -> int:
+    """Principal minus capital paid before the cycle start date, in cents"""
+    capital_paid = sum(
+        item_cents(payment, 'amount')
+        for payment in payments
+        if payment.get('paymentType', 'capital') == 'capital'
+        and payment.get('paymentDate', '')[:10] < cycle_start_str
+    )
+    return item_cents(loan, 'amount') - capital_paid
+
+async def _write_cycles(cycles: List[Dict], concurrency: int) -> List[bool]:
+    """Conditionally put cycles with at most `concurrency` writes in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def write(cycle):
+        async with semaphore:
+            return await db_service.async_service.create_interest_cycle_if_absent(cycle)
+    
+    return await asyncio.gather(*[write(cycle) for cycle in cycles])
+
+def create_missing_cycles(since: date, today: date, concurrency: int = CATCH_UP_CONCURRENCY) -> Dict:
+    """
+    Create every interest cycle of the open portfolio that started between
+    `since` and `today` (inclusive) and does not exist yet.
+    Each cycle's principal is the balance as of its start date.
+    """
+    loans = [loan for loan in _open_loans() if loan.get('approvedAt')]
+    
+    # Expected cycle start dates per loan in the requested window
+    expected = {}
+    for loan in loans:
+        approved_date = datetime.fromisoformat(loan['approvedAt'].replace('Z', '+00:00')).date()
+        expected[loan['loanId']] = [
+            (cycle_number, cycle_start_date)
+            for cycle_number, cycle_start_date in enumerate(_cycle_start_dates(approved_date, today), start=1)
+            if cycle_start_date >= since
+        ]
+    candidates = [loan for loan in loans if expected[loan['loanId']]]
+    
+    # Fetch existing cycles for every candidate loan concurrently
+    existing_cycles = gather(*[
+        db_service.async_service.get_interest_cycles_by_loan(loan['loanId'])
+        for loan in candidates
+    ])
+    missing = {}
+    for loan, cycles in zip(candidates, existing_cycles):
+        existing_starts = {cycle.get('cycleStartDate') for cycle in cycles}
+        loan_missing = [
+            (cycle_number, cycle_start_date)
+            for cycle_number, cycle_start_date in expected[loan['loanId']]
+            if cycle_start_date.isoformat() not in existing_starts
+        ]
+        if loan_missing:
+            missing[loan['loanId']] = (loan, loan_missing)
+    
+    # Payments are only needed for loans that actually have gaps, and only those
+    # made before the last missing cycle starts
+    payments_by_loan = gather(*[
+        db_service.async_service.get_payments_by_loan(
+            loan_id,
+            end_date=(loan_missing[-1][1] - timedelta(days=1)).isoformat()
+        )
+        for loan_id, (_, loan_missing) in missing.items()
+    ])
+    new_cycles = []
+    for (loan, loan_missing), payments in zip(missing.values(), payments_by_loan):
+        for cycle_number, cycle_start_date in loan_missing:
+            balance_cents = _balance_at(loan, payments, cycle_start_date.isoformat())
+            new_cycles.append(build_interest_cycle(loan, cycle_number, cycle_start_date, balance_cents))
+    
+    written = run_sync(_write_cycles(new_cycles, concurrency)) if new_cycles else []
+    cycles_created = sum(1 for was_written in written if was_written)
+    print(f"Created {cycles_created} of {len(new_cycles)} missing interest cycles since {since.isoformat()}")
+    
+    return {
+        'loansProcessed': len(loans),
+        'loansWithMissingCycles': len(missing),
+        'cyclesCreated': cycles_created,
+        'cyclesAlreadyPresent': len(new_cycles) - cycles_created
+    }
+
+@profiled
+@background_job
 def process_daily_cycles(event, context):
     """
     Scheduled job that runs daily to check all active/approved loans
-    and create interest cycle entries when a new cycle starts
+    and create interest cycle entries when a new cycle starts.
+    
+    Invoke with {"catchUpFrom": "YYYY-MM-DD"} (and optionally "concurrency")
+    to backfill every cycle missed since that date, e.g. after failed runs.
     """
     try:
+        event = event or {}
         today = datetime.utcnow().date()
+        catch_up_from = event.get('catchUpFrom')
         
-        # Get all approved and active loans
-        approved_loans = db_service.get_loans_by_status('approved')
-        active_loans = db_service.get_loans_by_status('active')
-        all_loans = approved_loans + active_loans
-        
-        cycles_created = 0
+        if catch_up_from:
+            try:
+                since = date.fromisoformat(catch_up_from)
+            except ValueError:
+                return error_response(f'Invalid catchUpFrom date: {catch_up_from}. Expected format: YYYY-MM-DD', 400)
+            try:
+                concurrency = int(event.get('concurrency', CATCH_UP_CONCURRENCY))
+            except (TypeError, ValueError):
+                concurrency = 0
+            if not 1 <= concurrency <= MAX_CATCH_UP_CONCURRENCY:
+                return error_response(f'concurrency must be a number from 1 to {MAX_CATCH_UP_CONCURRENCY}', 400)
+            result = create_missing_cycles(since, today, concurrency)
+            return success_response({'message': 'Caught up interest cycles', 'catchUpFrom': since.isoformat(), **result})
         
-        for loan in all_loans:
-            if not loan.get('approvedAt'):
-                continue
-            
-            # Parse approval date
-            approved_date = datetime.fromisoformat(loan['approvedAt'].replace('Z', '+00:00')).date()
-            
-            # Calculate which cycle we should be in
-            current_cycle_number = 0
-            cycle_start_date = approved_date
-            
-            while cycle_start_date <= today:
-                # Check if this cycle already exists
-                cycle_start_str = cycle_start_date.isoformat()
-                existing_cycle = db_service.get_interest_cycle_by_date(loan['loanId'], cycle_start_str)
-                
-                if not existing_cycle and cycle_start_date == today:
-                    # Create new interest cycle for today
-                    # Get current balance amount
-                    balance_amount = Decimal(str(loan.get('balanceAmount', loan.get('amount', 0))))
-                    interest_rate = Decimal(str(loan.get('interestRate', 0)))
-                    
-                    # Calculate interest for this cycle
-                    monthly_interest = balance_amount * (interest_rate / Decimal('100'))
-                    
-                    # Calculate cycle end date (day before next cycle)
-                    cycle_end_date = (cycle_start_date + relativedelta(months=1)) - timedelta(days=1)
-                    
-                    cycle = {
-                        'cycleId': str(uuid.uuid4()),
-                        'loanId': loan['loanId'],
-                        'cycleNumber': current_cycle_number + 1,
-                        'cycleStartDate': cycle_start_str,
-                        'cycleEndDate': cycle_end_date.isoformat(),
-                        'principalBalance': balance_amount,
-                        'interestRate': interest_rate,
-                        'interestAmount': monthly_interest,
-                        'createdAt': datetime.utcnow().isoformat()
-                    }
-                    
-                    db_service.create_interest_cycle(cycle)
-                    cycles_created += 1
-                    
-                    print(f"Created interest cycle for loan {loan['loanId']}, cycle {current_cycle_number + 1}")
-                
-                # Move to next cycle
-                current_cycle_number += 1
-                cycle_start_date = approved_date + relativedelta(months=current_cycle_number)
+        result = create_missing_cycles(today, today)
         
         return success_response({
             'message': f'Processed interest cycles',
-            'cyclesCreated': cycles_created,
-            'loansProcessed': len(all_loans)
+            'cyclesCreated': result['cyclesCreated'],
+            'loansProcessed': result['loansProcessed']
         })
         
     except Exception as e:
         print(f"Error processing interest cycles: {str(e)}")
         return error_response(str(e), 500)
 
+@profiled
 def get_interest_cycles(event, context):
     """Get all interest cycles for a specific loan"""
     try:
@@ -140,8 +248,11 @@ def get_interest_cycles(event, context):
         if not loan:
             return error_response('Loan not found', 404)
         
-        # Get all interest cycles for this loan
-        cycles = db_service.get_interest_cycles_by_loan(loan_id)
+        # Get all interest cycles for this loan (an archived loan's are only in the archive)
+        source = db_service
+        if LoanArchive.is_tombstone(loan) and include_archived(event.get('queryStringParameters') or {}):
+            source = loan_archive
+        cycles = source.get_interest_cycles_by_loan(loan_id)
         
         return success_response(cycles)
         
@@ -1,24 +1,41 @@
+import asyncio
+import hashlib
 import json
 import uuid
 from datetime import datetime
 from decimal import Decimal
-from services.dynamodb_service import DynamoDBService
-from utils.response import success_response, error_response
+from typing import Dict, List, Optional
+from services.factory import create_db_service
+from services.loan_archive import LoanArchive, include_archived
+from utils.async_bridge import gather
+from utils.money import money_attributes, to_cents
+from utils.profiling import profiled
+from utils.response import success_response, error_response, not_modified_response
+from utils.settings import STREAM_SIDE_EFFECTS
 
-db_service = DynamoDBService()
+db_service = create_db_service()
+loan_archive = LoanArchive(db_service)
 
+# Related resources GET /loans/{id}?include= can embed
+LOAN_INCLUDES = ('borrower', 'cycles', 'payments')
+# Bump when the loan detail document shape changes to invalidate client caches
+LOAN_DETAIL_VERSION = '1'
+
+@profiled
 def create_loan(event, context):
     try:
         body = json.loads(event['body'])
         
         loan_id = str(uuid.uuid4())
-        amount = Decimal(str(body['amount']))
+        amount = to_cents(body['amount'])
         loan = {
             'loanId': loan_id,
             'borrowerId': body['borrowerId'],
-            'amount': amount,
-            'balanceAmount': amount,  # Initially, balance equals the principal amount
-            'balanceInterestAmount': Decimal('0'),  # Initially, no interest has been paid
+            **money_attributes(
+                amount=amount,
+                balanceAmount=amount,  # Initially, balance equals the principal amount
+                balanceInterestAmount=0  # Initially, no interest has been paid
+            ),
             'interestRate': Decimal(str(body['interestRate'])),
             'status': 'pending',
             'createdAt': datetime.utcnow().isoformat(),
@@ -30,7 +47,7 @@ def create_loan(event, context):
             loan['paymentDay'] = int(body['paymentDay'])
         
         if 'monthlyPayment' in body and body['monthlyPayment']:
-            loan['monthlyPayment'] = Decimal(str(body['monthlyPayment']))
+            loan.update(money_attributes(monthlyPayment=to_cents(body['monthlyPayment'])))
         
         if 'approvedAt' in body and body['approvedAt']:
             loan['approvedAt'] = body['approvedAt']
@@ -38,10 +55,10 @@ def create_loan(event, context):
         
         created_loan = db_service.create_loan(loan)
         
-        # Create initial interest cycle if loan is approved
-        if loan.get('approvedAt'):
+        # Create initial interest cycle if loan is approved (done by the stream consumer when enabled)
+        if loan.get('approvedAt') and not STREAM_SIDE_EFFECTS:
             from handlers.interest_cycles import create_initial_interest_cycle
-            create_initial_interest_cycle(loan_id)
+            create_initial_interest_cycle(loan_id, created_loan)
         
         return success_response(created_loan, 201)
         
@@ -50,35 +67,125 @@ def create_loan(event, context):
     except Exception as e:
         return error_response(str(e), 500)
 
+@profiled
 def get_loans(event, context):
     try:
         query_params = event.get('queryStringParameters') or {}
+        with_archived = include_archived(query_params)
         
         if 'borrowerId' in query_params:
             loans = db_service.get_loans_by_borrower(query_params['borrowerId'])
         elif 'status' in query_params:
             loans = db_service.get_loans_by_status(query_params['status'])
         else:
-            loans = db_service.get_all_loans()
+            loans = db_service.get_all_loans(include_archived=with_archived)
+        
+        # Archived loans are tombstones in the loans table; ?includeArchived=true returns them from the archive
+        if with_archived:
+            loans = loan_archive.resolve(loans)
+        elif 'status' not in query_params:
+            loans = [loan for loan in loans if not LoanArchive.is_tombstone(loan)]
         
         return success_response(loans)
         
     except Exception as e:
         return error_response(str(e), 500)
 
+def _loan_etag(loan: Dict, include: List[str]) -> str:
+    """
+    Version tag for a loan detail document.
+    Payment writes refresh the loan's updatedAt (via update_loan_balance) and
+    cycle writes its cyclesUpdatedAt, so the tag changes whenever any included part does.
+    """
+    version = '|'.join([
+        LOAN_DETAIL_VERSION,
+        loan['loanId'],
+        str(loan.get('updatedAt', '')),
+        str(loan.get('cyclesUpdatedAt', '')),
+        ','.join(include)
+    ])
+    return f'W/"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+def _request_header(event, name: str) -> Optional[str]:
+    headers = event.get('headers') or {}
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+async def _off_shared_executor(function, *args):
+    """
+    Call a service method that may gather itself (get_loan_history) on a
+    thread outside the shared executor: run on one of its workers, the
+    nested gather could wait for workers that are all busy waiting in turn.
+    """
+    return await asyncio.to_thread(function, *args)
+
+@profiled
 def get_loan(event, context):
+    """
+    Get a loan. ?include=payments,cycles,borrower embeds the related data,
+    fetched concurrently (payments and cycles with one Query in single-table
+    mode), in one document. Responses carry an ETag; a
+    matching If-None-Match gets a 304 after reading only the loan item.
+    An archived loan is its tombstone unless ?includeArchived=true.
+    """
     try:
         loan_id = event['pathParameters']['id']
+        query_params = event.get('queryStringParameters') or {}
+        include = sorted({part.strip() for part in query_params.get('include', '').split(',') if part.strip()})
+        
+        unknown = [part for part in include if part not in LOAN_INCLUDES]
+        if unknown:
+            return error_response(f"Unsupported include: {', '.join(unknown)}. Allowed: {', '.join(LOAN_INCLUDES)}", 400)
+        
         loan = db_service.get_loan(loan_id)
         
         if not loan:
             return error_response('Loan not found', 404)
         
-        return success_response(loan)
+        archived = LoanArchive.is_tombstone(loan) and include_archived(query_params)
+        etag = _loan_etag(loan, include + ['archived'] if archived else include)
+        if _request_header(event, 'If-None-Match') == etag:
+            return not_modified_response(etag)
+        
+        # Fetch every requested related resource concurrently
+        source = loan_archive if archived else db_service
+        fetchers = {
+            'payments': lambda: source.async_service.get_payments_by_loan(loan_id),
+            'cycles': lambda: source.async_service.get_interest_cycles_by_loan(loan_id),
+            'borrower': lambda: db_service.async_service.get_borrower(loan.get('borrowerId')),
+            'history': lambda: _off_shared_executor(db_service.get_loan_history, loan_id),
+        }
+        if 'borrower' in include and not loan.get('borrowerId'):
+            include.remove('borrower')
+        # Single-table storage returns payments and cycles together from one partition Query
+        use_history = not archived and db_service.LOAN_HISTORY_IN_ONE_QUERY and {'payments', 'cycles'} <= set(include)
+        parts = include
+        if use_history:
+            parts = [part for part in include if part not in ('payments', 'cycles')] + ['history']
+        results = dict(zip(parts, gather(*[fetchers[part]() for part in parts])))
+        if use_history:
+            history = results.pop('history')
+            results['payments'] = history['payments']
+            results['cycles'] = history['interestCycles']
+        
+        document = dict(loan)
+        if archived:
+            document = {**(loan_archive.get_loan(loan_id) or loan), 'archivedAt': loan.get('archivedAt')}
+        if 'payments' in results:
+            document['payments'] = results['payments']
+        if 'cycles' in results:
+            document['interestCycles'] = results['cycles']
+        if 'borrower' in results:
+            document['borrower'] = results['borrower']
+        
+        return success_response(document, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
         
     except Exception as e:
         return error_response(str(e), 500)
 
+@profiled
 def update_loan_status(event, context):
     try:
         loan_id = event['pathParameters']['id']
@@ -89,6 +196,8 @@ def update_loan_status(event, context):
         loan = db_service.get_loan(loan_id)
         if not loan:
             return error_response('Loan not found', 404)
+        if LoanArchive.is_tombstone(loan):
+            return error_response('Loan is archived', 409)
         
         # Update status with timestamp
         updates = {
@@ -103,10 +212,10 @@ def update_loan_status(event, context):
         
         db_service.update_loan(loan_id, updates)
         
-        # Create initial interest cycle if loan is being approved
-        if new_status == 'approved':
+        # Create initial interest cycle if loan is being approved (done by the stream consumer when enabled)
+        if new_status == 'approved' and not STREAM_SIDE_EFFECTS:
             from handlers.interest_cycles import create_initial_interest_cycle
-            create_initial_interest_cycle(loan_id)
+            create_initial_interest_cycle(loan_id, {**loan, **updates})
         
         return success_response({'message': 'Loan status updated', 'loanId': loan_id})
         
@@ -115,6 +224,7 @@ def update_loan_status(event, context):
     except Exception as e:
         return error_response(str(e), 500)
 
+@profiled
 def delete_loan(event, context):
     try:
         loan_id = event['pathParameters']['id']
@@ -124,6 +234,10 @@ def delete_loan(event, context):
         if not loan:
             return error_response('Loan not found', 404)
         
+        # An archived loan's history is in the archive; the tombstone goes below
+        if LoanArchive.is_tombstone(loan):
+            loan_archive.delete_loan(loan_id)
+        
         # Delete all payments associated with this loan
         payments = db_service.get_payments_by_loan(loan_id)
         for payment in payments:
@@ -1,12 +1,70 @@
+import asyncio
 import json
+import os
 import uuid
-from datetime import datetime
-from decimal import Decimal
-from services.dynamodb_service import DynamoDBService
+from datetime import date, datetime
+from decimal import InvalidOperation
+from typing import Dict, List, Optional, Tuple
+from services.factory import create_db_service
+from services.loan_archive import LoanArchive, include_archived
+from utils.async_bridge import gather, run_sync
+from utils.money import money_attributes, to_cents
+from utils.profiling import profiled
 from utils.response import success_response, error_response
+from utils.settings import STREAM_SIDE_EFFECTS
 
-db_service = DynamoDBService()
+db_service = create_db_service()
+loan_archive = LoanArchive(db_service)
 
+# Most payments accepted by one POST /payments/batch request
+MAX_BATCH_PAYMENTS = 500
+# Loans whose interest cycles one batch request recalculates at once
+BATCH_RECOMPUTE_CONCURRENCY = int(os.environ.get('BATCH_RECOMPUTE_CONCURRENCY', '4'))
+PAYMENT_TYPES = ('capital', 'interest')
+
+def _is_iso_date(value) -> bool:
+    """A YYYY-MM-DD date or ISO timestamp string"""
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return False
+    return True
+
+def _recompute_cycles(loan_id: str, changed_date: str) -> List[str]:
+    """
+    Recalculate the interest cycles a payment change affects. The payment is
+    already written by then, so a failure is logged and returned as a warning
+    for the response instead of failing the request.
+    """
+    try:
+        db_service.recompute_interest_cycles(loan_id, changed_date)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error recalculating interest cycles of loan {loan_id}: {str(e)}")
+        return [f'Interest cycles of loan {loan_id} could not be recalculated: {str(e)}']
+    return []
+
+async def _recompute_loans_cycles(earliest_dates: Dict[str, str], concurrency: int) -> List[str]:
+    """
+    _recompute_cycles for several loans, `concurrency` at a time. Each one
+    gathers its own reads on the shared executor, so it runs on a thread
+    outside it (see loans._off_shared_executor).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def recompute(loan_id, changed_date):
+        async with semaphore:
+            return await asyncio.to_thread(_recompute_cycles, loan_id, changed_date)
+
+    results = await asyncio.gather(*[recompute(loan_id, changed_date)
+                                     for loan_id, changed_date in earliest_dates.items()])
+    return [warning for warnings in results for warning in warnings]
+
+def _with_warnings(data: Dict, warnings: List[str]) -> Dict:
+    return {**data, 'warnings': warnings} if warnings else data
+
+@profiled
 def add_payment(event, context):
     try:
         loan_id = event['pathParameters']['id']
@@ -16,38 +74,83 @@ def add_payment(event, context):
         loan = db_service.get_loan(loan_id)
         if not loan:
             return error_response('Loan not found', 404)
+        if LoanArchive.is_tombstone(loan):
+            return error_response('Loan is archived', 409)
+        
+        if 'paymentDate' in body and not _is_iso_date(body['paymentDate']):
+            return error_response(f"Invalid paymentDate: {body['paymentDate']}. Expected format: YYYY-MM-DD", 400)
         
         payment_id = str(uuid.uuid4())
         payment = {
             'paymentId': payment_id,
             'loanId': loan_id,
-            'amount': Decimal(str(body['amount'])),
+            **money_attributes(amount=to_cents(body['amount'])),
             'paymentType': body.get('paymentType', 'capital'),  # 'capital' or 'interest'
             'paymentDate': body.get('paymentDate', datetime.utcnow().isoformat()),
             'createdAt': datetime.utcnow().isoformat()
         }
         
-        created_payment = db_service.create_payment(payment)
+        # The balance update bumps the data version once for both writes
+        created_payment = db_service.create_payment(payment, bump_version=STREAM_SIDE_EFFECTS)
         
-        # Update loan balance after adding payment
-        db_service.update_loan_balance(loan_id)
+        # Update loan balance, and the interest cycles a backdated payment changes
+        # (done by the stream consumer when enabled)
+        warnings = []
+        if not STREAM_SIDE_EFFECTS:
+            db_service.update_loan_balance(loan_id)
+            warnings = _recompute_cycles(loan_id, payment['paymentDate'])
+        else:
+            db_service.touch_loan(loan_id)
         
-        return success_response(created_payment, 201)
+        return success_response(_with_warnings(created_payment, warnings), 201)
         
     except KeyError as e:
         return error_response(f'Missing required field: {str(e)}', 400)
     except Exception as e:
         return error_response(str(e), 500)
 
+@profiled
 def get_payments(event, context):
     try:
         loan_id = event['pathParameters']['id']
-        payments = db_service.get_payments_by_loan(loan_id)
+        query_params = event.get('queryStringParameters') or {}
+        
+        # Optional ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive), ?limit=N and ?order=asc|desc (default newest first)
+        for name in ('from', 'to'):
+            if query_params.get(name):
+                try:
+                    date.fromisoformat(query_params[name])
+                except ValueError:
+                    return error_response(f"Invalid {name} date: {query_params[name]}. Expected format: YYYY-MM-DD", 400)
+        limit = None
+        if query_params.get('limit'):
+            try:
+                limit = int(query_params['limit'])
+            except ValueError:
+                return error_response('limit must be a number', 400)
+            if limit < 1:
+                return error_response('limit must be at least 1', 400)
+        order = query_params.get('order', 'desc')
+        if order not in ('asc', 'desc'):
+            return error_response('order must be asc or desc', 400)
+        
+        # An archived loan's payments are only in the archive
+        source = db_service
+        if include_archived(query_params) and LoanArchive.is_tombstone(db_service.get_loan(loan_id)):
+            source = loan_archive
+        payments = source.get_payments_by_loan(
+            loan_id,
+            start_date=query_params.get('from'),
+            end_date=query_params.get('to'),
+            limit=limit,
+            newest_first=order == 'desc'
+        )
         return success_response(payments)
         
     except Exception as e:
         return error_response(str(e), 500)
 
+@profiled
 def update_payment(event, context):
     try:
         payment_id = event['pathParameters']['paymentId']
@@ -62,27 +165,37 @@ def update_payment(event, context):
         
         updates = {}
         if 'amount' in body:
-            updates['amount'] = Decimal(str(body['amount']))
+            updates.update(money_attributes(amount=to_cents(body['amount'])))
         if 'paymentDate' in body:
+            if not _is_iso_date(body['paymentDate']):
+                return error_response(f"Invalid paymentDate: {body['paymentDate']}. Expected format: YYYY-MM-DD", 400)
             updates['paymentDate'] = body['paymentDate']
         if 'paymentType' in body:
             updates['paymentType'] = body['paymentType']
         
+        warnings = []
         if updates:
             updates['updatedAt'] = datetime.utcnow().isoformat()
-            db_service.update_payment(payment_id, updates)
+            updates_balance = bool(loan_id) and not STREAM_SIDE_EFFECTS
+            db_service.update_payment(payment_id, updates, bump_version=not updates_balance)
             
-            # Update loan balance after updating payment
-            if loan_id:
+            # Update loan balance, and the interest cycles from the earlier of the old and new payment dates
+            if updates_balance:
                 db_service.update_loan_balance(loan_id)
+                old_date = payment.get('paymentDate', '')
+                changed_date = min(old_date, updates.get('paymentDate', old_date))
+                warnings = _recompute_cycles(loan_id, changed_date)
+            elif loan_id:
+                db_service.touch_loan(loan_id)
         
-        return success_response({'message': 'Payment updated', 'paymentId': payment_id})
+        return success_response(_with_warnings({'message': 'Payment updated', 'paymentId': payment_id}, warnings))
         
     except KeyError as e:
         return error_response(f'Missing required field: {str(e)}', 400)
     except Exception as e:
         return error_response(str(e), 500)
 
+@profiled
 def delete_payment(event, context):
     try:
         payment_id = event['pathParameters']['paymentId']
@@ -94,13 +207,129 @@ def delete_payment(event, context):
         
         loan_id = payment.get('loanId')
         
-        db_service.delete_payment(payment_id)
+        updates_balance = bool(loan_id) and not STREAM_SIDE_EFFECTS
+        db_service.delete_payment(payment_id, bump_version=not updates_balance)
         
-        # Update loan balance after deleting payment
-        if loan_id:
+        # Update loan balance, and the interest cycles that started after the payment
+        warnings = []
+        if updates_balance:
             db_service.update_loan_balance(loan_id)
+            warnings = _recompute_cycles(loan_id, payment.get('paymentDate', ''))
+        elif loan_id:
+            db_service.touch_loan(loan_id)
+        
+        return success_response(_with_warnings({'message': 'Payment deleted', 'paymentId': payment_id}, warnings))
+        
+    except Exception as e:
+        return error_response(str(e), 500)
+
+def _batch_request_error(entries: List) -> Optional[str]:
+    """Why the whole batch is rejected before anything is read or written, if it is"""
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        if not isinstance(entry.get('loanId'), str) or not entry['loanId']:
+            return f'payments[{index}].loanId must be a non-empty string'
+        if entry.get('paymentDate') not in (None, '') and not _is_iso_date(entry['paymentDate']):
+            return f"payments[{index}].paymentDate must be an ISO date (YYYY-MM-DD): {entry['paymentDate']}"
+    return None
+
+def _batch_payment(entry: Dict, loans: Dict[str, Dict], created_at: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """Payment item for one batch entry, or the reason it is rejected"""
+    if not isinstance(entry, dict):
+        return None, 'Payment must be an object'
+    for field in ('loanId', 'amount'):
+        if entry.get(field) in (None, ''):
+            return None, f'Missing required field: {field}'
+    if entry['loanId'] not in loans:
+        return None, 'Loan not found'
+    if LoanArchive.is_tombstone(loans[entry['loanId']]):
+        return None, 'Loan is archived'
+    try:
+        amount = to_cents(entry['amount'])
+    except (InvalidOperation, ValueError):
+        return None, f"Invalid amount: {entry['amount']}"
+    payment_type = entry.get('paymentType', 'capital')
+    if payment_type not in PAYMENT_TYPES:
+        return None, f'Invalid paymentType: {payment_type}'
+    return {
+        'paymentId': str(uuid.uuid4()),
+        'loanId': entry['loanId'],
+        **money_attributes(amount=amount),
+        'paymentType': payment_type,
+        'paymentDate': entry.get('paymentDate') or created_at,
+        'createdAt': created_at
+    }, None
+
+@profiled
+def add_payments_batch(event, context):
+    """
+    Record many payments across many loans in one request.
+    
+    Body: {"payments": [{"loanId", "amount", "paymentType"?, "paymentDate"?}, ...]}
+    A loanId that is not a non-empty string, or a paymentDate that is not an
+    ISO date, rejects the whole request (400) before anything is written.
+    All loans are verified with one BatchGetItem, the payments are written
+    with BatchWriteItem and each affected loan's balance and interest cycles
+    are recalculated once, several loans at a time, with a single data
+    version bump for the batch.
+    Returns a result per entry, in request order (201 if all were recorded,
+    207 if only some were, 400 if none was).
+    """
+    try:
+        body = json.loads(event['body'])
+        entries = body['payments']
+        if not isinstance(entries, list) or not entries:
+            return error_response('payments must be a non-empty list', 400)
+        if len(entries) > MAX_BATCH_PAYMENTS:
+            return error_response(f'At most {MAX_BATCH_PAYMENTS} payments per request', 400)
         
-        return success_response({'message': 'Payment deleted', 'paymentId': payment_id})
+        request_error = _batch_request_error(entries)
+        if request_error:
+            return error_response(request_error, 400)
         
+        loan_ids = [entry['loanId'] for entry in entries if isinstance(entry, dict)]
+        loans = {loan['loanId']: loan for loan in db_service.batch_get_loans(loan_ids)}
+        
+        created_at = datetime.utcnow().isoformat()
+        results: List[Dict] = []
+        payments = []
+        for index, entry in enumerate(entries):
+            payment, error = _batch_payment(entry, loans, created_at)
+            if error:
+                results.append({'index': index, 'status': 'failed', 'error': error})
+            else:
+                results.append({'index': index, 'status': 'created', 'paymentId': payment['paymentId'],
+                                'loanId': payment['loanId']})
+                payments.append((index, payment))
+        
+        written = db_service.create_payments([payment for _, payment in payments],
+                                             bump_version=STREAM_SIDE_EFFECTS) if payments else []
+        earliest_dates: Dict[str, str] = {}
+        for (index, payment), was_written in zip(payments, written):
+            if was_written:
+                loan_id = payment['loanId']
+                earliest_dates[loan_id] = min(earliest_dates.get(loan_id, payment['paymentDate']), payment['paymentDate'])
+            else:
+                results[index] = {'index': index, 'status': 'failed', 'error': 'Payment could not be written'}
+        affected_loans = [loans[loan_id] for loan_id in earliest_dates]
+        
+        # Update each affected loan's balance once, and the interest cycles started after its earliest
+        # payment (done by the stream consumer when enabled)
+        warnings = []
+        if affected_loans and not STREAM_SIDE_EFFECTS:
+            db_service.update_loan_balances(affected_loans)
+            warnings = run_sync(_recompute_loans_cycles(earliest_dates, BATCH_RECOMPUTE_CONCURRENCY))
+        elif affected_loans:
+            gather(*[db_service.async_service.touch_loan(loan['loanId']) for loan in affected_loans])
+        
+        created = sum(1 for result in results if result['status'] == 'created')
+        summary = {'created': created, 'failed': len(results) - created, 'results': results}
+        if not created:
+            return success_response({'error': 'No payment was recorded', **summary}, 400)
+        return success_response(_with_warnings(summary, warnings), 201 if created == len(results) else 207)
+        
+    except KeyError as e:
+        return error_response(f'Missing required field: {str(e)}', 400)
     except Exception as e:
         return error_response(str(e), 500)
@@ -1,12 +1,26 @@
 import json
-from decimal import Decimal
+import threading
 from collections import defaultdict
 from datetime import datetime
-from services.dynamodb_service import DynamoDBService
+from typing import Dict, Optional
+from services.analytics import NO_MONTH, PortfolioColumns, analytics_months, month_number, portfolio_analytics
+from services.factory import create_db_service
+from services.loan_archive import LoanArchive
+from services.portfolio_snapshot import PORTFOLIO_SNAPSHOT, portfolio_columns
+from services.report_cache import ReportCache
+from utils.async_bridge import gather
+from utils.money import cents_to_float, item_cents, monthly_interest_cents, rate_units
+from utils.profiling import profiled
 from utils.response import success_response, error_response
 
-db_service = DynamoDBService()
+db_service = create_db_service()
+report_cache = ReportCache(db_service)
+loan_archive = LoanArchive(db_service)
+# Portfolio columns of the last data version loaded, shared by every report and analytics query on it
+_columns = (None, None)
+_columns_lock = threading.Lock()
 
+@profiled
 def get_reports(event, context):
     try:
         # Get query parameters for date filtering
@@ -36,67 +50,39 @@ def get_reports(event, context):
             except ValueError as e:
                 return error_response(f"Invalid end date format: {end_date_str}. Expected format: YYYY-MM-DD", 400)
         
-        # Get all loans and payments
-        loans = db_service.get_all_loans()
-        borrowers = db_service.get_all_borrowers()
-        
-        # Filter loans by date if filters are provided
-        if start_date or end_date:
-            filtered_loans = []
-            for loan in loans:
-                approved_at = loan.get('approvedAt')
-                if approved_at:
-                    try:
-                        # Normalize date format (fix 5-digit years)
-                        date_parts = approved_at.split('-')
-                        if len(date_parts) >= 3 and len(date_parts[0]) > 4:
-                            date_parts[0] = date_parts[0][:4]
-                            approved_at = '-'.join(date_parts)
-                        
-                        loan_date = datetime.fromisoformat(approved_at.replace('Z', '+00:00'))
-                        if start_date and loan_date < start_date:
-                            continue
-                        if end_date and loan_date > end_date:
-                            continue
-                    except (ValueError, AttributeError) as e:
-                        # Skip loans with invalid dates
-                        print(f"Skipping loan {loan.get('loanId')} with invalid date: {approved_at}")
-                        continue
-                filtered_loans.append(loan)
-            loans = filtered_loans
+        # Serve the cached report while no loan, payment or borrower has been written since it was built.
+        # The version is read before the data so a write during the build only ever causes a rebuild.
+        cache_key = report_cache.key(start_date_str, end_date_str)
+        data_version = report_cache.data_version()
+        report = report_cache.get(cache_key, data_version)
+        if report is None:
+            report = _build_report(start_date, end_date, data_version)
+            report_cache.put(cache_key, data_version, report)
         
-        # Initialize statistics
-        total_debt = Decimal('0')
-        total_interest_profit = Decimal('0')
-        total_incoming_payment = Decimal('0')
-        total_invested = Decimal('0')
-        borrower_profits = defaultdict(lambda: {'profit': Decimal('0'), 'name': '', 'borrowerId': ''})
-        
-        # Create borrower lookup
-        borrower_map = {b['borrowerId']: b for b in borrowers}
+        return success_response(report)
         
-        # Process each loan
+    except Exception as e:
+        return error_response(str(e), 500)
+
+def _build_report(start_date: Optional[datetime], end_date: Optional[datetime], data_version: Optional[int]) -> Dict:
+    """Aggregate the report over all loans (approved within the date range, if given)"""
+    if PORTFOLIO_SNAPSHOT:
+        # Loans with their payment totals (paidCents) from the portfolio snapshot
+        loans = _portfolio_columns(data_version).loan_items()
+        borrowers = db_service.get_all_borrowers()
+    else:
+        # Get all loans and borrowers concurrently
+        loans, borrowers = gather(
+            db_service.async_service.get_all_loans(),
+            db_service.async_service.get_all_borrowers()
+        )
+    
+    # Filter loans by date if filters are provided
+    if start_date or end_date:
+        filtered_loans = []
         for loan in loans:
-            loan_amount = Decimal(str(loan.get('amount', 0)))
-            interest_rate = Decimal(str(loan.get('interestRate', 0)))
-            borrower_id = loan.get('borrowerId')
             approved_at = loan.get('approvedAt')
-            
-            # Get payments for this loan
-            payments = db_service.get_payments_by_loan(loan['loanId'])
-            
-            total_paid = Decimal('0')
-            for payment in payments:
-                amount = Decimal(str(payment.get('amount', 0)))
-                total_paid += amount
-                
-                # For interest profit, we need to calculate how much of each payment was interest
-                # This is a simplified calculation - in reality you'd track this per payment
-                # For now, we'll calculate it based on the accrued interest at payment time
-            
-            # Calculate accrued interest for this loan
-            accrued_interest = Decimal('0')
-            if approved_at and loan.get('status') in ['active', 'approved']:
+            if approved_at:
                 try:
                     # Normalize date format (fix 5-digit years)
                     date_parts = approved_at.split('-')
@@ -104,91 +90,191 @@ def get_reports(event, context):
                         date_parts[0] = date_parts[0][:4]
                         approved_at = '-'.join(date_parts)
                     
-                    approved_date = datetime.fromisoformat(approved_at.replace('Z', '+00:00'))
-                    current_date = datetime.utcnow()
-                    
-                    days_elapsed = (current_date - approved_date).days
-                    
-                    if days_elapsed >= 0:
-                        monthly_rate = interest_rate / Decimal('100')
-                        monthly_interest_amount = loan_amount * monthly_rate
-                        
-                        # Calculate billing cycles (30 days per cycle)
-                        months_elapsed = Decimal(str(days_elapsed)) / Decimal('30')
-                        completed_cycles = int(months_elapsed)
-                        days_into_current_cycle = days_elapsed - (completed_cycles * 30)
-                        
-                        # If at least 1 day into a new cycle, count it as a full cycle
-                        billing_cycles = completed_cycles + 1 if days_into_current_cycle >= 1 else completed_cycles
-                        
-                        accrued_interest = monthly_interest_amount * Decimal(str(billing_cycles))
+                    loan_date = datetime.fromisoformat(approved_at.replace('Z', '+00:00'))
+                    if start_date and loan_date < start_date:
+                        continue
+                    if end_date and loan_date > end_date:
+                        continue
                 except (ValueError, AttributeError) as e:
-                    # Skip interest calculation for loans with invalid dates
-                    print(f"Skipping interest calculation for loan {loan.get('loanId')} with invalid date: {approved_at}")
-            
-            # Add accrued interest to total interest profit (for active/approved loans)
-            if loan.get('status') in ['active', 'approved'] and accrued_interest > 0:
-                total_interest_profit += accrued_interest
+                    # Skip loans with invalid dates
+                    print(f"Skipping loan {loan.get('loanId')} with invalid date: {approved_at}")
+                    continue
+            filtered_loans.append(loan)
+        loans = filtered_loans
+    
+    # Initialize statistics (all money in integer cents)
+    total_debt = 0
+    total_interest_profit = 0
+    total_incoming_payment = 0
+    total_invested = 0
+    borrower_profits = defaultdict(lambda: {'profit': 0, 'name': '', 'borrowerId': ''})
+    
+    # Create borrower lookup
+    borrower_map = {b['borrowerId']: b for b in borrowers}
+    
+    # Payment totals of every loan, fetching the payments concurrently unless the snapshot has them
+    if PORTFOLIO_SNAPSHOT:
+        paid_by_loan = [loan['paidCents'] for loan in loans]
+    else:
+        payments_by_loan = gather(*[
+            db_service.async_service.get_payments_by_loan(loan['loanId'])
+            for loan in loans
+        ])
+        paid_by_loan = [sum(item_cents(payment, 'amount') for payment in payments) for payments in payments_by_loan]
+    
+    # Process each loan
+    for loan, total_paid in zip(loans, paid_by_loan):
+        loan_amount = item_cents(loan, 'amount')
+        interest_rate = rate_units(loan.get('interestRate', 0))
+        monthly_interest_amount = monthly_interest_cents(loan_amount, interest_rate)
+        borrower_id = loan.get('borrowerId')
+        approved_at = loan.get('approvedAt')
+        
+        # For interest profit, we would need to know how much of each payment was interest
+        # This is a simplified calculation - in reality you'd track this per payment
+        # For now, we'll calculate it based on the accrued interest
+        
+        # Calculate accrued interest for this loan
+        accrued_interest = 0
+        if approved_at and loan.get('status') in ['active', 'approved']:
+            try:
+                # Normalize date format (fix 5-digit years)
+                date_parts = approved_at.split('-')
+                if len(date_parts) >= 3 and len(date_parts[0]) > 4:
+                    date_parts[0] = date_parts[0][:4]
+                    approved_at = '-'.join(date_parts)
                 
-                # Track profit per borrower
-                if borrower_id:
-                    borrower_profits[borrower_id]['profit'] += accrued_interest
-                    borrower_profits[borrower_id]['borrowerId'] = borrower_id
-                    if borrower_id in borrower_map:
-                        borrower = borrower_map[borrower_id]
-                        borrower_profits[borrower_id]['name'] = borrower.get('name', 'Unknown')
-            
-            # Calculate amount due for this loan (Principal + Accrued Interest - Total Paid)
-            total_with_interest = loan_amount + accrued_interest
-            amount_due = max(Decimal('0'), total_with_interest - total_paid)
-            
-            # Add to total debt (only active and approved loans with amount due)
-            if loan.get('status') in ['active', 'approved'] and amount_due > 0:
-                total_debt += amount_due
-            
-            # Calculate minimal base payment for this month (Principal * Monthly Interest Rate)
-            if loan.get('status') in ['active', 'approved']:
-                monthly_rate = interest_rate / Decimal('100')
-                minimal_base_payment = loan_amount * monthly_rate
-                total_incoming_payment += minimal_base_payment
+                approved_date = datetime.fromisoformat(approved_at.replace('Z', '+00:00'))
+                current_date = datetime.utcnow()
                 
-                # Add to total invested (sum of all principal amounts)
-                total_invested += loan_amount
+                days_elapsed = (current_date - approved_date).days
+                
+                if days_elapsed >= 0:
+                    # Calculate billing cycles (30 days per cycle)
+                    completed_cycles = days_elapsed // 30
+                    days_into_current_cycle = days_elapsed - (completed_cycles * 30)
+                    
+                    # If at least 1 day into a new cycle, count it as a full cycle
+                    billing_cycles = completed_cycles + 1 if days_into_current_cycle >= 1 else completed_cycles
+                    
+                    accrued_interest = monthly_interest_amount * billing_cycles
+            except (ValueError, AttributeError) as e:
+                # Skip interest calculation for loans with invalid dates
+                print(f"Skipping interest calculation for loan {loan.get('loanId')} with invalid date: {approved_at}")
         
-        # Find top 5 most profitable borrowers
-        top_profitable_borrowers = []
-        if borrower_profits:
-            # Sort borrowers by profit in descending order and get top 5
-            sorted_borrowers = sorted(
-                borrower_profits.items(),
-                key=lambda x: x[1]['profit'],
-                reverse=True
-            )[:5]
+        # Add accrued interest to total interest profit (for active/approved loans)
+        if loan.get('status') in ['active', 'approved'] and accrued_interest > 0:
+            total_interest_profit += accrued_interest
             
-            top_profitable_borrowers = [
-                {
-                    'borrowerId': borrower_id,
-                    'name': data['name'],
-                    'profit': float(data['profit'])
-                }
-                for borrower_id, data in sorted_borrowers
-                if data['profit'] > 0
-            ]
+            # Track profit per borrower
+            if borrower_id:
+                borrower_profits[borrower_id]['profit'] += accrued_interest
+                borrower_profits[borrower_id]['borrowerId'] = borrower_id
+                if borrower_id in borrower_map:
+                    borrower = borrower_map[borrower_id]
+                    borrower_profits[borrower_id]['name'] = borrower.get('name', 'Unknown')
         
-        # Prepare response
-        report = {
-            'totalDebt': float(total_debt),
-            'totalInvested': float(total_invested),
-            'interestProfit': float(total_interest_profit),
-            'incomingPayment': float(total_incoming_payment),
-            'topProfitableBorrowers': top_profitable_borrowers,
-            'totalLoans': len(loans),
-            'activeLoans': len([l for l in loans if l.get('status') == 'active']),
-            'approvedLoans': len([l for l in loans if l.get('status') == 'approved']),
-            'totalBorrowers': len(borrowers)
-        }
+        # Calculate amount due for this loan (Principal + Accrued Interest - Total Paid)
+        total_with_interest = loan_amount + accrued_interest
+        amount_due = max(0, total_with_interest - total_paid)
         
-        return success_response(report)
+        # Add to total debt (only active and approved loans with amount due)
+        if loan.get('status') in ['active', 'approved'] and amount_due > 0:
+            total_debt += amount_due
         
+        # Calculate minimal base payment for this month (Principal * Monthly Interest Rate)
+        if loan.get('status') in ['active', 'approved']:
+            total_incoming_payment += monthly_interest_amount
+            
+            # Add to total invested (sum of all principal amounts)
+            total_invested += loan_amount
+    
+    # Find top 5 most profitable borrowers
+    top_profitable_borrowers = []
+    if borrower_profits:
+        # Sort borrowers by profit in descending order and get top 5
+        sorted_borrowers = sorted(
+            borrower_profits.items(),
+            key=lambda x: x[1]['profit'],
+            reverse=True
+        )[:5]
+        
+        top_profitable_borrowers = [
+            {
+                'borrowerId': borrower_id,
+                'name': data['name'],
+                'profit': cents_to_float(data['profit'])
+            }
+            for borrower_id, data in sorted_borrowers
+            if data['profit'] > 0
+        ]
+    
+    # Prepare response
+    report = {
+        'totalDebt': cents_to_float(total_debt),
+        'totalInvested': cents_to_float(total_invested),
+        'interestProfit': cents_to_float(total_interest_profit),
+        'incomingPayment': cents_to_float(total_incoming_payment),
+        'topProfitableBorrowers': top_profitable_borrowers,
+        'totalLoans': len(loans),
+        'activeLoans': len([l for l in loans if l.get('status') == 'active']),
+        'approvedLoans': len([l for l in loans if l.get('status') == 'approved']),
+        'totalBorrowers': len(borrowers)
+    }
+    
+    return report
+
+@profiled
+def get_analytics(event, context):
+    """
+    Monthly collections (capital vs interest) and approval-month cohorts with
+    their repayment curves: GET /reports/analytics?from=YYYY-MM&to=YYYY-MM
+    """
+    try:
+        query_params = event.get('queryStringParameters') or {}
+        months = {}
+        for name in ('from', 'to'):
+            value = query_params.get(name)
+            if value:
+                months[name] = month_number(value)
+                if len(value) != 7 or months[name] == NO_MONTH:
+                    return error_response(f"Invalid {name} month: {value}. Expected format: YYYY-MM", 400)
+        from_month, to_month = months.get('from'), months.get('to')
+        if from_month is not None and to_month is not None and to_month < from_month:
+            return error_response("'to' must not be before 'from'", 400)
+        # Reject given bounds before loading any data; a missing bound is filled in from the data
+        # within the limits by portfolio_analytics
+        if from_month is not None:
+            try:
+                analytics_months(from_month, from_month if to_month is None else to_month,
+                                 month_number(datetime.utcnow().date().isoformat()))
+            except ValueError as e:
+                return error_response(str(e), 400)
+
+        cache_key = report_cache.key(query_params.get('from'), query_params.get('to'), kind='analytics')
+        data_version = report_cache.data_version()
+        analytics = report_cache.get(cache_key, data_version)
+        if analytics is None:
+            try:
+                analytics = portfolio_analytics(_portfolio_columns(data_version), from_month, to_month)
+            except ValueError as e:
+                return error_response(str(e), 400)
+            report_cache.put(cache_key, data_version, analytics)
+
+        return success_response(analytics)
+
     except Exception as e:
         return error_response(str(e), 500)
+
+def _portfolio_columns(data_version: Optional[int]) -> PortfolioColumns:
+    """Loans and payments, archived ones included, as columns loaded once per data version"""
+    global _columns
+    with _columns_lock:
+        version, columns = _columns
+        if data_version is not None and version == data_version:
+            return columns
+    columns = portfolio_columns(db_service, loan_archive, data_version)
+    if data_version is not None:
+        with _columns_lock:
+            _columns = (data_version, columns)
+    return columns
@@ -0,0 +1,79 @@
+import re
+from importlib import import_module
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.response import success_response, error_response
+
+# Every API route and the handler serving it; keep in sync with the Api events in template.yaml
+ROUTES = [
+    ('POST', '/loans', 'handlers.loans.create_loan'),
+    ('GET', '/loans', 'handlers.loans.get_loans'),
+    ('GET', '/loans/{id}', 'handlers.loans.get_loan'),
+    ('PUT', '/loans/{id}/status', 'handlers.loans.update_loan_status'),
+    ('DELETE', '/loans/{id}', 'handlers.loans.delete_loan'),
+    ('POST', '/borrowers', 'handlers.borrowers.create_borrower'),
+    ('GET', '/borrowers', 'handlers.borrowers.get_borrowers'),
+    ('GET', '/borrowers/{id}', 'handlers.borrowers.get_borrower'),
+    ('POST', '/loans/{id}/payments', 'handlers.payments.add_payment'),
+    ('GET', '/loans/{id}/payments', 'handlers.payments.get_payments'),
+    ('PUT', '/payments/{paymentId}', 'handlers.payments.update_payment'),
+    ('DELETE', '/payments/{paymentId}', 'handlers.payments.delete_payment'),
+    ('POST', '/payments/batch', 'handlers.payments.add_payments_batch'),
+    ('GET', '/reports', 'handlers.reports.get_reports'),
+    ('GET', '/reports/analytics', 'handlers.reports.get_analytics'),
+    ('GET', '/loans/{id}/interest-cycles', 'handlers.interest_cycles.get_interest_cycles'),
+]
+
+def _template_pattern(path_template: str):
+    """'/loans/{id}/payments' -> regex capturing the id path parameter"""
+    pattern = re.sub(r'\\\{(\w+)\\\}', r'(?P<\1>[^/]+)', re.escape(path_template))
+    return re.compile(f'^{pattern}/?$')
+
+_TEMPLATES: Dict[str, List[Tuple[str, str]]] = {}
+for _method, _path, _handler in ROUTES:
+    _TEMPLATES.setdefault(_path, []).append((_method, _handler))
+# Fixed segments win over parameters (/payments/batch before /payments/{paymentId}), as in API Gateway
+_PATTERNS = [(path, _template_pattern(path)) for path in sorted(_TEMPLATES, key=lambda path: path.count('{'))]
+# Handler functions by dotted path, imported on first use so a cold start only loads what it serves
+_handlers: Dict[str, Callable] = {}
+
+def _resolve(handler_path: str) -> Callable:
+    handler = _handlers.get(handler_path)
+    if handler is None:
+        module_name, function_name = handler_path.rsplit('.', 1)
+        handler = _handlers[handler_path] = getattr(import_module(module_name), function_name)
+    return handler
+
+def _match(event: Dict) -> Tuple[Optional[str], Dict]:
+    """Path template and path parameters of a request"""
+    resource = event.get('resource')
+    if resource in _TEMPLATES:
+        return resource, event.get('pathParameters') or {}
+    # Greedy proxy integration (/{proxy+}): match the concrete path against the templates
+    path = event.get('path') or ''
+    for path_template, pattern in _PATTERNS:
+        match = pattern.match(path)
+        if match:
+            return path_template, match.groupdict()
+    return None, {}
+
+def route(event, context):
+    """
+    Single entry point for every API route (ApiDeployment=router).
+
+    Dispatches API Gateway proxy events to the per-route handler functions by
+    HTTP method and path template, so all routes share one warm container,
+    one DynamoDBService connection pool and its caches.
+    """
+    method = (event.get('httpMethod') or '').upper()
+    path_template, path_parameters = _match(event)
+    if path_template is None:
+        return error_response(f"No route for {method} {event.get('path')}", 404)
+
+    handlers_by_method = dict(_TEMPLATES[path_template])
+    if method == 'OPTIONS':
+        return success_response({})  # CORS preflight; the headers come with every response
+    if method not in handlers_by_method:
+        return error_response(f'Method {method} not allowed on {path_template}', 405)
+
+    event = {**event, 'resource': path_template, 'pathParameters': path_parameters or None}
+    return _resolve(handlers_by_method[method])(event, context)
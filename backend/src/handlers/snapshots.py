@@ -0,0 +1,27 @@
+from services.factory import create_db_service
+from services.loan_archive import LoanArchive
+from services.portfolio_snapshot import PORTFOLIO_SNAPSHOT, write_portfolio_snapshot
+from services.throughput import background_job
+from utils.profiling import profiled
+from utils.response import success_response, error_response
+
+db_service = create_db_service()
+loan_archive = LoanArchive(db_service)
+
+@profiled
+@background_job
+def build_portfolio_snapshot(event, context):
+    """
+    Scheduled job writing the columnar portfolio snapshot (PORTFOLIO_SNAPSHOT)
+    that GET /reports and GET /reports/analytics read instead of scanning.
+    """
+    try:
+        if not PORTFOLIO_SNAPSHOT:
+            return error_response('PORTFOLIO_SNAPSHOT is not set', 400)
+        result = write_portfolio_snapshot(db_service, loan_archive, PORTFOLIO_SNAPSHOT)
+        print(f"Wrote portfolio snapshot to {PORTFOLIO_SNAPSHOT}: {result}")
+        return success_response({'message': 'Portfolio snapshot written', 'location': PORTFOLIO_SNAPSHOT, **result})
+
+    except Exception as e:
+        print(f"Error writing portfolio snapshot: {str(e)}")
+        return error_response(str(e), 500)
@@ -0,0 +1,103 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+from boto3.dynamodb.types import TypeDeserializer
+from handlers.interest_cycles import ensure_initial_interest_cycle, db_service
+from services.single_table_service import LOAN_SK, PAYMENT_PREFIX, from_single_table_item
+from services.throughput import background_job
+from utils.profiling import profiled
+
+deserializer = TypeDeserializer()
+
+def _image(record: Dict, key: str) -> Optional[Dict]:
+    image = record.get('dynamodb', {}).get(key)
+    if not image:
+        return None
+    return from_single_table_item({name: deserializer.deserialize(value) for name, value in image.items()})
+
+def _sort_key(record: Dict) -> str:
+    return record.get('dynamodb', {}).get('Keys', {}).get('SK', {}).get('S', '')
+
+def _is_payment_record(record: Dict) -> bool:
+    # Payments are keyed by paymentId, or by a PAYMENT# sort key in the LoanHistory table
+    return 'paymentId' in record.get('dynamodb', {}).get('Keys', {}) or _sort_key(record).startswith(PAYMENT_PREFIX)
+
+def _is_loan_record(record: Dict) -> bool:
+    return 'loanId' in record.get('dynamodb', {}).get('Keys', {}) or _sort_key(record) == LOAN_SK
+
+def _newly_approved(record: Dict) -> Optional[Dict]:
+    """Return the new loan image if this change is the loan's approval, else None"""
+    new_loan = _image(record, 'NewImage')
+    if not new_loan or not new_loan.get('approvedAt'):
+        return None
+    old_loan = _image(record, 'OldImage')
+    if old_loan and old_loan.get('approvedAt'):
+        return None
+    return new_loan
+
+@profiled
+@background_job
+def process_stream_records(event, context):
+    """
+    Stream consumer for the Loans and Payments tables, or the LoanHistory
+    table with STORAGE_MODE=single_table (its interest cycle records are ignored).
+
+    Payment changes are coalesced per loan so each affected loan balance,
+    and its interest cycles from the earliest changed payment date, are
+    recomputed once per batch, and newly approved loans get their initial
+    interest cycle. These operations are idempotent, so redelivered records
+    are harmless. Failed loans are reported as partial batch failures.
+    """
+    balance_records = defaultdict(list)
+    earliest_dates: Dict[str, str] = {}
+    approved_loans = {}
+    approval_records = defaultdict(list)
+
+    for record in event.get('Records', []):
+        sequence_number = record.get('dynamodb', {}).get('SequenceNumber')
+        if _is_payment_record(record):
+            images = [image for image in (_image(record, 'NewImage'), _image(record, 'OldImage')) if image]
+            loan_id = images[0].get('loanId') if images else None
+            if loan_id:
+                balance_records[loan_id].append(sequence_number)
+                # Cycles are recalculated from the earliest payment date any change in the batch touched
+                for image in images:
+                    payment_date = str(image.get('paymentDate') or '')
+                    if payment_date:
+                        earliest_dates[loan_id] = min(earliest_dates.get(loan_id, payment_date), payment_date)
+        elif _is_loan_record(record):
+            loan = _newly_approved(record)
+            if loan:
+                # Keep the latest image when a loan changes several times in one batch
+                approved_loans[loan['loanId']] = loan
+                approval_records[loan['loanId']].append(sequence_number)
+
+    failed_sequence_numbers: List[str] = []
+
+    for loan_id, loan in approved_loans.items():
+        try:
+            if ensure_initial_interest_cycle(loan_id, loan):
+                print(f"Created initial interest cycle for loan {loan_id}")
+        except Exception as e:
+            print(f"Error creating initial interest cycle for loan {loan_id}: {str(e)}")
+            failed_sequence_numbers.extend(approval_records[loan_id])
+
+    for loan_id, sequence_numbers in balance_records.items():
+        try:
+            db_service.update_loan_balance(loan_id)
+            if loan_id in earliest_dates:
+                # Raises after repeated concurrent changes; the records are then redelivered
+                db_service.recompute_interest_cycles(loan_id, earliest_dates[loan_id])
+        except Exception as e:
+            print(f"Error updating balance for loan {loan_id}: {str(e)}")
+            failed_sequence_numbers.extend(sequence_numbers)
+
+    print(f"Processed {len(event.get('Records', []))} stream records: "
+          f"{len(balance_records)} balances, {len(approved_loans)} initial cycles")
+
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': sequence_number}
+            for sequence_number in failed_sequence_numbers
+            if sequence_number
+        ]
+    }
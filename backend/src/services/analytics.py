@@ -0,0 +1,265 @@
+"""
+Portfolio analytics over columnar loan and payment data.
+
+Loans and payments are loaded once into typed arrays (one array per
+attribute, one row per item), months are stored as integer month numbers
+and loans are referenced by row, so the monthly and cohort aggregates are
+single passes over parallel int arrays into dense per-month accumulators
+instead of repeated lookups in item dicts.
+"""
+from array import array
+from datetime import datetime
+from decimal import Decimal
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Set
+from utils.money import RATE_SCALE, cents_to_float, item_cents, rate_units
+
+# Only these attributes are read when scanning payments
+PAYMENT_ATTRIBUTES = ['loanId', 'paymentDate', 'paymentType', 'amount', 'amountCents']
+NO_MONTH = -1
+# Most months one request covers; its first month is also at most this many months back, which
+# bounds the cohort curves (one entry per month from a cohort's approval to the current month)
+MAX_ANALYTICS_MONTHS = 600
+# Fixed-width columns and their array typecodes; string columns are plain sequences
+LOAN_COLUMNS = {'approval_month': 'i', 'principal_cents': 'q', 'rate_units': 'q', 'paid_cents': 'q', 'archived': 'b'}
+LOAN_STRING_COLUMNS = ('loan_id', 'borrower_id', 'status', 'approved_at')
+PAYMENT_COLUMNS = {'loan_row': 'i', 'month': 'i', 'amount_cents': 'q', 'is_interest': 'b'}
+
+def month_number(value) -> int:
+    """'2026-03-15T...' -> months since year 0 (2026 * 12 + 2), or NO_MONTH if it is not a date"""
+    text = str(value or '')
+    try:
+        year, month = int(text[:4]), int(text[5:7])
+    except ValueError:
+        return NO_MONTH
+    if text[4:5] != '-' or not 1 <= month <= 12:
+        return NO_MONTH
+    return year * 12 + month - 1
+
+def month_label(number: int) -> str:
+    return f'{number // 12:04d}-{number % 12 + 1:02d}'
+
+def _zeros(typecode: str, length: int) -> array:
+    return array(typecode, [0]) * length
+
+class PortfolioColumns:
+    """
+    Loans and payments as parallel columns, one row per loan / payment.
+
+    loans:    loan_id, borrower_id, status, approved_at (strings), approval_month,
+              principal_cents, rate_units, paid_cents (all payments), archived
+    payments: loan_row (row in the loan columns, -1 if the loan is gone),
+              month, amount_cents, is_interest
+
+    Columns are arrays when built from items, or memoryviews over a
+    snapshot file (services/portfolio_snapshot.py); both index and iterate
+    the same way.
+    """
+
+    def __init__(self, loans: Dict[str, Sequence], payments: Dict[str, Sequence]):
+        self.loans = loans
+        self.payments = payments
+
+    @property
+    def loan_count(self) -> int:
+        return len(self.loans['principal_cents'])
+
+    @classmethod
+    def build(cls, loans: List[Dict], payments: List[Dict]) -> 'PortfolioColumns':
+        """Columns for loan items (archived ones carrying archivedAt) and their payments"""
+        loan_ids = [loan['loanId'] for loan in loans]
+        rows = {loan_id: row for row, loan_id in enumerate(loan_ids)}
+        loan_row = array('i', (rows.get(payment.get('loanId'), -1) for payment in payments))
+        amount_cents = array('q', (item_cents(payment, 'amount') for payment in payments))
+        paid_cents = _zeros('q', len(loans))
+        for row, amount in zip(loan_row, amount_cents):
+            if row >= 0:
+                paid_cents[row] += amount
+        return cls(
+            {
+                'loan_id': loan_ids,
+                'borrower_id': [loan.get('borrowerId') for loan in loans],
+                'status': [loan.get('status') for loan in loans],
+                'approved_at': [loan.get('approvedAt') for loan in loans],
+                'approval_month': array('i', (month_number(loan.get('approvedAt')) for loan in loans)),
+                'principal_cents': array('q', (item_cents(loan, 'amount') for loan in loans)),
+                'rate_units': array('q', (rate_units(loan.get('interestRate', 0)) for loan in loans)),
+                'paid_cents': paid_cents,
+                'archived': array('b', ('archivedAt' in loan for loan in loans))
+            },
+            {
+                'loan_row': loan_row,
+                'month': array('i', (month_number(payment.get('paymentDate')) for payment in payments)),
+                'amount_cents': amount_cents,
+                'is_interest': array('b', (payment.get('paymentType') == 'interest' for payment in payments))
+            }
+        )
+
+    def without_loans(self, loan_ids: Set[str]) -> 'PortfolioColumns':
+        """Copy without the given loans and their payments"""
+        keep = [row for row, loan_id in enumerate(self.loans['loan_id']) if loan_id not in loan_ids]
+        new_rows = array('i', [-1]) * self.loan_count
+        for new_row, row in enumerate(keep):
+            new_rows[row] = new_row
+        payment_keep = [index for index, row in enumerate(self.payments['loan_row']) if row < 0 or new_rows[row] >= 0]
+        loans = {name: _take(column, keep, LOAN_COLUMNS.get(name)) for name, column in self.loans.items()}
+        payments = {name: _take(column, payment_keep, PAYMENT_COLUMNS[name]) for name, column in self.payments.items()}
+        payments['loan_row'] = array('i', (new_rows[row] if row >= 0 else -1 for row in payments['loan_row']))
+        return PortfolioColumns(loans, payments)
+
+    def extend(self, other: 'PortfolioColumns') -> 'PortfolioColumns':
+        """Copy with the loans and payments of other appended"""
+        offset = self.loan_count
+        loans = {name: _concat(column, other.loans[name], LOAN_COLUMNS.get(name)) for name, column in self.loans.items()}
+        payments = {name: _concat(column, other.payments[name], PAYMENT_COLUMNS[name])
+                    for name, column in self.payments.items()}
+        payments['loan_row'][len(self.payments['loan_row']):] = array(
+            'i', (row + offset if row >= 0 else -1 for row in other.payments['loan_row']))
+        return PortfolioColumns(loans, payments)
+
+    def loan_items(self, include_archived: bool = False) -> List[Dict]:
+        """Loans as the item attributes reports read (amounts as *Cents), plus paidCents"""
+        columns = self.loans
+        items = []
+        for row in range(self.loan_count):
+            if columns['archived'][row] and not include_archived:
+                continue
+            item = {
+                'loanId': columns['loan_id'][row],
+                'status': columns['status'][row],
+                'amountCents': columns['principal_cents'][row],
+                'interestRate': Decimal(columns['rate_units'][row]) / RATE_SCALE,
+                'paidCents': columns['paid_cents'][row]
+            }
+            for name, attribute in (('borrower_id', 'borrowerId'), ('approved_at', 'approvedAt')):
+                if columns[name][row] is not None:
+                    item[attribute] = columns[name][row]
+            items.append(item)
+        return items
+
+    def month_range(self) -> Optional[range]:
+        """Months from the first to the last approval or payment"""
+        months = [month for month in self.payments['month'] if month != NO_MONTH]
+        approvals = [month for month in self.loans['approval_month'] if month != NO_MONTH]
+        if not months and not approvals:
+            return None
+        return range(min(months + approvals), max(months + approvals) + 1)
+
+def _take(column: Sequence, rows: List[int], typecode: Optional[str]) -> Sequence:
+    values = (column[row] for row in rows)
+    return array(typecode, values) if typecode else list(values)
+
+def _concat(column: Sequence, other: Sequence, typecode: Optional[str]) -> Sequence:
+    if typecode:
+        return array(typecode, column) + array(typecode, other)
+    return list(column) + list(other)
+
+def monthly_collections(columns: PortfolioColumns, months: range) -> List[Dict]:
+    """Capital and interest collected per calendar month"""
+    first, length = months.start, len(months)
+    payments = columns.payments
+    capital, interest, counts = _zeros('q', length), _zeros('q', length), _zeros('l', length)
+    for month, amount, is_interest in zip(payments['month'], payments['amount_cents'], payments['is_interest']):
+        offset = month - first
+        if 0 <= offset < length:
+            if is_interest:
+                interest[offset] += amount
+            else:
+                capital[offset] += amount
+            counts[offset] += 1
+    return [
+        {
+            'month': month_label(first + offset),
+            'capital': cents_to_float(capital[offset]),
+            'interest': cents_to_float(interest[offset]),
+            'total': cents_to_float(capital[offset] + interest[offset]),
+            'payments': counts[offset]
+        }
+        for offset in range(length)
+    ]
+
+def cohort_curves(columns: PortfolioColumns, cohorts: range, as_of_month: int) -> List[Dict]:
+    """
+    Loans grouped by approval month, with the share of their principal repaid
+    (capital payments, cumulative) by each month since approval up to as_of_month.
+    """
+    first, length = cohorts.start, len(cohorts)
+    approval_month, payments = columns.loans['approval_month'], columns.payments
+    ages = max(as_of_month - first + 1, 1)
+    loans, principal = _zeros('l', length), _zeros('q', length)
+    for approval, amount in zip(approval_month, columns.loans['principal_cents']):
+        offset = approval - first
+        if approval != NO_MONTH and 0 <= offset < length:
+            loans[offset] += 1
+            principal[offset] += amount
+
+    # repaid[cohort * ages + age]: capital repaid by a cohort's loans in their age-th month
+    repaid = _zeros('q', length * ages)
+    for row, month, amount, is_interest in zip(payments['loan_row'], payments['month'],
+                                               payments['amount_cents'], payments['is_interest']):
+        if row < 0 or is_interest or month == NO_MONTH:
+            continue
+        approval = approval_month[row]
+        offset = approval - first
+        if approval == NO_MONTH or not 0 <= offset < length:
+            continue
+        # Payments dated before approval count towards the first month, future-dated ones towards the current
+        age = min(max(month - approval, 0), max(as_of_month - approval, 0))
+        repaid[offset * ages + age] += amount
+
+    results = []
+    for offset in range(length):
+        if not loans[offset]:
+            continue
+        cohort_ages = max(as_of_month - (first + offset) + 1, 1)
+        cumulative = accumulate(repaid[offset * ages:offset * ages + cohort_ages])
+        results.append({
+            'cohort': month_label(first + offset),
+            'loans': loans[offset],
+            'principal': cents_to_float(principal[offset]),
+            'curve': [
+                {
+                    'monthsSinceApproval': age,
+                    'capitalRepaid': cents_to_float(total),
+                    'repaidShare': round(total / principal[offset], 4) if principal[offset] else 0
+                }
+                for age, total in enumerate(cumulative)
+            ]
+        })
+    return results
+
+def analytics_months(first: int, last: int, as_of_month: int) -> range:
+    """Months first..last (empty if last is before first); ValueError if the range is too large"""
+    if last - first >= MAX_ANALYTICS_MONTHS:
+        raise ValueError(f'At most {MAX_ANALYTICS_MONTHS} months per request, narrow it with from/to')
+    if as_of_month - first >= MAX_ANALYTICS_MONTHS:
+        raise ValueError(f"'from' must be within {MAX_ANALYTICS_MONTHS} months of the current month")
+    return range(first, max(last + 1, first))
+
+def portfolio_analytics(columns: PortfolioColumns, from_month: Optional[int] = None,
+                        to_month: Optional[int] = None) -> Dict:
+    """
+    Monthly collections and the cohorts approved between two month numbers
+    (inclusive). A missing bound defaults to the first or last month in the
+    data, kept within MAX_ANALYTICS_MONTHS of the current month and of the
+    other bound, so old or far-future dates in the data never make the
+    request fail. Cohort curves run to the current month. Raises
+    ValueError, before any accumulator is allocated, only when the given
+    bounds are too far apart or too far back.
+    """
+    data_months = columns.month_range()
+    if data_months is None and (from_month is None or to_month is None):
+        return {'monthlyCollections': [], 'cohorts': []}
+    as_of_month = month_number(datetime.utcnow().date().isoformat())
+    first, last = from_month, to_month
+    if first is None:
+        first = max(data_months.start, as_of_month - MAX_ANALYTICS_MONTHS + 1)
+        if last is not None:
+            first = max(first, last - MAX_ANALYTICS_MONTHS + 1)
+    if last is None:
+        last = min(data_months.stop - 1, first + MAX_ANALYTICS_MONTHS - 1)
+    months = analytics_months(first, last, as_of_month)
+    return {
+        'monthlyCollections': monthly_collections(columns, months),
+        'cohorts': cohort_curves(columns, months, as_of_month)
+    }
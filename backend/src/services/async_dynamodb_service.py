@@ -0,0 +1,34 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared by every AsyncDynamoDBService in the container so concurrent reads
+# reuse the same worker threads and the same boto3 connection pool.
+MAX_CONCURRENT_CALLS = int(os.environ.get('DYNAMODB_MAX_CONCURRENCY', '10'))
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CALLS)
+
+class AsyncDynamoDBService:
+    """Awaitable view of a DynamoDBService.
+
+    Every public method of the wrapped service is exposed as a coroutine
+    that runs the blocking boto3 call on the shared executor, so
+    independent reads can be issued together with asyncio.gather.
+    """
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+
+    def __getattr__(self, name):
+        attr = getattr(self.db_service, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            # Carry the caller's context variables into the worker thread, as asyncio.to_thread does
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(_executor, functools.partial(context.run, attr, *args, **kwargs))
+
+        return call
@@ -1,84 +1,245 @@
 import os
+import random
+import time
 import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from decimal import Decimal
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from services.async_dynamodb_service import AsyncDynamoDBService, MAX_CONCURRENT_CALLS
+from services.throughput import governor
+from utils.async_bridge import gather
+from utils.money import from_cents, item_cents, money_attributes, monthly_interest_cents, rate_units
+from utils.search import PHONE_SEARCH, normalize_name, normalize_phone, search_attributes, without_search_attributes
+
+# Cache table item holding the global data version
+DATA_VERSION_KEY = 'dataVersion'
+# Statuses of the tombstone an archived loan leaves behind (services/loan_archive.py)
+ARCHIVED_LOAN_STATUSES = ('archiving', 'archived')
+# Sorts after every ISO timestamp that starts with a given date
+_END_OF_DAY = '\uffff'
+# Keys per BatchGetItem request, and the backoff (seconds) before re-requesting UnprocessedKeys
+BATCH_GET_KEYS = 100
+UNPROCESSED_RETRY_DELAY = 0.05
+MAX_UNPROCESSED_RETRY_DELAY = 2
+# Items per BatchWriteItem request, and the requests sent for them before UnprocessedItems count as failed
+BATCH_WRITE_ITEMS = 25
+UNPROCESSED_WRITE_ATTEMPTS = 5
+# Times a cycle recalculation is retried when another write changes the cycles under it
+RECOMPUTE_ATTEMPTS = 3
+
+def date_range_condition(key_name: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                         prefix: str = ''):
+    """Sort key condition for ISO dates from start_date to end_date, both inclusive (None if unbounded)"""
+    key = Key(key_name)
+    if start_date and end_date:
+        return key.between(prefix + start_date, prefix + end_date + _END_OF_DAY)
+    if start_date:
+        return key.between(prefix + start_date, prefix + _END_OF_DAY) if prefix else key.gte(start_date)
+    if end_date:
+        return key.between(prefix, prefix + end_date + _END_OF_DAY) if prefix else key.lte(end_date + _END_OF_DAY)
+    return key.begins_with(prefix) if prefix else None
+
+def projection(attributes: Optional[List[str]]) -> Dict:
+    """ProjectionExpression arguments reading only `attributes` (all attributes when None)"""
+    if not attributes:
+        return {}
+    return {
+        'ProjectionExpression': ', '.join(f'#p{index}' for index in range(len(attributes))),
+        'ExpressionAttributeNames': {f'#p{index}': name for index, name in enumerate(attributes)}
+    }
 
 class DynamoDBService:
+    # Whether get_loan_history reads a loan with its payments and cycles in a single Query
+    LOAN_HISTORY_IN_ONE_QUERY = False
+    
     def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb')
+        # Size the connection pool for the concurrent reads issued through async_service
+        self.dynamodb = boto3.resource('dynamodb', config=Config(max_pool_connections=MAX_CONCURRENT_CALLS))
         self.loans_table = self.dynamodb.Table(os.environ['LOANS_TABLE'])
         self.borrowers_table = self.dynamodb.Table(os.environ['BORROWERS_TABLE'])
         self.payments_table = self.dynamodb.Table(os.environ.get('PAYMENTS_TABLE', 'Payments'))
         self.interest_cycles_table = self.dynamodb.Table(os.environ.get('INTEREST_CYCLES_TABLE', 'InterestCycles'))
+        self.cache_table = self.dynamodb.Table(os.environ.get('REPORT_CACHE_TABLE', 'ReportCache'))
+        self.async_service = AsyncDynamoDBService(self)
+        # Paces background jobs' calls when THROUGHPUT_*_CAPACITY is set (services/throughput.py)
+        governor.register(self.dynamodb.meta.client)
+    
+    # Pagination helpers
+    def _scan_all(self, table, **kwargs) -> List[Dict]:
+        """Scan every page of a table (a single Scan call stops at 1 MB)"""
+        items = []
+        while True:
+            response = table.scan(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    def _query_all(self, table, limit: Optional[int] = None, **kwargs) -> List[Dict]:
+        """Query every page of a key condition, or until `limit` items have been read"""
+        items = []
+        while True:
+            if limit is not None:
+                kwargs['Limit'] = limit - len(items)
+            response = table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response or (limit is not None and len(items) >= limit):
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    def _batch_get_all(self, table, keys: List[Dict]) -> List[Dict]:
+        """
+        Items for `keys` from one table with BatchGetItem, re-requesting
+        UnprocessedKeys after an exponential backoff with jitter (missing keys are skipped)
+        """
+        items = []
+        for start in range(0, len(keys), BATCH_GET_KEYS):
+            request_items = {table.name: {'Keys': keys[start:start + BATCH_GET_KEYS]}}
+            delay = UNPROCESSED_RETRY_DELAY
+            while True:
+                response = self.dynamodb.batch_get_item(RequestItems=request_items)
+                items.extend(response.get('Responses', {}).get(table.name, []))
+                request_items = response.get('UnprocessedKeys')
+                if not request_items:
+                    break
+                time.sleep(random.uniform(0, delay))
+                delay = min(delay * 2, MAX_UNPROCESSED_RETRY_DELAY)
+        return items
     
     # Loan operations
     def create_loan(self, loan: Dict) -> Dict:
         self.loans_table.put_item(Item=loan)
+        self.bump_data_version()
         return loan
     
     def get_loan(self, loan_id: str) -> Optional[Dict]:
         response = self.loans_table.get_item(Key={'loanId': loan_id})
         return response.get('Item')
     
-    def get_all_loans(self) -> List[Dict]:
-        response = self.loans_table.scan()
-        return response.get('Items', [])
+    def batch_get_loans(self, loan_ids: List[str]) -> List[Dict]:
+        """Fetch full loan items with BatchGetItem"""
+        unique_ids = list(dict.fromkeys(loan_ids))
+        return self._batch_get_all(self.loans_table, [{'loanId': loan_id} for loan_id in unique_ids])
     
+    def get_all_loans(self, include_archived: bool = False, attributes: Optional[List[str]] = None) -> List[Dict]:
+        """Every loan (archived loans' tombstones only with include_archived), optionally reading only `attributes`"""
+        if include_archived:
+            return self._scan_all(self.loans_table, **projection(attributes))
+        return self._scan_all(
+            self.loans_table,
+            FilterExpression=~Attr('status').is_in(ARCHIVED_LOAN_STATUSES),
+            **projection(attributes)
+        )
+    
+    # BorrowerIdIndex and StatusIndex project keys only, so the full loans are fetched by key
     def get_loans_by_borrower(self, borrower_id: str) -> List[Dict]:
-        response = self.loans_table.query(
+        keys = self._query_all(
+            self.loans_table,
             IndexName='BorrowerIdIndex',
             KeyConditionExpression='borrowerId = :borrowerId',
             ExpressionAttributeValues={':borrowerId': borrower_id}
         )
-        return response.get('Items', [])
+        return self.batch_get_loans([key['loanId'] for key in keys])
     
     def get_loans_by_status(self, status: str) -> List[Dict]:
-        response = self.loans_table.query(
+        keys = self._query_all(
+            self.loans_table,
             IndexName='StatusIndex',
             KeyConditionExpression='#status = :status',
             ExpressionAttributeNames={'#status': 'status'},
             ExpressionAttributeValues={':status': status}
         )
-        return response.get('Items', [])
+        return self.batch_get_loans([key['loanId'] for key in keys])
+    
+    def _loan_key(self, loan_id: str) -> Dict:
+        return {'loanId': loan_id}
+    
+    def _loan_item(self, loan: Dict) -> Dict:
+        return loan
     
     def update_loan_status(self, loan_id: str, status: str) -> None:
         self.loans_table.update_item(
-            Key={'loanId': loan_id},
+            Key=self._loan_key(loan_id),
             UpdateExpression='SET #status = :status',
             ExpressionAttributeNames={'#status': 'status'},
             ExpressionAttributeValues={':status': status}
         )
+        self.bump_data_version()
     
-    def update_loan(self, loan_id: str, updates: Dict) -> None:
+    def update_loan(self, loan_id: str, updates: Dict, bump_version: bool = True) -> None:
         update_expression = 'SET ' + ', '.join([f'#{k} = :{k}' for k in updates.keys()])
         expression_attribute_names = {f'#{k}': k for k in updates.keys()}
         expression_attribute_values = {f':{k}': v for k, v in updates.items()}
         
         self.loans_table.update_item(
-            Key={'loanId': loan_id},
+            Key=self._loan_key(loan_id),
             UpdateExpression=update_expression,
             ExpressionAttributeNames=expression_attribute_names,
             ExpressionAttributeValues=expression_attribute_values
         )
+        if bump_version:
+            self.bump_data_version()
+    
+    def touch_loan(self, loan_id: str, attribute: str = 'updatedAt') -> None:
+        """Stamp the current time on an existing loan so cached views of it are invalidated"""
+        key = self._loan_key(loan_id)
+        try:
+            self.loans_table.update_item(
+                Key=key,
+                UpdateExpression='SET #attribute = :now',
+                ConditionExpression='attribute_exists(#key)',
+                ExpressionAttributeNames={'#attribute': attribute, '#key': next(iter(key))},
+                ExpressionAttributeValues={':now': datetime.utcnow().isoformat()}
+            )
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            pass  # Loan was deleted meanwhile
     
     def delete_loan(self, loan_id: str) -> None:
         self.loans_table.delete_item(Key={'loanId': loan_id})
+        self.bump_data_version()
     
     # Borrower operations
     def create_borrower(self, borrower: Dict) -> Dict:
-        self.borrowers_table.put_item(Item=borrower)
+        self.borrowers_table.put_item(Item={**borrower, **search_attributes(borrower)})
+        self.bump_data_version()
         return borrower
     
     def get_borrower(self, borrower_id: str) -> Optional[Dict]:
         response = self.borrowers_table.get_item(Key={'borrowerId': borrower_id})
-        return response.get('Item')
+        return without_search_attributes(response.get('Item'))
     
     def get_all_borrowers(self) -> List[Dict]:
-        response = self.borrowers_table.scan()
-        return response.get('Items', [])
+        return [without_search_attributes(borrower) for borrower in self._scan_all(self.borrowers_table)]
+    
+    def search_borrowers(self, query: str, limit: int = 20) -> List[Dict]:
+        """Borrowers whose normalized name or phone starts with the query, ordered by that key"""
+        name_prefix = normalize_name(query)
+        phone_prefix = normalize_phone(query)
+        searches = []
+        if name_prefix:
+            searches.append(('NameSearchIndex', 'nameBucket', 'nameKey', name_prefix))
+        # Only treat the query as a phone number when it has no letters
+        if PHONE_SEARCH and phone_prefix and not any(char.isalpha() for char in query):
+            searches.append(('PhoneSearchIndex', 'phoneBucket', 'phoneKey', phone_prefix))
+        
+        results = {}
+        for index_name, bucket_attribute, key_attribute, prefix in searches:
+            response = self.borrowers_table.query(
+                IndexName=index_name,
+                KeyConditionExpression=Key(bucket_attribute).eq(prefix[0]) & Key(key_attribute).begins_with(prefix),
+                Limit=limit
+            )
+            for borrower in response.get('Items', []):
+                results.setdefault(borrower['borrowerId'], without_search_attributes(borrower))
+        return list(results.values())[:limit]
     
     def update_borrower(self, borrower_id: str, updates: Dict) -> None:
+        if 'name' in updates or 'phone' in updates:
+            current = self.get_borrower(borrower_id) or {}
+            updates = {**updates, **search_attributes({**current, **updates})}
         update_expression = 'SET ' + ', '.join([f'#{k} = :{k}' for k in updates.keys()])
         expression_attribute_names = {f'#{k}': k for k in updates.keys()}
         expression_attribute_values = {f':{k}': v for k, v in updates.items()}
@@ -89,25 +250,84 @@ class DynamoDBService:
             ExpressionAttributeNames=expression_attribute_names,
             ExpressionAttributeValues=expression_attribute_values
         )
+        self.bump_data_version()
     
     # Payment operations
-    def create_payment(self, payment: Dict) -> Dict:
+    # Payment writes followed by update_loan_balance(s) pass bump_version=False: the balance update
+    # bumps once after both writes, so no report is cached between the payment and its balance
+    def create_payment(self, payment: Dict, bump_version: bool = True) -> Dict:
         self.payments_table.put_item(Item=payment)
+        if bump_version:
+            self.bump_data_version()
         return payment
     
+    def create_payments(self, payments: List[Dict], bump_version: bool = True) -> List[bool]:
+        """
+        Write many payments with BatchWriteItem; returns whether each one was
+        written. UnprocessedItems are re-sent after an exponential backoff with
+        jitter; a payment still unprocessed after UNPROCESSED_WRITE_ATTEMPTS
+        requests, or left when a request fails, is reported as not written.
+        """
+        table_name = self.payments_table.name
+        positions = {payment['paymentId']: position for position, payment in enumerate(payments)}
+        written = [False] * len(payments)
+        for start in range(0, len(payments), BATCH_WRITE_ITEMS):
+            requests = [{'PutRequest': {'Item': self._payment_item(payment)}}
+                        for payment in payments[start:start + BATCH_WRITE_ITEMS]]
+            delay = UNPROCESSED_RETRY_DELAY
+            for attempt in range(UNPROCESSED_WRITE_ATTEMPTS):
+                if attempt:
+                    time.sleep(random.uniform(0, delay))
+                    delay = min(delay * 2, MAX_UNPROCESSED_RETRY_DELAY)
+                try:
+                    response = self.dynamodb.batch_write_item(RequestItems={table_name: requests})
+                except ClientError as e:
+                    print(f"Error writing {len(requests)} payments: {str(e)}")
+                    break
+                unprocessed = response.get('UnprocessedItems', {}).get(table_name, [])
+                pending = {request['PutRequest']['Item']['paymentId'] for request in unprocessed}
+                for request in requests:
+                    payment_id = request['PutRequest']['Item']['paymentId']
+                    written[positions[payment_id]] = payment_id not in pending
+                requests = unprocessed
+                if not requests:
+                    break
+            else:
+                print(f"{len(requests)} payments still unprocessed after {UNPROCESSED_WRITE_ATTEMPTS} requests")
+        if bump_version and any(written):
+            self.bump_data_version()
+        return written
+    
+    def _payment_item(self, payment: Dict) -> Dict:
+        return payment
+    
+    def _payment_key(self, payment: Dict) -> Dict:
+        return {'paymentId': payment['paymentId']}
+    
     def get_payment(self, payment_id: str) -> Optional[Dict]:
         response = self.payments_table.get_item(Key={'paymentId': payment_id})
         return response.get('Item')
     
-    def get_payments_by_loan(self, loan_id: str) -> List[Dict]:
-        response = self.payments_table.query(
-            IndexName='LoanIdIndex',
-            KeyConditionExpression='loanId = :loanId',
-            ExpressionAttributeValues={':loanId': loan_id}
+    def get_payments_by_loan(self, loan_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             limit: Optional[int] = None, newest_first: bool = False) -> List[Dict]:
+        """A loan's payments sorted by paymentDate, optionally within dates (inclusive) and capped at `limit`"""
+        key_condition = Key('loanId').eq(loan_id)
+        date_condition = date_range_condition('paymentDate', start_date, end_date)
+        if date_condition is not None:
+            key_condition = key_condition & date_condition
+        return self._query_all(
+            self.payments_table,
+            limit=limit,
+            IndexName='LoanIdDateIndex',
+            KeyConditionExpression=key_condition,
+            ScanIndexForward=not newest_first
         )
-        return response.get('Items', [])
     
-    def update_payment(self, payment_id: str, updates: Dict) -> None:
+    def get_all_payments(self, attributes: Optional[List[str]] = None) -> List[Dict]:
+        """Every payment, optionally reading only the given attributes"""
+        return self._scan_all(self.payments_table, **projection(attributes))
+    
+    def update_payment(self, payment_id: str, updates: Dict, bump_version: bool = True) -> None:
         update_expression = 'SET ' + ', '.join([f'#{k} = :{k}' for k in updates.keys()])
         expression_attribute_names = {f'#{k}': k for k in updates.keys()}
         expression_attribute_values = {f':{k}': v for k, v in updates.items()}
@@ -118,23 +338,177 @@ class DynamoDBService:
             ExpressionAttributeNames=expression_attribute_names,
             ExpressionAttributeValues=expression_attribute_values
         )
+        if bump_version:
+            self.bump_data_version()
     
-    def delete_payment(self, payment_id: str) -> None:
+    def delete_payment(self, payment_id: str, bump_version: bool = True) -> None:
         self.payments_table.delete_item(Key={'paymentId': payment_id})
+        if bump_version:
+            self.bump_data_version()
+    
+    # Data version and report cache
+    def bump_data_version(self) -> None:
+        """
+        Atomically increment the global data version so cached reports are rebuilt.
+
+        Best-effort: the bump is a separate write issued after the change it
+        follows, not part of the same transaction, so a failed bump or a crash
+        between the two leaves cached reports stale. REPORT_CACHE_TTL_SECONDS
+        bounds how long that lasts.
+        """
+        try:
+            self.cache_table.update_item(
+                Key={'cacheKey': DATA_VERSION_KEY},
+                UpdateExpression='ADD dataVersion :one',
+                ExpressionAttributeValues={':one': 1}
+            )
+        except ClientError as e:
+            # The write itself succeeded; cached reports still expire after REPORT_CACHE_TTL_SECONDS
+            print(f"Error bumping data version: {str(e)}")
+    
+    def get_data_version(self) -> int:
+        response = self.cache_table.get_item(Key={'cacheKey': DATA_VERSION_KEY}, ConsistentRead=True)
+        return int(response.get('Item', {}).get('dataVersion', 0))
+    
+    def get_cached_report(self, cache_key: str) -> Optional[Dict]:
+        response = self.cache_table.get_item(Key={'cacheKey': cache_key})
+        return response.get('Item')
+    
+    def put_cached_report(self, cache_key: str, data_version: int, report: str, ttl_seconds: int) -> None:
+        self.cache_table.put_item(Item={
+            'cacheKey': cache_key,
+            'dataVersion': data_version,
+            'report': report,
+            'expiresAt': int(time.time()) + ttl_seconds
+        })
     
     # Interest Cycles operations
+    def _cycle_key(self, cycle: Dict) -> Dict:
+        return {'cycleId': cycle['cycleId']}
+    
     def create_interest_cycle(self, cycle: Dict) -> Dict:
         self.interest_cycles_table.put_item(Item=cycle)
+        self.touch_loan(cycle['loanId'], 'cyclesUpdatedAt')
         return cycle
     
-    def get_interest_cycles_by_loan(self, loan_id: str) -> List[Dict]:
-        response = self.interest_cycles_table.query(
+    def create_interest_cycle_if_absent(self, cycle: Dict) -> bool:
+        """Write the cycle unless an item with the same cycleId exists; returns True if written"""
+        try:
+            self.interest_cycles_table.put_item(
+                Item=cycle,
+                ConditionExpression='attribute_not_exists(cycleId)'
+            )
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        self.touch_loan(cycle['loanId'], 'cyclesUpdatedAt')
+        return True
+    
+    def get_interest_cycles_by_loan(self, loan_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                                    limit: Optional[int] = None, newest_first: bool = False) -> List[Dict]:
+        """A loan's cycles sorted by cycleStartDate, optionally starting within dates (inclusive) and capped at `limit`"""
+        key_condition = Key('loanId').eq(loan_id)
+        date_condition = date_range_condition('cycleStartDate', start_date, end_date)
+        if date_condition is not None:
+            key_condition = key_condition & date_condition
+        return self._query_all(
+            self.interest_cycles_table,
+            limit=limit,
             IndexName='LoanIdIndex',
-            KeyConditionExpression='loanId = :loanId',
-            ExpressionAttributeValues={':loanId': loan_id},
-            ScanIndexForward=True  # Sort by cycleStartDate ascending
+            KeyConditionExpression=key_condition,
+            ScanIndexForward=not newest_first
         )
-        return response.get('Items', [])
+    
+    def update_interest_cycles(self, changes: List[Tuple[Dict, Dict]]) -> bool:
+        """
+        Apply (cycle, updates) pairs as conditional updates in transactions of
+        up to 100, each only if the cycle's principalBalance is still the one
+        read. Returns False if a cycle changed meanwhile (the transaction it
+        was in is not applied).
+        """
+        client = self.dynamodb.meta.client
+        for start in range(0, len(changes), 100):
+            transact_items = []
+            for cycle, updates in changes[start:start + 100]:
+                transact_items.append({'Update': {
+                    'TableName': self.interest_cycles_table.name,
+                    'Key': self._cycle_key(cycle),
+                    'UpdateExpression': 'SET ' + ', '.join(f'#{k} = :{k}' for k in updates),
+                    'ConditionExpression': '#principalBalance = :readPrincipalBalance',
+                    'ExpressionAttributeNames': {'#principalBalance': 'principalBalance', **{f'#{k}': k for k in updates}},
+                    'ExpressionAttributeValues': {
+                        ':readPrincipalBalance': cycle['principalBalance'],
+                        **{f':{k}': v for k, v in updates.items()}
+                    }
+                }})
+            try:
+                client.transact_write_items(TransactItems=transact_items)
+            except client.exceptions.TransactionCanceledException:
+                return False
+        return True
+    
+    def recompute_interest_cycles(self, loan_id: str, changed_date: str) -> int:
+        """
+        Recalculate the cycles affected by a capital payment dated changed_date
+        being added, edited or deleted: those starting after that date. The
+        running balance starts from the last cycle before the change, so only
+        the affected cycles and the payments made during them are read, and
+        only cycles whose amounts changed are written.
+        Returns the number of cycles updated. Raises ValueError if changed_date
+        is not an ISO date, and RuntimeError if the cycles kept changing
+        concurrently for RECOMPUTE_ATTEMPTS attempts.
+        """
+        changed_day = date.fromisoformat(str(changed_date)[:10])
+        if changed_day >= datetime.utcnow().date():
+            return 0  # No cycle has started after it yet
+        first_affected = (changed_day + timedelta(days=1)).isoformat()
+        
+        for _ in range(RECOMPUTE_ATTEMPTS):
+            previous, affected = gather(
+                self.async_service.get_interest_cycles_by_loan(loan_id, end_date=changed_day.isoformat(), limit=1,
+                                                               newest_first=True),
+                self.async_service.get_interest_cycles_by_loan(loan_id, start_date=first_affected)
+            )
+            if not affected:
+                return 0
+            
+            # Balance at the start of the last unaffected cycle, or the principal before the first cycle
+            if previous:
+                balance = item_cents(previous[0], 'principalBalance')
+                payments_from = previous[0]['cycleStartDate']
+            else:
+                balance = item_cents(self.get_loan(loan_id) or {}, 'amount')
+                payments_from = None
+            last_start = date.fromisoformat(affected[-1]['cycleStartDate'])
+            payments = self.get_payments_by_loan(
+                loan_id,
+                start_date=payments_from,
+                end_date=(last_start - timedelta(days=1)).isoformat()
+            )
+            capital_payments = [
+                (payment.get('paymentDate', '')[:10], item_cents(payment, 'amount'))
+                for payment in payments
+                if payment.get('paymentType', 'capital') == 'capital'
+            ]
+            
+            changes = []
+            now = datetime.utcnow().isoformat()
+            next_payment = 0
+            for cycle in affected:
+                while (next_payment < len(capital_payments)
+                       and capital_payments[next_payment][0] < cycle['cycleStartDate']):
+                    balance -= capital_payments[next_payment][1]
+                    next_payment += 1
+                interest = monthly_interest_cents(balance, rate_units(cycle.get('interestRate', 0)))
+                if (balance, interest) != (item_cents(cycle, 'principalBalance'), item_cents(cycle, 'interestAmount')):
+                    updates = {**money_attributes(principalBalance=balance, interestAmount=interest), 'updatedAt': now}
+                    changes.append((cycle, updates))
+            
+            if not changes:
+                return 0
+            if self.update_interest_cycles(changes):
+                self.touch_loan(loan_id, 'cyclesUpdatedAt')
+                return len(changes)
+        raise RuntimeError(f'Interest cycles of loan {loan_id} kept changing while being recalculated')
     
     def get_interest_cycle_by_date(self, loan_id: str, cycle_start_date: str) -> Optional[Dict]:
         """Check if an interest cycle already exists for a specific date"""
@@ -144,10 +518,19 @@ class DynamoDBService:
                 return cycle
         return None
     
-    def calculate_accrued_interest(self, loan: Dict) -> Decimal:
-        """Calculate accrued interest based on days elapsed since approval"""
+    def get_loan_history(self, loan_id: str) -> Dict:
+        """Load a loan together with its payments and interest cycles"""
+        loan, payments, cycles = gather(
+            self.async_service.get_loan(loan_id),
+            self.async_service.get_payments_by_loan(loan_id),
+            self.async_service.get_interest_cycles_by_loan(loan_id)
+        )
+        return {'loan': loan, 'payments': payments, 'interestCycles': cycles}
+    
+    def calculate_accrued_interest_cents(self, loan: Dict) -> int:
+        """Calculate accrued interest in cents based on days elapsed since approval"""
         if not loan.get('approvedAt'):
-            return Decimal('0')
+            return 0
         
         approved_date = datetime.fromisoformat(loan['approvedAt'].replace('Z', '+00:00'))
         current_date = datetime.utcnow()
@@ -156,64 +539,79 @@ class DynamoDBService:
         days_elapsed = (current_date - approved_date).days
         
         if days_elapsed < 0:
-            return Decimal('0')
+            return 0
         
-        principal = Decimal(str(loan.get('amount', 0)))
-        monthly_rate = Decimal(str(loan.get('interestRate', 0))) / Decimal('100')
+        # Calculate monthly interest amount (rounded to the cent once per cycle)
+        monthly_interest = monthly_interest_cents(item_cents(loan, 'amount'), rate_units(loan.get('interestRate', 0)))
         
-        # Calculate monthly interest amount
-        monthly_interest_amount = principal * monthly_rate
-        
-        # Calculate months elapsed (using 30 days per month)
-        months_elapsed = Decimal(str(days_elapsed)) / Decimal('30')
-        
-        # Calculate number of complete billing cycles
-        completed_cycles = int(months_elapsed)
+        # Calculate number of complete billing cycles (using 30 days per month)
+        completed_cycles = days_elapsed // 30
         days_into_current_cycle = days_elapsed - (completed_cycles * 30)
         
         # If we're at least 1 day into a new cycle, count it as a full cycle
         billing_cycles = completed_cycles + 1 if days_into_current_cycle >= 1 else completed_cycles
         
         # Calculate total accrued interest
-        accrued_interest = monthly_interest_amount * Decimal(str(billing_cycles))
-        
-        return accrued_interest
+        return monthly_interest * billing_cycles
+    
+    def calculate_accrued_interest(self, loan: Dict) -> Decimal:
+        """Calculate accrued interest based on days elapsed since approval"""
+        return from_cents(self.calculate_accrued_interest_cents(loan))
+    
+    def _get_loan_with_payments(self, loan_id: str):
+        # Get the loan and all its payments concurrently
+        return gather(
+            self.async_service.get_loan(loan_id),
+            self.async_service.get_payments_by_loan(loan_id)
+        )
     
     def update_loan_balance(self, loan_id: str) -> None:
         """Calculate and update the balance amount for a loan based on capital payments only"""
-        # Get the loan
-        loan = self.get_loan(loan_id)
-        if not loan:
+        loan, payments = self._get_loan_with_payments(loan_id)
+        if not loan or loan.get('status') in ARCHIVED_LOAN_STATUSES:
+            self.bump_data_version()  # Nothing to update, but the caller's payment write still changed the data
             return
-        
-        # Get all payments for this loan
-        payments = self.get_payments_by_loan(loan_id)
-        
-        # Calculate total capital payments only (exclude interest payments)
-        total_capital_paid = sum(
-            Decimal(str(payment.get('amount', 0))) 
-            for payment in payments 
-            if payment.get('paymentType', 'capital') == 'capital'
-        )
-        
-        # Calculate total interest payments
-        total_interest_paid = sum(
-            Decimal(str(payment.get('amount', 0))) 
-            for payment in payments 
-            if payment.get('paymentType', 'capital') == 'interest'
-        )
+        self.update_loan(loan_id, self.loan_balance_updates(loan, payments))
+    
+    def update_loan_balances(self, loans: List[Dict]) -> None:
+        """
+        Recalculate the balances of several loans, reading their payments and
+        writing the updates concurrently; the data version is bumped once for all of them.
+        """
+        payments_by_loan = gather(*[
+            self.async_service.get_payments_by_loan(loan['loanId'])
+            for loan in loans
+        ])
+        gather(*[
+            self.async_service.update_loan(loan['loanId'], self.loan_balance_updates(loan, payments),
+                                           bump_version=False)
+            for loan, payments in zip(loans, payments_by_loan)
+        ])
+        if loans:
+            self.bump_data_version()
+    
+    def loan_balance_updates(self, loan: Dict, payments: List[Dict]) -> Dict:
+        """Balance attributes of a loan given all of its payments"""
+        # Calculate total capital and interest payments in cents
+        total_capital_paid = 0
+        total_interest_paid = 0
+        for payment in payments:
+            if payment.get('paymentType', 'capital') == 'capital':
+                total_capital_paid += item_cents(payment, 'amount')
+            elif payment.get('paymentType') == 'interest':
+                total_interest_paid += item_cents(payment, 'amount')
         
         # Calculate balance (principal - total capital paid)
-        principal = Decimal(str(loan.get('amount', 0)))
-        balance = principal - total_capital_paid
+        balance = item_cents(loan, 'amount') - total_capital_paid
         
         # Calculate accrued interest
-        accrued_interest = self.calculate_accrued_interest(loan)
+        accrued_interest = self.calculate_accrued_interest_cents(loan)
         
-        # Update the loan with new balances
-        self.update_loan(loan_id, {
-            'balanceAmount': balance,
-            'balanceInterestAmount': total_interest_paid,
-            'accruedInterest': accrued_interest,
+        return {
+            **money_attributes(
+                balanceAmount=balance,
+                balanceInterestAmount=total_interest_paid,
+                accruedInterest=accrued_interest
+            ),
             'updatedAt': datetime.utcnow().isoformat()
-        })
+        }
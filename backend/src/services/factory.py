@@ -0,0 +1,15 @@
+import os
+from functools import lru_cache
+from services.dynamodb_service import DynamoDBService
+
+@lru_cache(maxsize=None)
+def create_db_service() -> DynamoDBService:
+    """
+    Data access service for the configured STORAGE_MODE.
+    Built once per container, so every handler module loaded in it (all of
+    them under handlers.router) shares one connection pool.
+    """
+    if os.environ.get('STORAGE_MODE', 'multi_table') == 'single_table':
+        from services.single_table_service import SingleTableDynamoDBService
+        return SingleTableDynamoDBService()
+    return DynamoDBService()
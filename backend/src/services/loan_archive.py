@@ -0,0 +1,178 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+from boto3.dynamodb.conditions import Attr, Key
+from services.async_dynamodb_service import AsyncDynamoDBService
+from services.dynamodb_service import date_range_condition, projection
+from services.single_table_service import (
+    CYCLE_PREFIX, LOAN_SK, PAYMENT_PREFIX, from_single_table_item, loan_pk, to_single_table_item
+)
+
+# Loans in this status are archived once they have not changed for ARCHIVE_AFTER_DAYS
+SETTLED_STATUS = 'paid'
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+# Tombstone statuses: payments and cycles are still being moved / everything is in the archive
+ARCHIVING_STATUS = 'archiving'
+ARCHIVED_STATUS = 'archived'
+# Attributes the tombstone keeps in the hot table
+TOMBSTONE_ATTRIBUTES = ('loanId', 'borrowerId')
+
+class LoanArchive:
+    """
+    Settled loans moved out of the hot tables (ARCHIVE_TABLE).
+
+    The archive uses the single-table layout (PK=LOAN#<loanId>, SK=LOAN,
+    PAYMENT#..., CYCLE#...) in either storage mode, so an archived loan with
+    its whole history is one Query. In the hot table the loan is replaced by
+    a tombstone (loanId, borrowerId, status 'archived', archivedAt) that the
+    default loan scans skip and that still answers GET /loans/{id}.
+    Read methods mirror DynamoDBService so handlers can use either.
+    """
+
+    def __init__(self, db_service, table_name: Optional[str] = None):
+        self.db_service = db_service
+        self.table = db_service.dynamodb.Table(table_name or os.environ.get('ARCHIVE_TABLE', 'LoanArchive'))
+        self.async_service = AsyncDynamoDBService(self)
+
+    @staticmethod
+    def is_tombstone(loan: Optional[Dict]) -> bool:
+        return bool(loan) and loan.get('status') in (ARCHIVING_STATUS, ARCHIVED_STATUS)
+
+    # Archival
+    def archive_loan(self, loan_id: str) -> bool:
+        """
+        Move a settled loan, its payments and its interest cycles to the archive.
+
+        Steps, each safe to repeat:
+          1. batch-write the loan and its history to the archive table
+          2. swap the loan for an 'archiving' tombstone, only if it is still
+             settled and unchanged since it was read
+          3. batch-delete its payments and cycles from the hot tables
+          4. mark the tombstone 'archived'
+        A run interrupted after step 2 is resumed by archiving the loan again.
+        Does not bump the data version; callers do that once per run.
+        Returns whether anything was moved.
+        """
+        # Sequential reads: this runs on the shared executor, where a nested gather could starve it
+        loan = self.db_service.get_loan(loan_id)
+        if not loan or loan.get('status') not in (SETTLED_STATUS, ARCHIVING_STATUS):
+            return False
+        payments = self.db_service.get_payments_by_loan(loan_id)
+        cycles = self.db_service.get_interest_cycles_by_loan(loan_id)
+
+        with self.table.batch_writer() as batch:
+            if loan['status'] == SETTLED_STATUS:
+                batch.put_item(Item=to_single_table_item('loan', loan))
+            for payment in payments:
+                batch.put_item(Item=to_single_table_item('payment', payment))
+            for cycle in cycles:
+                batch.put_item(Item=to_single_table_item('cycle', cycle))
+
+        if loan['status'] == SETTLED_STATUS and not self._put_tombstone(loan):
+            return False
+
+        with self.db_service.payments_table.batch_writer() as batch:
+            for payment in payments:
+                batch.delete_item(Key=self.db_service._payment_key(payment))
+        with self.db_service.interest_cycles_table.batch_writer() as batch:
+            for cycle in cycles:
+                batch.delete_item(Key=self.db_service._cycle_key(cycle))
+
+        self.db_service.loans_table.update_item(
+            Key=self.db_service._loan_key(loan_id),
+            UpdateExpression='SET #status = :archived',
+            ConditionExpression='#status = :archiving',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':archived': ARCHIVED_STATUS, ':archiving': ARCHIVING_STATUS}
+        )
+        return True
+
+    def _put_tombstone(self, loan: Dict) -> bool:
+        now = datetime.utcnow().isoformat()
+        tombstone = {
+            **{name: loan[name] for name in TOMBSTONE_ATTRIBUTES if name in loan},
+            'status': ARCHIVING_STATUS,
+            'archivedAt': now,
+            'updatedAt': now
+        }
+        # A payment or status change since the read refreshes updatedAt, which aborts the swap
+        if 'updatedAt' in loan:
+            condition = '#status = :settled AND #updatedAt = :updatedAt'
+            values = {':settled': SETTLED_STATUS, ':updatedAt': loan['updatedAt']}
+        else:
+            condition = '#status = :settled AND attribute_not_exists(#updatedAt)'
+            values = {':settled': SETTLED_STATUS}
+        try:
+            self.db_service.loans_table.put_item(
+                Item=self.db_service._loan_item(tombstone),
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#status': 'status', '#updatedAt': 'updatedAt'},
+                ExpressionAttributeValues=values
+            )
+        except self.db_service.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def delete_loan(self, loan_id: str) -> None:
+        """Delete an archived loan and its history from the archive"""
+        items = self._query_partition(loan_id, ProjectionExpression='PK, SK')
+        with self.table.batch_writer() as batch:
+            for item in items:
+                batch.delete_item(Key={'PK': item['PK'], 'SK': item['SK']})
+
+    # Reads
+    def _query_partition(self, loan_id: str, sort_key_condition=None, **kwargs) -> List[Dict]:
+        key_condition = Key('PK').eq(loan_pk(loan_id))
+        if sort_key_condition is not None:
+            key_condition = key_condition & sort_key_condition
+        return self.db_service._query_all(self.table, KeyConditionExpression=key_condition, **kwargs)
+
+    def get_loan(self, loan_id: str) -> Optional[Dict]:
+        response = self.table.get_item(Key={'PK': loan_pk(loan_id), 'SK': LOAN_SK})
+        return from_single_table_item(response.get('Item'))
+
+    def get_payments_by_loan(self, loan_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             limit: Optional[int] = None, newest_first: bool = False) -> List[Dict]:
+        items = self._query_partition(
+            loan_id,
+            date_range_condition('SK', start_date, end_date, prefix=PAYMENT_PREFIX),
+            limit=limit,
+            ScanIndexForward=not newest_first
+        )
+        return [from_single_table_item(item) for item in items]
+
+    def get_interest_cycles_by_loan(self, loan_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                                    limit: Optional[int] = None, newest_first: bool = False) -> List[Dict]:
+        items = self._query_partition(
+            loan_id,
+            date_range_condition('SK', start_date, end_date, prefix=CYCLE_PREFIX),
+            limit=limit,
+            ScanIndexForward=not newest_first
+        )
+        return [from_single_table_item(item) for item in items]
+
+    def resolve(self, loans: List[Dict]) -> List[Dict]:
+        """Replace tombstones with the archived loans, marked with their archivedAt"""
+        tombstones = {loan['loanId']: loan for loan in loans if self.is_tombstone(loan)}
+        if not tombstones:
+            return loans
+        keys = [{'PK': loan_pk(loan_id), 'SK': LOAN_SK} for loan_id in tombstones]
+        archived = {}
+        for item in self.db_service._batch_get_all(self.table, keys):
+            loan = from_single_table_item(item)
+            archived[loan['loanId']] = {**loan, 'archivedAt': tombstones[loan['loanId']].get('archivedAt')}
+        return [archived.get(loan['loanId'], loan) if loan['loanId'] in tombstones else loan for loan in loans]
+
+    def get_all_payments(self, attributes: Optional[List[str]] = None) -> List[Dict]:
+        """Every archived payment, optionally reading only the given attributes"""
+        scan_kwargs = projection(attributes)
+        items = self.db_service._scan_all(
+            self.table,
+            FilterExpression=Attr('SK').begins_with(PAYMENT_PREFIX),
+            **scan_kwargs
+        )
+        return [from_single_table_item(item) for item in items]
+
+def include_archived(query_params: Dict) -> bool:
+    """The ?includeArchived=true request flag"""
+    return str(query_params.get('includeArchived', '')).strip().lower() in ('true', '1', 'yes')
@@ -0,0 +1,273 @@
+"""
+Columnar portfolio snapshot.
+
+A scheduled job (handlers/snapshots.py) writes the portfolio columns
+(services/analytics.py) to one file, locally or to S3 (or an S3-compatible
+store through AWS_ENDPOINT_URL_S3). Report handlers memory-map it and read
+the numeric columns in place, without a table scan; loans written since the
+snapshot was built are read live and merged in.
+
+File layout (native byte order, recorded in the header):
+    8 bytes   b'PFSNAP01'
+    4 bytes   header length (little-endian uint32)
+    header    JSON: dataVersion, builtAt, watermark, loans, payments and
+              columns {name: [typecode, offset, length]}, offsets relative
+              to the data section
+    data      fixed-width columns, each 8-byte aligned. String columns hold
+              int32 codes into a dictionary stored as 'strings.offsets'
+              (int64, count + 1) and 'strings.data' (UTF-8 bytes); -1 is None.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Optional, Sequence, Tuple
+import boto3
+from botocore.exceptions import ClientError
+from services.analytics import LOAN_COLUMNS, LOAN_STRING_COLUMNS, PAYMENT_ATTRIBUTES, PAYMENT_COLUMNS, PortfolioColumns
+from utils.async_bridge import gather
+
+# s3://bucket/key or a file path; empty disables the snapshot
+PORTFOLIO_SNAPSHOT = os.environ.get('PORTFOLIO_SNAPSHOT', '')
+# Older snapshots are ignored and reports read the tables
+SNAPSHOT_MAX_AGE_SECONDS = int(os.environ.get('SNAPSHOT_MAX_AGE_SECONDS', '86400'))
+# Loans updated this long before a build started are re-read as deltas, covering clock skew between functions
+WATERMARK_MARGIN_SECONDS = 60
+# Where a container keeps its copy of an S3 snapshot
+LOCAL_COPY_PATH = os.path.join(os.environ.get('TMPDIR', '/tmp'), 'portfolio-snapshot.bin')
+
+MAGIC = b'PFSNAP01'
+_PREFIX = struct.Struct('<8sI')
+_ALIGNMENT = 8
+
+class StringColumn(Sequence):
+    """String column decoded from dictionary codes on access"""
+
+    def __init__(self, codes: Sequence[int], strings: 'StringTable'):
+        self.codes = codes
+        self.strings = strings
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        code = self.codes[row]
+        return None if code < 0 else self.strings[code]
+
+class StringTable:
+    def __init__(self, offsets: Sequence[int], data: memoryview):
+        self.offsets = offsets
+        self.data = data
+        self._decoded: Dict[int, str] = {}
+
+    def __getitem__(self, code: int) -> str:
+        value = self._decoded.get(code)
+        if value is None:
+            value = self._decoded[code] = str(self.data[self.offsets[code]:self.offsets[code + 1]], 'utf-8')
+        return value
+
+class PortfolioSnapshot:
+    """A snapshot file mapped into memory; its numeric columns are memoryviews over the mapping"""
+
+    def __init__(self, buffer, path: str):
+        self.buffer = buffer
+        self.path = path
+        view = memoryview(buffer)
+        magic, header_length = _PREFIX.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a portfolio snapshot')
+        self.header = json.loads(bytes(view[_PREFIX.size:_PREFIX.size + header_length]))
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f'{path} was written on a {self.header["byteorder"]}-endian machine')
+        self._data = view[_align(_PREFIX.size + header_length):]
+        self._columns: Optional[PortfolioColumns] = None
+
+    @classmethod
+    def open(cls, path: str) -> 'PortfolioSnapshot':
+        with open(path, 'rb') as snapshot_file:
+            return cls(mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ), path)
+
+    @property
+    def data_version(self) -> Optional[int]:
+        return self.header['dataVersion']
+
+    @property
+    def watermark(self) -> str:
+        return self.header['watermark']
+
+    def age_seconds(self) -> float:
+        return (datetime.utcnow() - datetime.fromisoformat(self.header['builtAt'])).total_seconds()
+
+    def column(self, name: str) -> memoryview:
+        typecode, offset, length = self.header['columns'][name]
+        size = length * array(typecode).itemsize
+        return self._data[offset:offset + size].cast(typecode)
+
+    @property
+    def columns(self) -> PortfolioColumns:
+        if self._columns is None:
+            strings = StringTable(self.column('strings.offsets'), self.column('strings.data'))
+            loans = {name: StringColumn(self.column(f'loans.{name}'), strings) for name in LOAN_STRING_COLUMNS}
+            loans.update({name: self.column(f'loans.{name}') for name in LOAN_COLUMNS})
+            payments = {name: self.column(f'payments.{name}') for name in PAYMENT_COLUMNS}
+            self._columns = PortfolioColumns(loans, payments)
+        return self._columns
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+def encode_snapshot(columns: PortfolioColumns, data_version: Optional[int], built_at: str, watermark: str) -> bytes:
+    strings: Dict[str, int] = {}
+
+    def codes(values) -> array:
+        return array('i', (-1 if value is None else strings.setdefault(str(value), len(strings)) for value in values))
+
+    blocks = [(f'loans.{name}', codes(columns.loans[name])) for name in LOAN_STRING_COLUMNS]
+    blocks += [(f'loans.{name}', array(typecode, columns.loans[name])) for name, typecode in LOAN_COLUMNS.items()]
+    blocks += [(f'payments.{name}', array(typecode, columns.payments[name])) for name, typecode in PAYMENT_COLUMNS.items()]
+    encoded = [value.encode('utf-8') for value in strings]  # In code order
+    blocks.append(('strings.offsets', array('q', accumulate([0] + [len(value) for value in encoded]))))
+    blocks.append(('strings.data', array('B', b''.join(encoded))))
+
+    layout = {}
+    offset = 0
+    for name, values in blocks:
+        layout[name] = [values.typecode, offset, len(values)]
+        offset = _align(offset + len(values) * values.itemsize)
+    header = json.dumps({
+        'format': 1,
+        'byteorder': sys.byteorder,
+        'dataVersion': data_version,
+        'builtAt': built_at,
+        'watermark': watermark,
+        'loans': columns.loan_count,
+        'payments': len(columns.payments['loan_row']),
+        'columns': layout
+    }).encode('utf-8')
+
+    data_start = _align(_PREFIX.size + len(header))
+    output = bytearray(data_start + offset)
+    _PREFIX.pack_into(output, 0, MAGIC, len(header))
+    output[_PREFIX.size:_PREFIX.size + len(header)] = header
+    for name, values in blocks:
+        start = data_start + layout[name][1]
+        output[start:start + len(values) * values.itemsize] = values.tobytes()
+    return bytes(output)
+
+# Storage
+def _s3_location(location: str) -> Optional[Tuple[str, str]]:
+    if not location.startswith('s3://'):
+        return None
+    bucket, _, key = location[len('s3://'):].partition('/')
+    return bucket, key
+
+def save_snapshot(data: bytes, location: str) -> None:
+    s3_location = _s3_location(location)
+    if s3_location:
+        boto3.client('s3').put_object(Bucket=s3_location[0], Key=s3_location[1], Body=data)
+        return
+    # Readers never see a partial file
+    partial_path = f'{location}.partial'
+    with open(partial_path, 'wb') as snapshot_file:
+        snapshot_file.write(data)
+    os.replace(partial_path, location)
+
+# The snapshot this container has mapped, and the S3 ETag or file mtime it was read at
+_opened: Tuple[Optional[str], Optional[PortfolioSnapshot]] = (None, None)
+_opened_lock = threading.Lock()
+
+def open_snapshot(location: str) -> Optional[PortfolioSnapshot]:
+    """The latest snapshot at location (re-read only when it changed), or None if there is none"""
+    global _opened
+    s3_location = _s3_location(location)
+    try:
+        if s3_location:
+            s3 = boto3.client('s3')
+            tag = s3.head_object(Bucket=s3_location[0], Key=s3_location[1])['ETag']
+        else:
+            tag = str(os.stat(location).st_mtime_ns)
+    except (ClientError, FileNotFoundError):
+        return None
+    with _opened_lock:
+        if _opened[0] == tag:
+            return _opened[1]
+        path = location
+        if s3_location:
+            s3.download_file(s3_location[0], s3_location[1], f'{LOCAL_COPY_PATH}.partial')
+            # A mapping of the previous copy stays valid after the replace
+            os.replace(f'{LOCAL_COPY_PATH}.partial', LOCAL_COPY_PATH)
+            path = LOCAL_COPY_PATH
+        _opened = (tag, PortfolioSnapshot.open(path))
+        return _opened[1]
+
+# Building and reading the portfolio
+def build_portfolio(db_service, loan_archive) -> PortfolioColumns:
+    """Loans and payments, archived ones included, read from the tables"""
+    loans, payments, archived_payments = gather(
+        db_service.async_service.get_all_loans(include_archived=True),
+        db_service.async_service.get_all_payments(PAYMENT_ATTRIBUTES),
+        loan_archive.async_service.get_all_payments(PAYMENT_ATTRIBUTES)
+    )
+    return PortfolioColumns.build(loan_archive.resolve(loans), payments + archived_payments)
+
+def write_portfolio_snapshot(db_service, loan_archive, location: str) -> Dict:
+    # The version and watermark are taken before reading, so writes during the build are picked up as deltas
+    now = datetime.utcnow()
+    watermark = (now - timedelta(seconds=WATERMARK_MARGIN_SECONDS)).isoformat()
+    try:
+        data_version = db_service.get_data_version()
+    except Exception as e:
+        print(f"Error reading data version: {str(e)}")
+        data_version = None
+    columns = build_portfolio(db_service, loan_archive)
+    data = encode_snapshot(columns, data_version, now.isoformat(), watermark)
+    save_snapshot(data, location)
+    return {
+        'loans': columns.loan_count,
+        'payments': len(columns.payments['loan_row']),
+        'bytes': len(data),
+        'dataVersion': data_version
+    }
+
+def merge_deltas(columns: PortfolioColumns, watermark: str, db_service, loan_archive) -> PortfolioColumns:
+    """
+    Bring snapshot columns up to date: loans updated after the watermark
+    (every payment write refreshes its loan's updatedAt) or created since
+    are read again with their payments, and deleted loans are dropped.
+    Costs one keys-and-timestamps scan of the loans table plus the changed loans.
+    """
+    current = db_service.get_all_loans(include_archived=True, attributes=['loanId', 'updatedAt'])
+    known = set(columns.loans['loan_id'])
+    changed = [
+        loan['loanId'] for loan in current
+        if loan['loanId'] not in known or str(loan.get('updatedAt', '')) > watermark
+    ]
+    removed = known - {loan['loanId'] for loan in current}
+    if not changed and not removed:
+        return columns
+    loans = loan_archive.resolve(db_service.batch_get_loans(changed))
+    payments_by_loan = gather(*[
+        (loan_archive if 'archivedAt' in loan else db_service).async_service.get_payments_by_loan(loan['loanId'])
+        for loan in loans
+    ])
+    delta = PortfolioColumns.build(loans, [payment for payments in payments_by_loan for payment in payments])
+    return columns.without_loans(set(changed) | removed).extend(delta)
+
+def portfolio_columns(db_service, loan_archive, data_version: Optional[int]) -> PortfolioColumns:
+    """Portfolio columns from the snapshot when it is fresh enough (merged with deltas), otherwise from the tables"""
+    snapshot = None
+    if PORTFOLIO_SNAPSHOT:
+        try:
+            snapshot = open_snapshot(PORTFOLIO_SNAPSHOT)
+        except Exception as e:
+            print(f"Error reading portfolio snapshot: {str(e)}")
+    if snapshot is None or snapshot.age_seconds() > SNAPSHOT_MAX_AGE_SECONDS:
+        return build_portfolio(db_service, loan_archive)
+    if data_version is not None and snapshot.data_version == data_version:
+        return snapshot.columns
+    return merge_deltas(snapshot.columns, snapshot.watermark, db_service, loan_archive)
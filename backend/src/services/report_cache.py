@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from utils.settings import env_flag
+
+# Also keep report results in the cache table so every container shares them
+SHARED_REPORT_CACHE = env_flag('SHARED_REPORT_CACHE')
+# Reports kept per warm container
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', '32'))
+# Upper bound on the age of a cached report, in case a data version bump was lost
+REPORT_CACHE_TTL_SECONDS = int(os.environ.get('REPORT_CACHE_TTL_SECONDS', '300'))
+
+class ReportCache:
+    """
+    Report results keyed by (kind, startDate, endDate), valid for one data version.
+
+    Loan, payment and borrower writes bump the global data version
+    (DynamoDBService.bump_data_version), so a cached report is served only
+    while the version it was built at is still current. Accrued interest
+    depends on the current date, so the UTC day is part of the key too.
+    """
+
+    def __init__(self, db_service, max_entries: int = REPORT_CACHE_SIZE,
+                 ttl_seconds: int = REPORT_CACHE_TTL_SECONDS, shared: bool = SHARED_REPORT_CACHE):
+        self.db_service = db_service
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(start_date: Optional[str], end_date: Optional[str], kind: str = 'report') -> str:
+        return f"{kind}#{start_date or ''}#{end_date or ''}#{datetime.utcnow().date().isoformat()}"
+
+    def data_version(self) -> Optional[int]:
+        """Current data version, or None if it cannot be read (the report is then built uncached)"""
+        try:
+            return self.db_service.get_data_version()
+        except Exception as e:
+            print(f"Error reading data version: {str(e)}")
+            return None
+
+    def get(self, key: str, version: Optional[int]) -> Optional[Dict]:
+        if version is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                return entry[2]
+        if not self.shared:
+            return None
+        try:
+            item = self.db_service.get_cached_report(key)
+        except Exception as e:
+            print(f"Error reading cached report {key}: {str(e)}")
+            return None
+        if not item or int(item.get('dataVersion', -1)) != version:
+            return None
+        # DynamoDB TTL deletes expired items only eventually, so an expired one may still be read
+        remaining = int(item.get('expiresAt', 0)) - time.time()
+        if remaining <= 0:
+            return None
+        report = json.loads(item['report'])
+        self._remember(key, version, report, age=max(self.ttl_seconds - remaining, 0))
+        return report
+
+    def put(self, key: str, version: Optional[int], report: Dict) -> None:
+        if version is None:
+            return
+        self._remember(key, version, report)
+        if self.shared:
+            try:
+                self.db_service.put_cached_report(key, version, json.dumps(report), self.ttl_seconds)
+            except Exception as e:
+                print(f"Error storing cached report {key}: {str(e)}")
+
+    def _remember(self, key: str, version: int, report: Dict, age: float = 0) -> None:
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() - age, report)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
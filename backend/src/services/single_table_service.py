@@ -0,0 +1,261 @@
+import os
+from boto3.dynamodb.conditions import Attr, Key
+from typing import Dict, List, Optional
+from services.dynamodb_service import ARCHIVED_LOAN_STATUSES, DynamoDBService, date_range_condition, projection
+
+# Single-table layout: every item of a loan shares the loan's partition
+#   PK = LOAN#<loanId>
+#   SK = LOAN                                  the loan itself
+#        PAYMENT#<paymentDate>#<paymentId>     its payments, sorted by date
+#        CYCLE#<cycleStartDate>                its interest cycles, sorted by start date
+# Borrowers stay in their own table.
+# Only loan items carry loanItemId, so LoanIndex (keyed on it) is a sparse index of the loans alone.
+LOAN_SK = 'LOAN'
+PAYMENT_PREFIX = 'PAYMENT#'
+CYCLE_PREFIX = 'CYCLE#'
+LOAN_INDEX = 'LoanIndex'
+LOAN_INDEX_KEY = 'loanItemId'
+KEY_ATTRIBUTES = ('PK', 'SK', 'entityType', LOAN_INDEX_KEY)
+
+def loan_pk(loan_id: str) -> str:
+    return f'LOAN#{loan_id}'
+
+def payment_sk(payment: Dict) -> str:
+    return f"{PAYMENT_PREFIX}{payment.get('paymentDate', '')}#{payment['paymentId']}"
+
+def cycle_sk(cycle: Dict) -> str:
+    return f"{CYCLE_PREFIX}{cycle['cycleStartDate']}"
+
+def to_single_table_item(entity_type: str, item: Dict) -> Dict:
+    """Add the single-table keys to a loan, payment or cycle item"""
+    if entity_type == 'loan':
+        return {'PK': loan_pk(item['loanId']), 'SK': LOAN_SK, 'entityType': entity_type,
+                LOAN_INDEX_KEY: item['loanId'], **item}
+    elif entity_type == 'payment':
+        sort_key = payment_sk(item)
+    elif entity_type == 'cycle':
+        sort_key = cycle_sk(item)
+    else:
+        raise ValueError(f'Unknown entity type: {entity_type}')
+    return {'PK': loan_pk(item['loanId']), 'SK': sort_key, 'entityType': entity_type, **item}
+
+def from_single_table_item(item: Optional[Dict]) -> Optional[Dict]:
+    """Strip the single-table keys so callers see the same shape as the per-entity tables"""
+    if item is None:
+        return None
+    return {k: v for k, v in item.items() if k not in KEY_ATTRIBUTES}
+
+class SingleTableDynamoDBService(DynamoDBService):
+    """
+    DynamoDBService storing loans, payments and interest cycles in one table
+    (SINGLE_TABLE) so a loan's full history is a single Query.
+    Enabled with STORAGE_MODE=single_table.
+    """
+
+    LOAN_HISTORY_IN_ONE_QUERY = True
+
+    def __init__(self):
+        super().__init__()
+        self.single_table = self.dynamodb.Table(os.environ.get('SINGLE_TABLE', 'LoanHistory'))
+        # Inherited helpers that address these tables now hit the single table
+        self.loans_table = self.single_table
+        self.payments_table = self.single_table
+        self.interest_cycles_table = self.single_table
+
+    def _query_partition(self, loan_id: str, sort_key_condition=None, **kwargs) -> List[Dict]:
+        key_condition = Key('PK').eq(loan_pk(loan_id))
+        if sort_key_condition is not None:
+            key_condition = key_condition & sort_key_condition
+        return self._query_all(self.single_table, KeyConditionExpression=key_condition, **kwargs)
+
+    # Loan operations
+    def _loan_key(self, loan_id: str) -> Dict:
+        return {'PK': loan_pk(loan_id), 'SK': LOAN_SK}
+
+    def _loan_item(self, loan: Dict) -> Dict:
+        return to_single_table_item('loan', loan)
+
+    def create_loan(self, loan: Dict) -> Dict:
+        self.single_table.put_item(Item=to_single_table_item('loan', loan))
+        self.bump_data_version()
+        return loan
+
+    def get_loan(self, loan_id: str) -> Optional[Dict]:
+        response = self.single_table.get_item(Key=self._loan_key(loan_id))
+        return from_single_table_item(response.get('Item'))
+
+    def batch_get_loans(self, loan_ids: List[str]) -> List[Dict]:
+        keys = [self._loan_key(loan_id) for loan_id in dict.fromkeys(loan_ids)]
+        return [from_single_table_item(loan) for loan in self._batch_get_all(self.single_table, keys)]
+
+    def get_all_loans(self, include_archived: bool = False, attributes: Optional[List[str]] = None) -> List[Dict]:
+        # Scanning the sparse LoanIndex reads (and bills) the loan items only, never payments or cycles;
+        # it is keyed per loan, so a write-heavy day does not pile every loan onto one index partition
+        kwargs = projection(attributes)
+        if not include_archived:
+            kwargs['FilterExpression'] = ~Attr('status').is_in(ARCHIVED_LOAN_STATUSES)
+        items = self._scan_all(self.single_table, IndexName=LOAN_INDEX, **kwargs)
+        return [from_single_table_item(item) for item in items]
+
+    # The single table's indexes project every attribute, so no lookups by key are needed
+    def get_loans_by_borrower(self, borrower_id: str) -> List[Dict]:
+        items = self._query_all(
+            self.single_table,
+            IndexName='BorrowerIdIndex',
+            KeyConditionExpression=Key('borrowerId').eq(borrower_id)
+        )
+        return [from_single_table_item(item) for item in items]
+
+    def get_loans_by_status(self, status: str) -> List[Dict]:
+        items = self._query_all(
+            self.single_table,
+            IndexName='StatusIndex',
+            KeyConditionExpression=Key('status').eq(status)
+        )
+        return [from_single_table_item(item) for item in items]
+
+    def delete_loan(self, loan_id: str) -> None:
+        """Delete the loan together with every payment and cycle in its partition"""
+        items = self._query_all(
+            self.single_table,
+            KeyConditionExpression=Key('PK').eq(loan_pk(loan_id)),
+            ProjectionExpression='PK, SK'
+        )
+        with self.single_table.batch_writer() as batch:
+            for item in items:
+                batch.delete_item(Key={'PK': item['PK'], 'SK': item['SK']})
+        self.bump_data_version()
+
+    def get_loan_history(self, loan_id: str) -> Dict:
+        items = self._query_partition(loan_id)
+        history = {'loan': None, 'payments': [], 'interestCycles': []}
+        for item in items:
+            if item['SK'] == LOAN_SK:
+                history['loan'] = from_single_table_item(item)
+            elif item['SK'].startswith(PAYMENT_PREFIX):
+                history['payments'].append(from_single_table_item(item))
+            elif item['SK'].startswith(CYCLE_PREFIX):
+                history['interestCycles'].append(from_single_table_item(item))
+        return history
+
+    def _get_loan_with_payments(self, loan_id: str):
+        # LOAN < PAYMENT#..., and CYCLE#... sorts before both, so one range covers the loan and its payments
+        items = self._query_partition(loan_id, Key('SK').between(LOAN_SK, PAYMENT_PREFIX + '\uffff'))
+        loan = None
+        payments = []
+        for item in items:
+            if item['SK'] == LOAN_SK:
+                loan = from_single_table_item(item)
+            else:
+                payments.append(from_single_table_item(item))
+        return loan, payments
+
+    # Payment operations
+    def _get_payment_item(self, payment_id: str) -> Optional[Dict]:
+        items = self._query_all(
+            self.single_table,
+            IndexName='PaymentIdIndex',
+            KeyConditionExpression=Key('paymentId').eq(payment_id)
+        )
+        return items[0] if items else None
+
+    def create_payment(self, payment: Dict, bump_version: bool = True) -> Dict:
+        self.single_table.put_item(Item=to_single_table_item('payment', payment))
+        if bump_version:
+            self.bump_data_version()
+        return payment
+
+    def _payment_item(self, payment: Dict) -> Dict:
+        # Used by the inherited batched create_payments
+        return to_single_table_item('payment', payment)
+
+    def _payment_key(self, payment: Dict) -> Dict:
+        return {'PK': loan_pk(payment['loanId']), 'SK': payment_sk(payment)}
+
+    def get_payment(self, payment_id: str) -> Optional[Dict]:
+        return from_single_table_item(self._get_payment_item(payment_id))
+
+    def get_payments_by_loan(self, loan_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             limit: Optional[int] = None, newest_first: bool = False) -> List[Dict]:
+        # Payment sort keys start with the payment date, so the date range is a sort key range
+        items = self._query_partition(
+            loan_id,
+            date_range_condition('SK', start_date, end_date, prefix=PAYMENT_PREFIX),
+            limit=limit,
+            ScanIndexForward=not newest_first
+        )
+        return [from_single_table_item(item) for item in items]
+
+    def get_all_payments(self, attributes: Optional[List[str]] = None) -> List[Dict]:
+        scan_kwargs = projection(attributes)
+        scan_kwargs.setdefault('ExpressionAttributeNames', {})['#entityType'] = 'entityType'
+        items = self._scan_all(
+            self.single_table,
+            FilterExpression='#entityType = :entityType',
+            ExpressionAttributeValues={':entityType': 'payment'},
+            **scan_kwargs
+        )
+        return [from_single_table_item(item) for item in items]
+
+    def update_payment(self, payment_id: str, updates: Dict, bump_version: bool = True) -> None:
+        item = self._get_payment_item(payment_id)
+        if not item:
+            return
+        updated = {**from_single_table_item(item), **updates}
+        new_item = to_single_table_item('payment', updated)
+        if new_item['SK'] == item['SK']:
+            update_expression = 'SET ' + ', '.join([f'#{k} = :{k}' for k in updates.keys()])
+            self.single_table.update_item(
+                Key={'PK': item['PK'], 'SK': item['SK']},
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames={f'#{k}': k for k in updates.keys()},
+                ExpressionAttributeValues={f':{k}': v for k, v in updates.items()}
+            )
+        else:
+            # The payment date is part of the sort key, so a date change moves the item
+            self.single_table.put_item(Item=new_item)
+            self.single_table.delete_item(Key={'PK': item['PK'], 'SK': item['SK']})
+        if bump_version:
+            self.bump_data_version()
+
+    def delete_payment(self, payment_id: str, bump_version: bool = True) -> None:
+        item = self._get_payment_item(payment_id)
+        if item:
+            self.single_table.delete_item(Key={'PK': item['PK'], 'SK': item['SK']})
+            if bump_version:
+                self.bump_data_version()
+
+    # Interest Cycles operations
+    def _cycle_key(self, cycle: Dict) -> Dict:
+        return {'PK': loan_pk(cycle['loanId']), 'SK': cycle_sk(cycle)}
+
+    def create_interest_cycle(self, cycle: Dict) -> Dict:
+        self.single_table.put_item(Item=to_single_table_item('cycle', cycle))
+        self.touch_loan(cycle['loanId'], 'cyclesUpdatedAt')
+        return cycle
+
+    def create_interest_cycle_if_absent(self, cycle: Dict) -> bool:
+        # A loan has at most one cycle per start date, which is the sort key
+        try:
+            self.single_table.put_item(
+                Item=to_single_table_item('cycle', cycle),
+                ConditionExpression='attribute_not_exists(SK)'
+            )
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        self.touch_loan(cycle['loanId'], 'cyclesUpdatedAt')
+        return True
+
+    def get_interest_cycles_by_loan(self, loan_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                                    limit: Optional[int] = None, newest_first: bool = False) -> List[Dict]:
+        items = self._query_partition(
+            loan_id,
+            date_range_condition('SK', start_date, end_date, prefix=CYCLE_PREFIX),
+            limit=limit,
+            ScanIndexForward=not newest_first
+        )
+        return [from_single_table_item(item) for item in items]
+
+    def get_interest_cycle_by_date(self, loan_id: str, cycle_start_date: str) -> Optional[Dict]:
+        response = self.single_table.get_item(Key={'PK': loan_pk(loan_id), 'SK': CYCLE_PREFIX + cycle_start_date})
+        return from_single_table_item(response.get('Item'))
@@ -0,0 +1,185 @@
+"""
+Client-side DynamoDB throughput governor.
+
+Scheduled jobs and bulk scripts would otherwise read and write as fast as
+boto3 allows, and the throttling they cause under PAY_PER_REQUEST also hits
+the API. Calls made at background priority (inside background_job or
+background_calls) are paced by token buckets in read and write capacity
+units per second, sized to a share of THROUGHPUT_READ_CAPACITY /
+THROUGHPUT_WRITE_CAPACITY:
+
+- every call requests ReturnConsumedCapacity and the units it actually
+  consumed are taken from the bucket, so a call may overdraw it and the
+  next background call waits until the debt is paid off
+- calls outside background priority are never delayed
+- a throttled attempt halves the bucket's rate; it then recovers linearly
+  to the configured rate over RECOVERY_SECONDS
+
+Buckets are per container (per process for scripts), not global. The
+scheduled jobs and the stream consumer run in their own functions, so API
+traffic is not counted against their buckets: the share caps what each
+background container takes, whatever the API is doing. Bulk scripts pace
+all of their calls with --read-capacity / --write-capacity.
+"""
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+# Capacity units per second the application aims to stay under; 0 disables the governor
+THROUGHPUT_READ_CAPACITY = float(os.environ.get('THROUGHPUT_READ_CAPACITY', '0') or 0)
+THROUGHPUT_WRITE_CAPACITY = float(os.environ.get('THROUGHPUT_WRITE_CAPACITY', '0') or 0)
+# Share of that capacity background calls may use, unless BACKGROUND_THROUGHPUT_SHARE sets another
+DEFAULT_BACKGROUND_THROUGHPUT_SHARE = 0.25
+# After a throttle, seconds until the rate is back to the configured one, and the lowest it backs off to
+RECOVERY_SECONDS = 30
+MIN_RATE_FRACTION = 0.05
+
+READ_OPERATIONS = {'GetItem', 'BatchGetItem', 'Query', 'Scan', 'TransactGetItems'}
+WRITE_OPERATIONS = {'PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'}
+THROTTLING_ERRORS = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+
+_background = contextvars.ContextVar('background_throughput', default=False)
+
+class TokenBucket:
+    """Capacity units refilled at `rate` per second, holding at most one second's worth; may be overdrawn"""
+
+    def __init__(self, rate: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.tokens + elapsed * self.rate, self.rate)
+        self.rate = min(self.rate + elapsed * self.max_rate / RECOVERY_SECONDS, self.max_rate)
+
+    def wait(self) -> None:
+        """Block until the bucket is out of debt"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 0:
+                    return
+                delay = -self.tokens / self.rate
+            time.sleep(delay)
+
+    def consume(self, units: float) -> None:
+        with self.lock:
+            self._refill()
+            self.tokens -= units
+
+    def throttled(self) -> None:
+        with self.lock:
+            self._refill()
+            self.rate = max(self.rate / 2, self.max_rate * MIN_RATE_FRACTION)
+            self.tokens = min(self.tokens, 0)
+
+def background_throughput_share() -> float:
+    """
+    BACKGROUND_THROUGHPUT_SHARE, a number greater than 0 (0 would stop
+    background work entirely) and at most 1. Any other value is logged and
+    the default is used, so a bad setting never fails the function.
+    """
+    value = os.environ.get('BACKGROUND_THROUGHPUT_SHARE')
+    if not value:
+        return DEFAULT_BACKGROUND_THROUGHPUT_SHARE
+    try:
+        share = float(value)
+    except ValueError:
+        share = None
+    if share is None or not 0 < share <= 1:
+        print(f"Invalid BACKGROUND_THROUGHPUT_SHARE {value!r}, expected a number greater than 0 and at most 1; "
+              f"using {DEFAULT_BACKGROUND_THROUGHPUT_SHARE}")
+        return DEFAULT_BACKGROUND_THROUGHPUT_SHARE
+    return share
+
+class ThroughputGovernor:
+    def __init__(self, read_capacity: float = THROUGHPUT_READ_CAPACITY,
+                 write_capacity: float = THROUGHPUT_WRITE_CAPACITY,
+                 background_share: Optional[float] = None, always_background: bool = False):
+        # always_background paces every call, e.g. in bulk scripts
+        self.always_background = always_background
+        if background_share is None and (read_capacity > 0 or write_capacity > 0):
+            background_share = background_throughput_share()
+        self.buckets: Dict[str, Optional[TokenBucket]] = {
+            'read': TokenBucket(read_capacity * background_share) if read_capacity > 0 else None,
+            'write': TokenBucket(write_capacity * background_share) if write_capacity > 0 else None
+        }
+        self._registered = set()
+
+    @property
+    def enabled(self) -> bool:
+        return any(self.buckets.values())
+
+    def register(self, client) -> None:
+        """Govern the calls of a boto3 DynamoDB client (e.g. resource.meta.client); no-op when disabled"""
+        if not self.enabled or id(client) in self._registered:
+            return
+        self._registered.add(id(client))
+        events = client.meta.events
+        events.register('before-parameter-build.dynamodb', self._request_consumed_capacity)
+        events.register('before-call.dynamodb', self._before_call)
+        events.register('after-call.dynamodb', self._after_call)
+        events.register('needs-retry.dynamodb', self._needs_retry)
+
+    def _bucket(self, operation_name: str) -> Optional[TokenBucket]:
+        if operation_name in READ_OPERATIONS:
+            return self.buckets['read']
+        if operation_name in WRITE_OPERATIONS:
+            return self.buckets['write']
+        return None
+
+    # botocore event handlers
+    def _request_consumed_capacity(self, params, model, **kwargs):
+        if self._bucket(model.name) and 'ReturnConsumedCapacity' in model.input_shape.members:
+            params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+    def _before_call(self, model, **kwargs):
+        bucket = self._bucket(model.name)
+        if bucket and (self.always_background or _background.get()):
+            bucket.wait()
+
+    def _after_call(self, parsed, model, **kwargs):
+        bucket = self._bucket(model.name)
+        if bucket:
+            bucket.consume(consumed_units(parsed))
+
+    def _needs_retry(self, response=None, operation=None, **kwargs):
+        bucket = self._bucket(operation.name) if operation else None
+        if bucket and response and response[1].get('Error', {}).get('Code') in THROTTLING_ERRORS:
+            bucket.throttled()
+
+def consumed_units(parsed: Dict) -> float:
+    """Capacity units in a response's ConsumedCapacity (one entry, or one per table)"""
+    consumed = parsed.get('ConsumedCapacity') or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(float(entry.get('CapacityUnits', 0)) for entry in consumed)
+
+@contextlib.contextmanager
+def background_calls():
+    """DynamoDB calls made in this context (and tasks gathered from it) run at background priority"""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+def background_job(handler):
+    """Run a scheduled job's DynamoDB calls at background priority"""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        with background_calls():
+            return handler(event, context)
+    return wrapper
+
+# Shared by every DynamoDBService in the container
+governor = ThroughputGovernor()
@@ -0,0 +1,15 @@
+import asyncio
+from typing import Any, Awaitable, List
+
+async def _gather(*awaitables: Awaitable) -> List[Any]:
+    return list(await asyncio.gather(*awaitables))
+
+def run_sync(awaitable: Awaitable) -> Any:
+    """Run a coroutine to completion from synchronous handler code"""
+    return asyncio.run(awaitable)
+
+def gather(*awaitables: Awaitable) -> List[Any]:
+    """Run independent coroutines concurrently and return their results in order"""
+    if not awaitables:
+        return []
+    return run_sync(_gather(*awaitables))
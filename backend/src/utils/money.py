@@ -0,0 +1,78 @@
+"""
+Money as integer minor units (cents).
+
+Amounts are converted to cents once when they enter the backend and all
+arithmetic and aggregation runs on plain ints. Items store each money
+attribute twice: the legacy Decimal attribute the API returns (e.g. amount)
+and its exact integer counterpart (amountCents). Readers prefer the cents
+attribute and fall back to the legacy one, so items written before the
+cents attributes existed keep working until they are backfilled
+(scripts/backfill_money_cents.py).
+
+Rounding rules:
+- Incoming amounts are rounded half-up to the cent.
+- Monthly interest is balance * rate%, rounded half-up to the cent once per
+  cycle; accrued interest is that rounded amount times the number of cycles.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict
+
+CENTS_SUFFIX = 'Cents'
+# Interest rates are percentages kept to 4 decimal places: 5.25% -> 52500
+RATE_SCALE = 10000
+_RATE_DIVISOR = 100 * RATE_SCALE
+
+def to_cents(value: Any) -> int:
+    """Convert an amount (str, int, float or Decimal) to integer cents, rounding half-up"""
+    if value is None or value == '':
+        return 0
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def from_cents(cents: int) -> Decimal:
+    """Decimal amount with two decimal places, for storage and API responses"""
+    return Decimal(int(cents)).scaleb(-2)
+
+def cents_to_float(cents: int) -> float:
+    return int(cents) / 100
+
+def rate_units(rate: Any) -> int:
+    """Convert an interest rate percentage to integer units of 1/RATE_SCALE percent"""
+    if rate is None or rate == '':
+        return 0
+    return int((Decimal(str(rate)) * RATE_SCALE).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def monthly_interest_cents(balance_cents: int, rate: int) -> int:
+    """Interest for one cycle: balance * rate%, rounded half-up to the cent (rate in rate_units)"""
+    product = balance_cents * rate
+    if product >= 0:
+        return (product + _RATE_DIVISOR // 2) // _RATE_DIVISOR
+    return -((-product + _RATE_DIVISOR // 2) // _RATE_DIVISOR)
+
+def item_cents(item: Dict, field: str, default: Any = 0) -> int:
+    """Read a money attribute as cents, preferring the integer <field>Cents attribute"""
+    cents = item.get(field + CENTS_SUFFIX)
+    if cents is not None:
+        return int(cents)
+    return to_cents(item.get(field, default))
+
+def money_attributes(**fields_cents: int) -> Dict:
+    """Item attributes for money values given in cents: {field: Decimal, fieldCents: int}"""
+    attributes = {}
+    for field, cents in fields_cents.items():
+        attributes[field] = from_cents(cents)
+        attributes[field + CENTS_SUFFIX] = int(cents)
+    return attributes
+
+def without_cents_attributes(value: Any) -> Any:
+    """
+    Copy of an item (or list/dict of items) without the stored <field>Cents
+    duplicates of its money attributes; API responses keep only the Decimal ones.
+    """
+    if isinstance(value, list):
+        return [without_cents_attributes(entry) for entry in value]
+    if isinstance(value, dict):
+        return {
+            key: without_cents_attributes(entry) for key, entry in value.items()
+            if not (key.endswith(CENTS_SUFFIX) and key[:-len(CENTS_SUFFIX)] in value)
+        }
+    return value
@@ -0,0 +1,75 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import time
+import tracemalloc
+from utils.settings import env_flag
+
+# Profile every invocation, or a random share of them (0.0 - 1.0)
+PROFILE_HANDLERS = env_flag('PROFILE_HANDLERS')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0') or 0)
+# Number of functions listed in each summary
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', '15'))
+
+def _should_profile() -> bool:
+    return PROFILE_HANDLERS or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+def _top_functions(profiler: cProfile.Profile, limit: int):
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda row: row[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': f'{os.path.basename(filename)}:{line}({name})',
+            'calls': calls,
+            'cumulativeMs': round(cumulative * 1000, 2),
+            'ownMs': round(own * 1000, 2)
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in rows
+    ]
+
+def profiled(handler):
+    """
+    Opt-in profiling for Lambda handler entry points.
+
+    When PROFILE_HANDLERS is true, or for a PROFILE_SAMPLE_RATE share of
+    invocations, the handler runs under cProfile and tracemalloc and a
+    one-line JSON summary (duration, peak traced memory, top functions by
+    cumulative time) is written to the log. Otherwise the handler is
+    called directly. cProfile only sees the invoking thread, so reads
+    running on the async worker pool appear as time spent waiting in gather.
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not _should_profile():
+            return handler(event, context)
+
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return handler(event, context)
+        finally:
+            profiler.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            if not already_tracing:
+                tracemalloc.stop()
+            try:
+                print(json.dumps({
+                    'profile': f'{handler.__module__}.{handler.__name__}',
+                    'requestId': getattr(context, 'aws_request_id', None),
+                    'durationMs': round(duration_ms, 2),
+                    'peakMemoryKb': round(peak_bytes / 1024, 1),
+                    'topFunctions': _top_functions(profiler, PROFILE_TOP_N)
+                }))
+            except Exception as e:
+                print(f"Error writing profile summary: {str(e)}")
+
+    return wrapper
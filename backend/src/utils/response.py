@@ -1,16 +1,32 @@
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+from utils.money import without_cents_attributes
 
-def success_response(data: Any, status_code: int = 200) -> Dict:
+def success_response(data: Any, status_code: int = 200, headers: Optional[Dict] = None) -> Dict:
     return {
         'statusCode': status_code,
         'headers': {
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
-            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,If-None-Match',
+            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+            'Access-Control-Expose-Headers': 'ETag',
+            **(headers or {})
+        },
+        # Items store each money attribute twice (utils/money.py); responses carry the Decimal one only
+        'body': json.dumps(without_cents_attributes(data), default=str)
+    }
+
+def not_modified_response(etag: str) -> Dict:
+    return {
+        'statusCode': 304,
+        'headers': {
+            'ETag': etag,
+            'Cache-Control': 'no-cache',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'ETag'
         },
-        'body': json.dumps(data, default=str)
+        'body': ''
     }
 
 def error_response(error: str, status_code: int = 500) -> Dict:
@@ -19,7 +35,7 @@ def error_response(error: str, status_code: int = 500) -> Dict:
         'headers': {
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,If-None-Match',
             'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
         },
         'body': json.dumps({'error': error})
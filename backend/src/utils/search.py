@@ -0,0 +1,52 @@
+"""
+Search keys for borrower prefix search.
+
+Each borrower stores a normalized copy of its name and phone (nameKey,
+phoneKey) plus a bucket attribute holding the key's first character. The
+NameSearchIndex and PhoneSearchIndex GSIs are partitioned by bucket and
+sorted by key, so a prefix search is one Query with begins_with on the sort
+key and never reads borrowers outside the matching range. These attributes
+are internal and are removed from borrowers before they are returned.
+"""
+import re
+import unicodedata
+from typing import Dict, Optional
+from utils.settings import env_flag
+
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9 ]+')
+_WHITESPACE = re.compile(r'\s+')
+_NON_DIGIT = re.compile(r'\D+')
+
+SEARCH_ATTRIBUTES = ('nameKey', 'nameBucket', 'phoneKey', 'phoneBucket')
+# Off while PhoneSearchIndex is not deployed yet (see the two-step rollout in DYNAMODB_GUIDE.md)
+PHONE_SEARCH = env_flag('BORROWER_PHONE_SEARCH', default=True)
+
+def normalize_name(value) -> str:
+    """Lowercase, accent-free, single-spaced letters and digits: '  José  O\\'Neil' -> 'jose oneil'"""
+    text = unicodedata.normalize('NFKD', str(value or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    text = _NON_ALPHANUMERIC.sub('', _WHITESPACE.sub(' ', text))
+    return _WHITESPACE.sub(' ', text).strip()
+
+def normalize_phone(value) -> str:
+    """Digits only: '+1 (555) 010-2030' -> '15550102030'"""
+    return _NON_DIGIT.sub('', str(value or ''))
+
+def search_attributes(borrower: Dict) -> Dict:
+    """nameKey/nameBucket and phoneKey/phoneBucket for a borrower (omitted when empty, keeping the indexes sparse)"""
+    attributes = {}
+    name_key = normalize_name(borrower.get('name'))
+    if name_key:
+        attributes['nameKey'] = name_key
+        attributes['nameBucket'] = name_key[0]
+    phone_key = normalize_phone(borrower.get('phone'))
+    if phone_key:
+        attributes['phoneKey'] = phone_key
+        attributes['phoneBucket'] = phone_key[0]
+    return attributes
+
+def without_search_attributes(borrower: Optional[Dict]) -> Optional[Dict]:
+    """The borrower without its internal search attributes"""
+    if not borrower:
+        return borrower
+    return {key: value for key, value in borrower.items() if key not in SEARCH_ATTRIBUTES}
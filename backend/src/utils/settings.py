@@ -0,0 +1,12 @@
+import os
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean feature switch from the environment ('true'/'1'/'yes')"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('true', '1', 'yes')
+
+# When enabled, loan balances and initial interest cycles are maintained by
+# handlers.streams from the table streams instead of on the request path.
+STREAM_SIDE_EFFECTS = env_flag('STREAM_SIDE_EFFECTS')
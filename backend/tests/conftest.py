@@ -0,0 +1,42 @@
+"""
+The tests run the handlers against the in-memory DynamoDB stand-in
+(scripts/memory_dynamodb.py), with the tables and Globals environment
+defined in template.yaml, so neither AWS nor Docker is needed:
+
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+
+The stand-in is installed before any test module imports a handler, and
+every test starts with empty tables.
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'scripts'))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'src'))
+
+from load_test import function_environment, load_template, table_schemas  # noqa: E402
+from memory_dynamodb import MemoryDynamoDB, install  # noqa: E402
+
+TEMPLATE = load_template(os.path.join(BACKEND_DIR, 'template.yaml'))
+os.environ.update(function_environment(TEMPLATE, {'STREAM_SIDE_EFFECTS': 'false', 'PROFILE_SAMPLE_RATE': '0'}))
+database = MemoryDynamoDB(table_schemas(TEMPLATE))
+install(database)
+
+@pytest.fixture(autouse=True)
+def empty_tables():
+    """
+    Drop every item but the data version, then bump it: the version only
+    moves forward, so results cached per version by earlier tests are not reused.
+    """
+    from services.dynamodb_service import DATA_VERSION_KEY
+    from services.factory import create_db_service
+    for table in database.tables.values():
+        for key in list(table.items):
+            if key[0] != DATA_VERSION_KEY:
+                del table.items[key]
+    create_db_service().bump_data_version()
+    return database
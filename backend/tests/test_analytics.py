@@ -0,0 +1,63 @@
+"""GET /reports/analytics"""
+import json
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from handlers import loans, payments, reports
+from services.analytics import MAX_ANALYTICS_MONTHS, month_label, month_number
+
+def _event(body=None, path=None, query=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path,
+            'queryStringParameters': query, 'headers': {}}
+
+def _create_loan(amount: str, approved: date) -> str:
+    return json.loads(loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': amount, 'interestRate': 1, 'approvedAt': approved.isoformat()
+    }), None)['body'])['loanId']
+
+def _pay(loan_id: str, amount: str, paid: date, payment_type: str = 'capital') -> None:
+    payments.add_payment(_event({'amount': amount, 'paymentDate': paid.isoformat(), 'paymentType': payment_type},
+                                {'id': loan_id}), None)
+
+def _analytics(**query):
+    response = reports.get_analytics(_event(query=query or None), None)
+    return response['statusCode'], json.loads(response['body'])
+
+def test_payments_and_loans_are_bucketed_by_month():
+    this_month = date.today().replace(day=1)
+    first, second = this_month - relativedelta(months=2), this_month - relativedelta(months=1)
+    older_loan_id, newer_loan_id = _create_loan('1000', first), _create_loan('500', second)
+    _pay(older_loan_id, '100', first + relativedelta(days=3))
+    _pay(older_loan_id, '10', second, 'interest')
+    _pay(older_loan_id, '200', second + relativedelta(days=1))
+    _pay(newer_loan_id, '50', this_month)
+
+    status, analytics = _analytics(**{'from': first.isoformat()[:7], 'to': this_month.isoformat()[:7]})
+
+    assert status == 200
+    assert [(month['month'], month['capital'], month['interest'], month['payments'])
+            for month in analytics['monthlyCollections']] == [
+        (first.isoformat()[:7], 100.0, 0.0, 1), (second.isoformat()[:7], 200.0, 10.0, 2),
+        (this_month.isoformat()[:7], 50.0, 0.0, 1)
+    ]
+    assert [(cohort['cohort'], cohort['loans'], cohort['principal'],
+             [(point['capitalRepaid'], point['repaidShare']) for point in cohort['curve']])
+            for cohort in analytics['cohorts']] == [
+        (first.isoformat()[:7], 1, 1000.0, [(100.0, 0.1), (300.0, 0.3), (300.0, 0.3)]),
+        (second.isoformat()[:7], 1, 500.0, [(0.0, 0.0), (50.0, 0.1)])
+    ]
+
+def test_very_old_data_limits_the_default_range_instead_of_failing():
+    _create_loan('100', date(1900, 1, 15))
+    _create_loan('100', date.today())
+    current_month = month_number(date.today().isoformat())
+
+    status, analytics = _analytics()
+    status_given, _ = _analytics(**{'from': '1900-01'})
+
+    assert status == 200
+    months = [month['month'] for month in analytics['monthlyCollections']]
+    assert (len(months), months[0], months[-1]) == (
+        MAX_ANALYTICS_MONTHS, month_label(current_month - MAX_ANALYTICS_MONTHS + 1), month_label(current_month))
+    assert status_given == 400
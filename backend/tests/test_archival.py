@@ -0,0 +1,68 @@
+"""Archiving settled loans"""
+import json
+from datetime import date
+
+import pytest
+
+from handlers import archival, loans, payments
+from services.async_dynamodb_service import MAX_CONCURRENT_CALLS
+
+def _event(body=None, path=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path,
+            'queryStringParameters': None, 'headers': {}}
+
+def _settled_loan() -> str:
+    loan_id = json.loads(loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': '1000', 'interestRate': 1, 'approvedAt': date.today().isoformat()
+    }), None)['body'])['loanId']
+    payments.add_payment(_event({'amount': '1000', 'paymentDate': date.today().isoformat()}, {'id': loan_id}), None)
+    archival.db_service.update_loan_status(loan_id, 'paid')
+    return loan_id
+
+def _archive(**event):
+    response = archival.archive_settled_loans({'olderThanDays': 0, **event}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+def test_settled_loans_move_to_the_archive_behind_a_tombstone():
+    loan_id = _settled_loan()
+
+    status, body = _archive()
+
+    assert (status, body['candidates'], body['loansArchived']) == (200, 1, 1)
+    tombstone = archival.db_service.get_loan(loan_id)
+    assert (tombstone['status'], 'amount' in tombstone) == ('archived', False)
+    assert archival.db_service.get_payments_by_loan(loan_id) == []
+    assert archival.db_service.get_interest_cycles_by_loan(loan_id) == []
+    archived = archival.loan_archive.get_loan(loan_id)
+    assert (archived['status'], archived['amountCents']) == ('paid', 100000)
+    assert [payment['amountCents'] for payment in archival.loan_archive.get_payments_by_loan(loan_id)] == [100000]
+    assert len(archival.loan_archive.get_interest_cycles_by_loan(loan_id)) == 1
+
+def test_an_interrupted_archival_resumes_from_the_tombstone(monkeypatch):
+    loan_id = _settled_loan()
+    payments_table = archival.db_service.payments_table
+
+    def interrupted():
+        raise RuntimeError('Lambda timed out')
+
+    # Stop after the tombstone swap, before the hot payments are deleted
+    monkeypatch.setattr(payments_table, 'batch_writer', interrupted)
+    _, first = _archive()
+    assert first['loansArchived'] == 0
+    assert archival.db_service.get_loan(loan_id)['status'] == 'archiving'
+    monkeypatch.undo()
+
+    status, second = _archive()
+
+    assert (status, second['candidates'], second['loansArchived']) == (200, 1, 1)
+    assert archival.db_service.get_loan(loan_id)['status'] == 'archived'
+    assert archival.db_service.get_payments_by_loan(loan_id) == []
+    # The archived copy written before the interruption keeps the full loan
+    assert archival.loan_archive.get_loan(loan_id)['amountCents'] == 100000
+    assert len(archival.loan_archive.get_payments_by_loan(loan_id)) == 1
+
+@pytest.mark.parametrize('concurrency', [0, 'many', MAX_CONCURRENT_CALLS + 1])
+def test_archival_rejects_concurrency_outside_the_executor_size(concurrency):
+    status, _ = _archive(concurrency=concurrency)
+
+    assert status == 400
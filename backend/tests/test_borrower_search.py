@@ -0,0 +1,50 @@
+"""GET /borrowers?q= prefix search"""
+import json
+
+import pytest
+
+from handlers import borrowers
+from utils.search import SEARCH_ATTRIBUTES
+
+def _event(body=None, query=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': None,
+            'queryStringParameters': query, 'headers': {}}
+
+def _search(query: str, **params):
+    response = borrowers.get_borrowers(_event(query={'q': query, **params}), None)
+    return response['statusCode'], json.loads(response['body'])
+
+@pytest.fixture
+def names():
+    for name, phone in [('José O\'Neil', '+1 (555) 010-2030'), ('Josephine Park', '555-999-0000'),
+                        ('Ana Jones', '+44 20 7946 0958')]:
+        borrowers.create_borrower(_event({'name': name, 'phone': phone}), None)
+
+@pytest.mark.parametrize('query, expected', [
+    ('jose', ['José O\'Neil', 'Josephine Park']),
+    ('JOSÉ o\'n', ['José O\'Neil']),
+    ('  ana   jo ', ['Ana Jones']),
+    ('1 555', ['José O\'Neil']),
+    ('555', ['Josephine Park']),
+    ('jones', []),
+])
+def test_search_matches_normalized_name_and_phone_prefixes_in_key_order(names, query, expected):
+    status, found = _search(query)
+
+    assert status == 200
+    assert [borrower['name'] for borrower in found] == expected
+
+def test_search_results_and_reads_omit_the_internal_keys(names):
+    _, found = _search('jos', limit='1')
+    created = json.loads(borrowers.create_borrower(_event({'name': 'Zoe', 'phone': '1'}), None)['body'])
+    listed = json.loads(borrowers.get_borrowers(_event(), None)['body'])
+
+    assert len(found) == 1
+    for borrower in found + [created] + listed:
+        assert not set(SEARCH_ATTRIBUTES) & set(borrower)
+
+@pytest.mark.parametrize('limit', ['0', '101', 'ten'])
+def test_search_rejects_a_limit_out_of_range(limit):
+    status, _ = _search('jose', limit=limit)
+
+    assert status == 400
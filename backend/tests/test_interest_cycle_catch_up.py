@@ -0,0 +1,41 @@
+"""Catching up missed interest cycles"""
+import json
+from datetime import date, timedelta
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from handlers import interest_cycles, loans, payments
+from services.async_dynamodb_service import MAX_CONCURRENT_CALLS
+
+def _event(body=None, path=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path}
+
+def _catch_up(since: date, **event):
+    response = interest_cycles.process_daily_cycles({'catchUpFrom': since.isoformat(), **event}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+def test_catch_up_creates_missing_cycles_once():
+    approved = date.today() - relativedelta(months=3)
+    loan_id = json.loads(loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': '1000', 'interestRate': 1, 'approvedAt': approved.isoformat()
+    }), None)['body'])['loanId']
+    payments.add_payment(_event({'amount': '100', 'paymentDate': (approved + timedelta(days=1)).isoformat()},
+                                {'id': loan_id}), None)
+
+    status, first = _catch_up(approved)
+    status_again, second = _catch_up(approved)
+
+    assert (status, first['cyclesCreated'], first['cyclesAlreadyPresent']) == (200, 3, 0)
+    assert (status_again, second['cyclesCreated'], second['cyclesAlreadyPresent']) == (200, 0, 0)
+    cycles = interest_cycles.db_service.get_interest_cycles_by_loan(loan_id)
+    assert [cycle['cycleNumber'] for cycle in cycles] == [1, 2, 3, 4]
+    # The first cycle predates the payment; the caught-up ones start after it
+    assert [cycle['principalBalanceCents'] for cycle in cycles] == [100000, 90000, 90000, 90000]
+
+@pytest.mark.parametrize('concurrency', [0, -1, 'many', MAX_CONCURRENT_CALLS + 1])
+def test_catch_up_rejects_concurrency_outside_the_executor_size(concurrency):
+    status, body = _catch_up(date.today(), concurrency=concurrency)
+
+    assert status == 400
+    assert body['error'] == f'concurrency must be a number from 1 to {MAX_CONCURRENT_CALLS}'
@@ -0,0 +1,64 @@
+"""Interest cycle recalculation after a backdated payment"""
+import json
+from datetime import date, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from handlers import interest_cycles, loans, payments
+
+def _event(body=None, path=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path}
+
+def _loan_with_cycles(months: int):
+    """A 1000.00 loan at 1% a month approved `months` months ago, with all of its cycles created"""
+    approved = date.today() - relativedelta(months=months)
+    response = loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': '1000', 'interestRate': 1, 'approvedAt': approved.isoformat()
+    }), None)
+    loan_id = json.loads(response['body'])['loanId']
+    interest_cycles.create_missing_cycles(approved, date.today())
+    return loan_id, approved
+
+def _cycles(loan_id: str):
+    return {cycle['cycleStartDate']: cycle for cycle in payments.db_service.get_interest_cycles_by_loan(loan_id)}
+
+def test_backdated_payment_recomputes_only_later_cycles():
+    loan_id, approved = _loan_with_cycles(months=5)
+    before = _cycles(loan_id)
+    assert len(before) == 6
+    payment_date = approved + relativedelta(months=2) + timedelta(days=3)
+
+    response = payments.add_payment(_event({'amount': '200', 'paymentDate': payment_date.isoformat()},
+                                           {'id': loan_id}), None)
+
+    assert response['statusCode'] == 201
+    assert 'warnings' not in json.loads(response['body'])
+    after = _cycles(loan_id)
+    for start, cycle in before.items():
+        if start <= payment_date.isoformat():
+            assert after[start] == cycle
+        else:
+            assert after[start]['principalBalanceCents'] == cycle['principalBalanceCents'] - 20000
+            assert after[start]['interestAmountCents'] == 800  # 1% of 800.00
+
+def test_recompute_failure_keeps_the_payment(monkeypatch):
+    loan_id, approved = _loan_with_cycles(months=3)
+
+    def fail(loan_id, changed_date):
+        raise RuntimeError('cycles kept changing')
+    monkeypatch.setattr(payments.db_service, 'recompute_interest_cycles', fail)
+    response = payments.add_payment(_event({'amount': '100', 'paymentDate': (approved + timedelta(days=1)).isoformat()},
+                                           {'id': loan_id}), None)
+
+    assert response['statusCode'] == 201
+    body = json.loads(response['body'])
+    assert body['warnings'] == [f'Interest cycles of loan {loan_id} could not be recalculated: cycles kept changing']
+    assert payments.db_service.get_payment(body['paymentId'])
+
+def test_invalid_payment_date_is_rejected():
+    loan_id, _ = _loan_with_cycles(months=1)
+
+    response = payments.add_payment(_event({'amount': '100', 'paymentDate': 'yesterday'}, {'id': loan_id}), None)
+
+    assert response['statusCode'] == 400
+    assert payments.db_service.get_payments_by_loan(loan_id) == []
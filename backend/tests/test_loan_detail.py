@@ -0,0 +1,24 @@
+"""GET /loans/{id} with include= expansion"""
+import json
+from datetime import date
+
+from handlers import loans, payments
+
+def _event(body=None, path=None, query=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path,
+            'queryStringParameters': query, 'headers': {}}
+
+def test_history_include_gathers_off_the_shared_executor(monkeypatch):
+    loan_id = json.loads(loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': '1000', 'interestRate': 1, 'approvedAt': date.today().isoformat()
+    }), None)['body'])['loanId']
+    payments.add_payment(_event({'amount': '100', 'paymentDate': date.today().isoformat()}, {'id': loan_id}), None)
+    # Route the multi-table service (whose get_loan_history gathers itself) through the history fetcher
+    monkeypatch.setattr(loans.db_service, 'LOAN_HISTORY_IN_ONE_QUERY', True)
+
+    response = loans.get_loan(_event(path={'id': loan_id}, query={'include': 'borrower,cycles,payments'}), None)
+
+    assert response['statusCode'] == 200
+    document = json.loads(response['body'])
+    assert [payment['amount'] for payment in document['payments']] == ['100.00']
+    assert len(document['interestCycles']) == 1
@@ -0,0 +1,48 @@
+"""Money as integer cents"""
+import json
+from datetime import date
+
+import pytest
+
+from handlers import loans, payments
+from utils.money import item_cents, monthly_interest_cents, rate_units, to_cents, without_cents_attributes
+
+def _event(body=None, path=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path,
+            'queryStringParameters': None, 'headers': {}}
+
+@pytest.mark.parametrize('value, cents', [
+    ('10.005', 1001), ('10.004', 1000), (0.1 + 0.2, 30), (19.99, 1999), ('-0.005', -1), (7, 700), ('', 0), (None, 0)
+])
+def test_amounts_round_half_up_to_the_cent(value, cents):
+    assert to_cents(value) == cents
+
+def test_monthly_interest_rounds_once_per_cycle():
+    # 1000.05 at 1.5% is 15.00075
+    assert monthly_interest_cents(100005, rate_units('1.5')) == 1500
+    # 333.33 at 1.5% is 4.99995
+    assert monthly_interest_cents(33333, rate_units(1.5)) == 500
+
+def test_items_without_cents_attributes_fall_back_to_the_decimal_one():
+    assert item_cents({'amount': '12.345'}, 'amount') == 1235
+    assert item_cents({'amount': '12.34', 'amountCents': 1299}, 'amount') == 1299
+
+def test_payments_store_cents_and_return_only_the_decimal_amount():
+    loan_id = json.loads(loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': '1000', 'interestRate': 1, 'approvedAt': date.today().isoformat()
+    }), None)['body'])['loanId']
+
+    response = payments.add_payment(_event({'amount': '10.005', 'paymentDate': date.today().isoformat()},
+                                           {'id': loan_id}), None)
+
+    payment = json.loads(response['body'])
+    assert response['statusCode'] == 201
+    assert payment['amount'] == '10.01'
+    assert 'amountCents' not in payment
+    assert payments.db_service.get_payment(payment['paymentId'])['amountCents'] == 1001
+    assert payments.db_service.get_loan(loan_id)['balanceAmountCents'] == 98999
+
+def test_cents_attributes_are_stripped_only_next_to_their_decimal_attribute():
+    item = {'amount': 1, 'amountCents': 100, 'discountCents': 5, 'nested': [{'fee': 2, 'feeCents': 200}]}
+
+    assert without_cents_attributes(item) == {'amount': 1, 'discountCents': 5, 'nested': [{'fee': 2}]}
@@ -0,0 +1,79 @@
+"""POST /payments/batch"""
+import json
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from handlers import loans, payments
+
+def _event(body=None, path=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path,
+            'queryStringParameters': None, 'headers': {}}
+
+def _create_loan(approved: date) -> str:
+    return json.loads(loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': '1000', 'interestRate': 1, 'approvedAt': approved.isoformat()
+    }), None)['body'])['loanId']
+
+def _batch(entries):
+    response = payments.add_payments_batch(_event({'payments': entries}), None)
+    return response['statusCode'], json.loads(response['body'])
+
+def test_batch_reports_each_payment_and_updates_only_written_loans(empty_tables, monkeypatch):
+    approved = date.today() - relativedelta(months=2)
+    loan_id, unlucky_loan_id = _create_loan(approved), _create_loan(approved)
+    batch_write_item = empty_tables.batch_write_item
+
+    def never_writing_unlucky_loan(RequestItems, **kwargs):
+        (table_name, requests), = RequestItems.items()
+        unprocessed = [request for request in requests if request['PutRequest']['Item']['loanId'] == unlucky_loan_id]
+        batch_write_item({table_name: [request for request in requests if request not in unprocessed]})
+        return {'UnprocessedItems': {table_name: unprocessed} if unprocessed else {}}
+
+    monkeypatch.setattr(empty_tables, 'batch_write_item', never_writing_unlucky_loan)
+    monkeypatch.setattr('services.dynamodb_service.UNPROCESSED_RETRY_DELAY', 0)
+    version = payments.db_service.get_data_version()
+
+    status, body = _batch([
+        {'loanId': loan_id, 'amount': '100', 'paymentDate': (approved + relativedelta(days=1)).isoformat()},
+        {'loanId': 'missing', 'amount': '5'},
+        {'loanId': unlucky_loan_id, 'amount': '7'},
+        {'loanId': loan_id, 'amount': '1', 'paymentType': 'fee'},
+    ])
+
+    assert status == 207
+    assert (body['created'], body['failed']) == (1, 3)
+    assert [(result['status'], result.get('error')) for result in body['results']] == [
+        ('created', None), ('failed', 'Loan not found'), ('failed', 'Payment could not be written'),
+        ('failed', 'Invalid paymentType: fee')
+    ]
+    assert payments.db_service.get_loan(loan_id)['balanceAmountCents'] == 90000
+    assert payments.db_service.get_loan(unlucky_loan_id)['balanceAmountCents'] == 100000
+    assert payments.db_service.get_payments_by_loan(unlucky_loan_id) == []
+    assert payments.db_service.get_data_version() == version + 1
+
+def test_batch_recalculates_every_affected_loans_cycles(monkeypatch):
+    approved = date.today() - relativedelta(months=3)
+    loan_ids = [_create_loan(approved) for _ in range(3)]
+    for loan_id in loan_ids:
+        payments.db_service.create_interest_cycle({
+            'cycleId': f'{loan_id}#2', 'loanId': loan_id, 'cycleNumber': 2,
+            'cycleStartDate': (approved + relativedelta(months=1)).isoformat(), 'interestRate': 1,
+            'principalBalance': 1000, 'principalBalanceCents': 100000, 'interestAmount': 10, 'interestAmountCents': 1000
+        })
+    monkeypatch.setattr(payments, 'BATCH_RECOMPUTE_CONCURRENCY', 2)
+
+    status, body = _batch([{'loanId': loan_id, 'amount': '100', 'paymentDate': approved.isoformat()}
+                           for loan_id in loan_ids])
+
+    assert (status, body['created']) == (201, 3)
+    for loan_id in loan_ids:
+        cycles = payments.db_service.get_interest_cycles_by_loan(loan_id)
+        assert [cycle['principalBalanceCents'] for cycle in cycles][-1] == 90000
+
+def test_batch_with_nothing_recorded_is_rejected():
+    status, body = _batch([{'loanId': 'missing', 'amount': '5'}, {'loanId': 'gone', 'amount': '1'}])
+
+    assert status == 400
+    assert (body['created'], body['failed']) == (0, 2)
+    assert [result['error'] for result in body['results']] == ['Loan not found', 'Loan not found']
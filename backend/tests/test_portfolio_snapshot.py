@@ -0,0 +1,81 @@
+"""Columnar portfolio snapshot"""
+import json
+from datetime import date, datetime
+
+import pytest
+
+from handlers import loans, payments, reports
+from services.analytics import PortfolioColumns
+from services.portfolio_snapshot import PortfolioSnapshot, build_portfolio, encode_snapshot, merge_deltas
+
+def _event(body=None, path=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path,
+            'queryStringParameters': None, 'headers': {}}
+
+def _create_loan(amount: str) -> str:
+    return json.loads(loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': amount, 'interestRate': '1.25', 'approvedAt': date.today().isoformat()
+    }), None)['body'])['loanId']
+
+def _pay(loan_id: str, amount: str) -> None:
+    payments.add_payment(_event({'amount': amount, 'paymentDate': date.today().isoformat()}, {'id': loan_id}), None)
+
+def _contents(columns: PortfolioColumns):
+    """Loans and payments, independent of row order"""
+    loan_items = sorted(columns.loan_items(include_archived=True), key=lambda loan: loan['loanId'])
+    loan_ids = columns.loans['loan_id']
+    payment_rows = sorted(
+        (loan_ids[row] if row >= 0 else '', month, amount, is_interest)
+        for row, month, amount, is_interest in zip(*(columns.payments[name] for name in
+                                                     ('loan_row', 'month', 'amount_cents', 'is_interest')))
+    )
+    return loan_items, payment_rows
+
+def _open(tmp_path, data: bytes) -> PortfolioSnapshot:
+    path = tmp_path / 'portfolio.bin'
+    path.write_bytes(data)
+    return PortfolioSnapshot.open(str(path))
+
+def test_snapshot_round_trips_the_columns(tmp_path):
+    columns = PortfolioColumns.build(
+        [
+            {'loanId': 'loan-1', 'borrowerId': 'Zoë', 'status': 'active', 'approvedAt': '2026-01-15',
+             'amountCents': 100000, 'interestRate': '1.5'},
+            {'loanId': 'loan-2', 'status': 'archived', 'amount': '20.05', 'archivedAt': '2026-02-01'},
+        ],
+        [
+            {'loanId': 'loan-1', 'paymentDate': '2026-02-01', 'amountCents': 2500},
+            {'loanId': 'loan-1', 'paymentDate': '2026-03-01', 'amount': '1.5', 'paymentType': 'interest'},
+            {'loanId': 'gone', 'paymentDate': 'not a date', 'amountCents': 1},
+        ]
+    )
+
+    snapshot = _open(tmp_path, encode_snapshot(columns, 7, '2026-03-02T00:00:00', '2026-03-01T23:59:00'))
+
+    assert (snapshot.data_version, snapshot.watermark) == (7, '2026-03-01T23:59:00')
+    assert _contents(snapshot.columns) == _contents(columns)
+    assert list(snapshot.columns.loans['borrower_id']) == ['Zoë', None]
+    assert list(snapshot.columns.loans['paid_cents']) == [2650, 0]
+
+def test_other_files_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        _open(tmp_path, b'NOTSNAP!' + bytes(64))
+
+def test_merged_deltas_match_a_fresh_build(tmp_path):
+    paid_id, deleted_id, unchanged_id = _create_loan('1000'), _create_loan('500'), _create_loan('250')
+    _pay(paid_id, '100')
+    _pay(deleted_id, '50')
+    watermark = datetime.utcnow().isoformat()
+    snapshot = _open(tmp_path, encode_snapshot(build_portfolio(reports.db_service, reports.loan_archive),
+                                               None, watermark, watermark))
+
+    _pay(paid_id, '25')
+    loans.delete_loan(_event(path={'id': deleted_id}), None)
+    created_id = _create_loan('75')
+    _pay(created_id, '5')
+    merged = merge_deltas(snapshot.columns, snapshot.watermark, reports.db_service, reports.loan_archive)
+
+    assert _contents(merged) == _contents(build_portfolio(reports.db_service, reports.loan_archive))
+    assert sorted(merged.loans['loan_id']) == sorted([paid_id, unchanged_id, created_id])
+    paid_cents = dict(zip(merged.loans['loan_id'], merged.loans['paid_cents']))
+    assert (paid_cents[paid_id], paid_cents[created_id], paid_cents[unchanged_id]) == (12500, 500, 0)
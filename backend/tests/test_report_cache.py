@@ -0,0 +1,49 @@
+"""Report cache validity and data version bumps"""
+import json
+import time
+from datetime import date
+
+from handlers import loans, payments
+from services.report_cache import ReportCache
+
+def _event(body=None, path=None):
+    return {'body': json.dumps(body) if body is not None else None, 'pathParameters': path,
+            'queryStringParameters': None, 'headers': {}}
+
+def _create_loan() -> str:
+    return json.loads(loans.create_loan(_event({
+        'borrowerId': 'borrower-1', 'amount': '1000', 'interestRate': 1, 'approvedAt': date.today().isoformat()
+    }), None)['body'])['loanId']
+
+def test_expired_shared_entries_are_not_served():
+    db_service = payments.db_service
+    version = db_service.get_data_version()
+    key = ReportCache.key(None, None)
+    ReportCache(db_service, shared=True).put(key, version, {'totalLoans': 1})
+    assert ReportCache(db_service, shared=True).get(key, version) == {'totalLoans': 1}
+
+    # Past its TTL but not yet deleted by DynamoDB
+    db_service.cache_table.update_item(Key={'cacheKey': key}, UpdateExpression='SET expiresAt = :past',
+                                       ExpressionAttributeValues={':past': int(time.time()) - 1})
+
+    assert ReportCache(db_service, shared=True).get(key, version) is None
+
+def test_payment_writes_bump_the_data_version_once():
+    loan_id = _create_loan()
+    other_loan_id = _create_loan()
+    today = date.today().isoformat()
+
+    before = payments.db_service.get_data_version()
+    payment = json.loads(payments.add_payment(_event({'amount': '100', 'paymentDate': today}, {'id': loan_id}),
+                                              None)['body'])
+    after_payment = payments.db_service.get_data_version()
+    payments.update_payment(_event({'amount': '50'}, {'paymentId': payment['paymentId']}), None)
+    after_update = payments.db_service.get_data_version()
+    payments.delete_payment(_event(path={'paymentId': payment['paymentId']}), None)
+    after_delete = payments.db_service.get_data_version()
+    payments.add_payments_batch(_event({'payments': [
+        {'loanId': loan_id, 'amount': '10'}, {'loanId': other_loan_id, 'amount': '20'}
+    ]}), None)
+    after_batch = payments.db_service.get_data_version()
+
+    assert [after_payment, after_update, after_delete, after_batch] == [before + 1, before + 2, before + 3, before + 4]
@@ -0,0 +1,57 @@
+"""Single-function API routing (ApiDeployment=router)"""
+import json
+
+import pytest
+
+from handlers import router
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replace every routed handler with one recording the event it received"""
+    received = []
+    for _, _, handler_path in router.ROUTES:
+        def handler(event, context, handler_path=handler_path):
+            received.append((handler_path, event['resource'], event['pathParameters']))
+            return {'statusCode': 200, 'body': '{}'}
+        monkeypatch.setitem(router._handlers, handler_path, handler)
+    return received
+
+def _proxy_event(method: str, path: str):
+    return {'httpMethod': method, 'resource': '/{proxy+}', 'path': path, 'pathParameters': {'proxy': path[1:]}}
+
+@pytest.mark.parametrize('method, path, handler_path, resource, parameters', [
+    ('POST', '/payments/batch', 'handlers.payments.add_payments_batch', '/payments/batch', None),
+    ('PUT', '/payments/p-1', 'handlers.payments.update_payment', '/payments/{paymentId}', {'paymentId': 'p-1'}),
+    ('GET', '/loans/l-1/', 'handlers.loans.get_loan', '/loans/{id}', {'id': 'l-1'}),
+    ('GET', '/loans/l-1/interest-cycles', 'handlers.interest_cycles.get_interest_cycles',
+     '/loans/{id}/interest-cycles', {'id': 'l-1'}),
+    ('get', '/loans', 'handlers.loans.get_loans', '/loans', None),
+])
+def test_proxy_paths_dispatch_fixed_segments_before_parameters(calls, method, path, handler_path, resource,
+                                                               parameters):
+    response = router.route(_proxy_event(method, path), None)
+
+    assert response['statusCode'] == 200
+    assert calls == [(handler_path, resource, parameters)]
+
+def test_per_route_resources_keep_their_path_parameters(calls):
+    event = {'httpMethod': 'DELETE', 'resource': '/payments/{paymentId}', 'path': '/payments/batch',
+             'pathParameters': {'paymentId': 'batch'}}
+
+    router.route(event, None)
+
+    assert calls == [('handlers.payments.delete_payment', '/payments/{paymentId}', {'paymentId': 'batch'})]
+
+@pytest.mark.parametrize('method, path, status', [
+    ('GET', '/loans/l-1/unknown', 404),
+    ('GET', '/payments/batch', 405),
+    ('PATCH', '/loans/l-1', 405),
+    ('OPTIONS', '/loans/l-1', 200),
+])
+def test_unmatched_paths_and_methods(calls, method, path, status):
+    response = router.route(_proxy_event(method, path), None)
+
+    assert response['statusCode'] == status
+    assert calls == []
+    if status == 405:
+        assert method in json.loads(response['body'])['error']
@@ -0,0 +1,29 @@
+"""Listing loans in single-table mode"""
+from services.single_table_service import LOAN_INDEX, SingleTableDynamoDBService
+
+def _loan(loan_id: str, status: str) -> dict:
+    return {'loanId': loan_id, 'borrowerId': 'borrower-1', 'status': status, 'amount': 1000}
+
+def test_all_loans_are_read_from_the_sparse_loan_index(monkeypatch):
+    service = SingleTableDynamoDBService()
+    service.create_loan(_loan('loan-1', 'active'))
+    service.create_loan(_loan('loan-2', 'archived'))
+    service.create_payment({'paymentId': 'payment-1', 'loanId': 'loan-1', 'paymentDate': '2026-01-01', 'amount': 10})
+    scans = []
+    scan = service.single_table.scan
+
+    def recording_scan(**kwargs):
+        response = scan(**kwargs)
+        scans.append((kwargs.get('IndexName'), response['ScannedCount']))
+        return response
+
+    monkeypatch.setattr(service.single_table, 'scan', recording_scan)
+
+    active = service.get_all_loans()
+    every = service.get_all_loans(include_archived=True, attributes=['loanId'])
+
+    assert [loan['loanId'] for loan in active] == ['loan-1']
+    assert sorted(loan['loanId'] for loan in every) == ['loan-1', 'loan-2']
+    assert every[0] == {'loanId': every[0]['loanId']}
+    # Only the two loan items are read; the payment is not in the index
+    assert scans == [(LOAN_INDEX, 2), (LOAN_INDEX, 2)]
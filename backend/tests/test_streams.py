@@ -0,0 +1,71 @@
+"""Stream consumer: payment changes coalesced per loan, initial cycles on approval"""
+import uuid
+from datetime import date, datetime
+
+from boto3.dynamodb.types import TypeSerializer
+
+from handlers import streams
+
+serializer = TypeSerializer()
+db_service = streams.db_service
+
+def _record(keys: dict, new_image=None, old_image=None, event_name='INSERT'):
+    change = {'Keys': {name: serializer.serialize(value) for name, value in keys.items()},
+              'SequenceNumber': str(uuid.uuid4().int)}
+    for name, image in (('NewImage', new_image), ('OldImage', old_image)):
+        if image:
+            change[name] = {attribute: serializer.serialize(value) for attribute, value in image.items()}
+    return {'eventName': event_name, 'dynamodb': change}
+
+def _loan(**attributes):
+    loan = {'loanId': str(uuid.uuid4()), 'borrowerId': 'borrower-1', 'amount': 1000, 'amountCents': 100000,
+            'balanceAmount': 1000, 'balanceAmountCents': 100000, 'interestRate': 1, 'status': 'pending',
+            'createdAt': datetime.utcnow().isoformat(), **attributes}
+    db_service.create_loan(loan)
+    return loan
+
+def _payment(loan_id: str, cents: int):
+    payment = {'paymentId': str(uuid.uuid4()), 'loanId': loan_id, 'amount': cents // 100, 'amountCents': cents,
+               'paymentType': 'capital', 'paymentDate': date.today().isoformat()}
+    db_service.create_payment(payment)
+    return _record({'paymentId': payment['paymentId']}, new_image=payment)
+
+def test_payments_for_one_loan_update_its_balance_once(monkeypatch):
+    loan, other = _loan(), _loan()
+    records = [_payment(loan['loanId'], 10000), _payment(other['loanId'], 5000), _payment(loan['loanId'], 20000)]
+    updated = []
+    update_loan_balance = db_service.update_loan_balance
+    monkeypatch.setattr(db_service, 'update_loan_balance',
+                        lambda loan_id: updated.append(loan_id) or update_loan_balance(loan_id))
+
+    result = streams.process_stream_records({'Records': records}, None)
+    streams.process_stream_records({'Records': records}, None)  # Redelivered batch
+
+    assert result == {'batchItemFailures': []}
+    assert sorted(updated) == sorted([loan['loanId'], other['loanId']] * 2)
+    assert db_service.get_loan(loan['loanId'])['balanceAmountCents'] == 70000
+    assert db_service.get_loan(other['loanId'])['balanceAmountCents'] == 95000
+
+def test_failed_loan_is_reported_for_redelivery(monkeypatch):
+    loan = _loan()
+    record = _payment(loan['loanId'], 10000)
+
+    def fail(loan_id):
+        raise RuntimeError('throttled')
+    monkeypatch.setattr(db_service, 'update_loan_balance', fail)
+
+    result = streams.process_stream_records({'Records': [record]}, None)
+
+    assert result == {'batchItemFailures': [{'itemIdentifier': record['dynamodb']['SequenceNumber']}]}
+
+def test_approval_creates_the_initial_cycle_once():
+    pending = _loan()
+    approved = {**pending, 'status': 'approved', 'approvedAt': date.today().isoformat()}
+    db_service.update_loan(pending['loanId'], {'status': 'approved', 'approvedAt': approved['approvedAt']})
+    record = _record({'loanId': pending['loanId']}, new_image=approved, old_image=pending, event_name='MODIFY')
+
+    streams.process_stream_records({'Records': [record, record]}, None)
+    streams.process_stream_records({'Records': [record]}, None)
+
+    cycles = db_service.get_interest_cycles_by_loan(pending['loanId'])
+    assert [cycle['cycleStartDate'] for cycle in cycles] == [date.today().isoformat()]
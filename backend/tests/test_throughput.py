@@ -0,0 +1,76 @@
+"""Client-side throughput governor"""
+from types import SimpleNamespace
+
+import pytest
+
+from services import throughput
+from services.throughput import MIN_RATE_FRACTION, RECOVERY_SECONDS, ThroughputGovernor, background_calls
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; sleeping advances it"""
+    now = SimpleNamespace(value=0.0, sleeps=[])
+
+    def sleep(seconds):
+        now.sleeps.append(seconds)
+        now.value += seconds
+
+    monkeypatch.setattr(throughput, 'time', SimpleNamespace(monotonic=lambda: now.value, sleep=sleep))
+    return now
+
+def _operation(name: str):
+    return SimpleNamespace(name=name)
+
+def _throttle(governor: ThroughputGovernor, operation: str) -> None:
+    response = (None, {'Error': {'Code': 'ProvisionedThroughputExceededException'}})
+    governor._needs_retry(response=response, operation=_operation(operation))
+
+def test_throttles_halve_the_rate_down_to_the_floor_then_it_recovers(clock):
+    governor = ThroughputGovernor(read_capacity=100, write_capacity=0, background_share=0.5)
+    bucket = governor.buckets['read']
+
+    _throttle(governor, 'Query')
+    rates = [bucket.rate]
+    for _ in range(10):
+        _throttle(governor, 'Scan')
+    rates.append(bucket.rate)
+    _throttle(governor, 'PutItem')  # No write bucket; nothing to slow down
+    clock.value += RECOVERY_SECONDS / 2
+    bucket.consume(0)
+    rates.append(bucket.rate)
+    clock.value += RECOVERY_SECONDS
+    bucket.consume(0)
+    rates.append(bucket.rate)
+
+    assert rates == [25, 50 * MIN_RATE_FRACTION, 50 * MIN_RATE_FRACTION + 25, 50]
+    assert governor.buckets['write'] is None
+
+def test_only_background_calls_wait_for_the_debt_to_be_paid_off(clock):
+    governor = ThroughputGovernor(read_capacity=0, write_capacity=10, background_share=1)
+
+    governor._after_call({'ConsumedCapacity': [{'CapacityUnits': 25}]}, _operation('BatchWriteItem'))
+    governor._before_call(_operation('PutItem'))
+    waited_in_foreground = list(clock.sleeps)
+    with background_calls():
+        governor._before_call(_operation('PutItem'))
+
+    assert waited_in_foreground == []
+    # 10 tokens minus 25 consumed, refilled at 10 units per second
+    assert sum(clock.sleeps) == pytest.approx(1.5)
+
+@pytest.mark.parametrize('value', ['0', '-1', '1.5', 'nan', 'a quarter'])
+def test_an_invalid_share_falls_back_to_the_default(monkeypatch, capsys, value):
+    monkeypatch.setenv('BACKGROUND_THROUGHPUT_SHARE', value)
+
+    disabled = ThroughputGovernor(read_capacity=0, write_capacity=0)
+    assert capsys.readouterr().out == ''
+    governor = ThroughputGovernor(read_capacity=100, write_capacity=0)
+
+    assert not disabled.enabled
+    assert governor.buckets['read'].max_rate == 100 * throughput.DEFAULT_BACKGROUND_THROUGHPUT_SHARE
+    assert 'Invalid BACKGROUND_THROUGHPUT_SHARE' in capsys.readouterr().out
+
+def test_a_valid_share_sizes_the_buckets(monkeypatch):
+    monkeypatch.setenv('BACKGROUND_THROUGHPUT_SHARE', '0.1')
+
+    assert ThroughputGovernor(read_capacity=100, write_capacity=40).buckets['write'].max_rate == pytest.approx(4)
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { Paper, Typography, Table, TableBody, TableCell, TableContainer, TableHead, TableRow, Chip, CircularProgress, Alert } from '@mui/material';
+import { Paper, Typography, TextField, Table, TableBody, TableCell, TableContainer, TableHead, TableRow, Chip, CircularProgress, Alert } from '@mui/material';
 import { borrowerService } from '../services/api';
 import { useLanguage } from '../contexts/LanguageContext';
 
@@ -8,14 +8,23 @@ const BorrowerList = () => {
   const [borrowers, setBorrowers] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [search, setSearch] = useState('');
 
+  // Search on the server (prefix match on name or phone), debounced while typing
   useEffect(() => {
-    fetchBorrowers();
-  }, []);
+    let current = true;
+    const timer = setTimeout(() => fetchBorrowers(search.trim(), () => current), search ? 300 : 0);
+    return () => {
+      current = false;
+      clearTimeout(timer);
+    };
+  }, [search]);
 
-  const fetchBorrowers = async () => {
+  const fetchBorrowers = async (query, isCurrent) => {
     try {
-      const response = await borrowerService.getBorrowers();
+      const response = await borrowerService.getBorrowers(query);
+      // Ignore responses for a search the user has already changed
+      if (!isCurrent()) return;
       setBorrowers(response.data);
       setError('');
     } catch (error) {
@@ -27,14 +36,23 @@ const BorrowerList = () => {
   };
 
   if (loading) return <CircularProgress sx={{ display: 'block', margin: '2rem auto' }} />;
-  if (error) return <Alert severity="error">{error}</Alert>;
 
   return (
     <Paper elevation={3} sx={{ p: 3 }}>
       <Typography variant="h5" gutterBottom>{t.borrowers} ({borrowers.length})</Typography>
-      {borrowers.length === 0 ? (
+      <TextField
+        fullWidth
+        size="small"
+        label={t.searchBorrowers}
+        value={search}
+        onChange={(e) => setSearch(e.target.value)}
+        sx={{ mb: 2 }}
+      />
+      {error ? (
+        <Alert severity="error">{error}</Alert>
+      ) : borrowers.length === 0 ? (
         <Typography color="text.secondary" sx={{ fontStyle: 'italic', py: 2 }}>
-          {t.noBorrowersYet}
+          {search.trim() ? t.noBorrowersFound : t.noBorrowersYet}
         </Typography>
       ) : (
         <TableContainer>
@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { Paper, Typography, Button, TextField, Table, TableBody, TableCell, TableContainer, TableHead, TableRow, Select, MenuItem, Grid, Card, CardContent, Box, Alert, CircularProgress, IconButton } from '@mui/material';
 import { ArrowBack, Edit, Delete, Save, Cancel, PictureAsPdf } from '@mui/icons-material';
-import { loanService, borrowerService } from '../services/api';
+import { loanService } from '../services/api';
 import { useLanguage } from '../contexts/LanguageContext';
 import jsPDF from 'jspdf';
 import autoTable from 'jspdf-autotable';
@@ -33,20 +33,14 @@ const LoanDetails = () => {
   const fetchLoanDetails = async () => {
     try {
       setLoading(true);
-      const [loanResponse, paymentsResponse, cyclesResponse] = await Promise.all([
-        loanService.getLoan(id),
-        loanService.getPayments(id).catch(() => ({ data: [] })),
-        loanService.getInterestCycles(id).catch(() => ({ data: [] }))
-      ]);
+      // One request returns the loan with its payments, interest cycles and borrower
+      const response = await loanService.getLoanDetails(id);
+      const { payments: loanPayments, interestCycles: loanCycles, borrower: loanBorrower, ...loanData } = response.data;
       
-      setLoan(loanResponse.data);
-      setPayments(paymentsResponse.data);
-      setInterestCycles(cyclesResponse.data);
-
-      if (loanResponse.data.borrowerId) {
-        const borrowerResponse = await borrowerService.getBorrower(loanResponse.data.borrowerId);
-        setBorrower(borrowerResponse.data);
-      }
+      setLoan(loanData);
+      setPayments(loanPayments || []);
+      setInterestCycles(loanCycles || []);
+      setBorrower(loanBorrower || null);
     } catch (error) {
       console.error('Error fetching loan details:', error);
       setError('Failed to load loan details');
@@ -12,6 +12,7 @@ const api = axios.create({
 export const loanService = {
   getLoans: (params) => api.get('/loans', { params }),
   getLoan: (id) => api.get(`/loans/${id}`),
+  getLoanDetails: (id) => api.get(`/loans/${id}`, { params: { include: 'payments,cycles,borrower' } }),
   createLoan: (loan) => api.post('/loans', loan),
   updateLoanStatus: (id, status) => api.put(`/loans/${id}/status`, { status }),
   deleteLoan: (id) => api.delete(`/loans/${id}`),
@@ -23,7 +24,7 @@ export const loanService = {
 };
 
 export const borrowerService = {
-  getBorrowers: () => api.get('/borrowers'),
+  getBorrowers: (query) => api.get('/borrowers', { params: query ? { q: query } : {} }),
   getBorrower: (id) => api.get(`/borrowers/${id}`),
   createBorrower: (borrower) => api.post('/borrowers', borrower),
 };
@@ -29,6 +29,8 @@ export const translations = {
     loadingBorrowers: 'Loading borrowers...',
     failedToLoadBorrowers: 'Failed to load borrowers',
     noBorrowersYet: 'No borrowers yet. Create one to get started!',
+    searchBorrowers: 'Search by name or phone',
+    noBorrowersFound: 'No borrowers match your search',
     phoneNumber: 'Phone Number',
     
     // Create Borrower
@@ -154,6 +156,8 @@ export const translations = {
     loadingBorrowers: 'Cargando prestatarios...',
     failedToLoadBorrowers: 'Error al cargar prestatarios',
     noBorrowersYet: '¡Aún no hay prestatarios. Crea uno para comenzar!',
+    searchBorrowers: 'Buscar por nombre o teléfono',
+    noBorrowersFound: 'Ningún prestatario coincide con la búsqueda',
     phoneNumber: 'Número de Teléfono',
     
     // Create Borrower